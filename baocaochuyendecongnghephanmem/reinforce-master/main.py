@@ -5,127 +5,119 @@ main here
 
 """
 import argparse
+import os
+import random
+import time
+import numpy as np
 import src.game_engine as breakout
-import src.agents as agents
+import src.agent_registry as agent_registry
 import sys
-# import src.function_approximators as fn_approx
-import src.feature_extractors as ft_extract
 
 
 def main(args, parser):
-    # global parameters (can/should be changed)
-    EXPLORATION_PROB = args.e
-    DISCOUNT = 0.993
-    memory_size = args.memory_size or 5000
-    sample_size = args.sample_size or 4
+    if args.config is not None:
+        # many runs from one file, set up once (see src/run_config.py)
+        from src.run_config import run_file
+        from src.result_cache import ResultCache
+        run_file(args.config, (ResultCache(args.cache) if args.cache else ResultCache())
+                 if args.cache is not None else None)
+        return
+
+    # global parameters (can/should be changed). Flags that weren't given fall
+    #   back to the registry's defaults
+    config = {
+        'epsilon': args.e,
+        'verbose': args.v,
+        'memory_size': args.memory_size,
+        'sample_size': args.sample_size,
+        'n_step': args.n_step,
+        'prioritized': args.prioritized,
+        'replay_file': args.replay_file,
+        'prefetch': args.prefetch,
+        'trace_threshold': args.trace_threshold,
+        'trace_decay': args.trace_decay,
+        'train_every': args.train_every,
+        'nn_backend': args.nn_backend,
+        'feature_set': args.feature_set,
+        'step_size': args.step_size,
+    }
+    config = dict((k, v) for k, v in config.items() if v is not None)
+
+    if args.compile is not None and args.p in ("human", "oracle"):
+        parser.error('-compile needs a learning agent')
+
+    metrics_server = None
+
+    # every run is seeded, so the same flags and seed replay the same games
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+
+    # runs that are a pure function of their flags can come from (and go to) the cache
+    cache = None
+    spec = {'player': args.p, 'config': config, 'seed': args.seed, 'games': args.b,
+            'read_model': args.rd, 'write_model': args.wr, 'eval': args.eval}
+    if args.cache is not None:
+        if args.p in ("human", "oracle") or args.d or args.checkpoint or args.workers is not None or args.compile:
+            parser.error('-cache only applies to plain bot runs (no -d, -checkpoint, -workers or -compile)')
+        from src.experiment_runner import csv_lines, make_record
+        from src.result_cache import ResultCache
+        cache = ResultCache(args.cache) if args.cache else ResultCache()
+        record = cache.get(spec)
+        if record is not None:
+            if args.csv:
+                for line in csv_lines(record):
+                    print line
+            else:
+                print 'cached: %s games, cumulative score %s' % (len(record['score']), record['score'].sum())
+            return
 
-    trace_threshold = args.trace_threshold or 0.1
-    trace_decay = args.trace_decay or 0.98
-
-    # stoopid stoopid argument parsing but idgaf
-    step_size = args.step_size or 0.001
-    if step_size == 'inv_sqrt':
-        step_size = agents.RLAgent.inverseSqrt
-    elif step_size == 'inv':
-        step_size = agents.RLAgent.inverse
-    else:
-        step_size = agents.RLAgent.constant(float(step_size))
-
-    # more stoopid stuff
-    feature_set = args.feature_set or None
-    if feature_set == 'v1':
-        feature_set = ft_extract.ContinuousFeaturesV1()
-    elif feature_set == 'v2':
-        feature_set = ft_extract.ContinuousFeaturesV2()
-    elif feature_set == 'v3':
-        feature_set = ft_extract.ContinuousFeaturesV3()
-    elif feature_set == 'v4':
-        feature_set = ft_extract.ContinuousFeaturesV4()
-    elif feature_set == 'v5':
-        feature_set = ft_extract.ContinuousFeaturesV5()
-    elif feature_set == 'v6':
-        feature_set = ft_extract.ContinuousFeaturesV6()
-    else:
-        # default to v2. cause it seems to work best
-        feature_set = ft_extract.ContinuousFeaturesV2()
-
-    game = None
     if args.p == "human":
         game = breakout.HumanControlledBreakout(
             args.csv, args.v, args.d, args.b, args.wr, args.rd)
-
-    elif args.p == "followBaseline":
-        agent = agents.FollowBaseline()
-
-    elif args.p == "randomBaseline":
-        agent = agents.RandomBaseline()
-
     elif args.p == "oracle":
         game = breakout.OracleControlledBreakout(
             args.csv, args.v, args.d, args.b, args.wr)
-
-    elif args.p == 'simpleQLearning':
-        agent = agents.DiscreteQLearning(gamma=DISCOUNT,
-                                         epsilon=EXPLORATION_PROB,
-                                         stepSize=step_size)
-    elif args.p == 'linearQ':
-        agent = agents.QLearning(feature_set,
-                                 epsilon=EXPLORATION_PROB,
-                                 gamma=DISCOUNT,
-                                 stepSize=step_size)
-    elif args.p == 'linearReplayQ':
-        agent = agents.QLearningReplayMemory(feature_set,
-                                             epsilon=EXPLORATION_PROB,
-                                             gamma=DISCOUNT,
-                                             stepSize=step_size,
-                                             num_static_target_steps=500,
-                                             memory_size=memory_size,
-                                             replay_sample_size=sample_size)
-    elif args.p == 'sarsa':
-        agent = agents.SARSA(feature_set,
-                             epsilon=EXPLORATION_PROB,
-                             gamma=DISCOUNT,
-                             stepSize=step_size)
-    elif args.p == 'sarsaLambda':
-        agent = agents.SARSALambda(feature_set,
-                                   epsilon=EXPLORATION_PROB,
-                                   gamma=DISCOUNT,
-                                   stepSize=step_size,
-                                   threshold=trace_threshold,
-                                   decay=trace_decay)
-    elif args.p == 'nn':
-        # TODO - FEED IN CONTINUOUS/RAW DATA
-        #         might not help as much because already has higher level features
-        agent = agents.NNAgent(feature_set, args.v,
-                               epsilon=EXPLORATION_PROB,
-                               gamma=DISCOUNT,
-                               stepSize=step_size)
-    elif args.p == 'policyGradients':
-        # better for continuous featuer spaces
-        # very unstable
-        # critic net, actor net best for continous features spaces
-        # READ       https://arxiv.org/abs/1509.02971
-        # TODO - lower learning rate, gradient clipping
-        agent = agents.PolicyGradients(feature_set, args.v,
-                                       epsilon=EXPLORATION_PROB,
-                                       gamma=DISCOUNT,
-                                       stepSize=step_size)
-
-    ############################################################################
-    # # # # # # # # # test bed for experimental features # # # # # # # # # # # #
-    ############################################################################
-    elif args.p == 'test':
-        fe = ft_extract.ContinuousFeaturesV2()
-        agent = agents.PolicyGradients(fe, args.v,
-                                       epsilon=EXPLORATION_PROB,
-                                       gamma=DISCOUNT,
-                                       stepSize=0.001)
-
-    if args.p not in ['human', 'oracle']:
+    else:
+        agent = agent_registry.build_agent(args.p, config)
+        if args.workers is not None:
+            # collect policy gradient episodes in parallel instead of in one game
+            from src.agents import PolicyGradients
+            from src.parallel_policy_gradients import ParallelPolicyGradients
+            if not isinstance(agent, PolicyGradients):
+                parser.error('-workers only applies to policyGradients')
+            if args.d or args.eval or args.checkpoint or args.metrics is not None or args.profile is not None or \
+                    args.compile is not None:
+                parser.error('-workers only trains (no -d, -eval, -checkpoint, -metrics, -profile or -compile)')
+            if args.rd is not None:
+                agent.read_model(args.rd)
+            ParallelPolicyGradients(agent, args.workers, seed=args.seed).run(args.b, args.csv, args.v, args.wr)
+            return
         game = breakout.BotControlledBreakout(
             agent, args.csv, args.v, args.d, args.b, args.wr, args.rd)
-
+        if args.eval:
+            agent.freeze()
+        if args.checkpoint is not None:
+            from src.checkpointer import Checkpointer
+            game.checkpointer = Checkpointer(agent, args.checkpoint,
+                                             args.checkpoint_every, args.checkpoint_seconds)
+        if args.profile is not None:
+            from src.phase_timer import PhaseTimer
+            game.phase_timer = PhaseTimer(args.profile or None)
+        if args.metrics is not None:
+            from src.metrics import MetricsRing, MetricsServer
+            game.metrics = MetricsRing()
+            metrics_server = MetricsServer(game.metrics, args.metrics, {'player': args.p, 'pid': os.getpid()})
+
+    start = time.time()
     game.run()
+    if metrics_server is not None:
+        metrics_server.close()
+    if cache is not None:
+        cache.put(make_record(spec, game, time.time() - start))
+
+    if args.compile is not None:
+        from src.policy_table import PolicyTable
+        PolicyTable.compile(agent).write(args.compile)
 
 
 if __name__ == "__main__":
@@ -136,7 +128,7 @@ if __name__ == "__main__":
         description='Play the game of breakout, or sit back and have a bot play it for you.')
     parser.set_defaults(func=main)
     parser.add_argument('-p', metavar="type", type=str,
-                        help="player type. accepted values: human, baseline, simpleQLearning, linearDiscreteFnApprox, linearContinuousFnApprox")
+                        help="player type. accepted values: human, oracle, " + ', '.join(agent_registry.agent_names()))
     parser.add_argument('-v', action="store_true", help="verbose mode")
     parser.add_argument('-csv', action="store_true", help="csv mode")
     parser.add_argument('-d', action="store_true", help="display game")
@@ -145,10 +137,47 @@ if __name__ == "__main__":
     parser.add_argument('-wr', type=str, help="write model to file when done")
     parser.add_argument(
         '-rd', type=str, help="read model parameters from file")
+    parser.add_argument('-compile', type=str,
+                        help="when done, write the greedy policy to file as a lookup table (play it with -p table -rd)")
+    parser.add_argument('-eval', action="store_true",
+                        help="evaluation mode: play the (read) model without learning from it")
+    parser.add_argument('-checkpoint', type=str,
+                        help="checkpoint training to this file, resuming from it if it exists")
+    parser.add_argument('-checkpoint_every', type=int,
+                        help="games between checkpoints (with -checkpoint)")
+    parser.add_argument('-checkpoint_seconds', type=float,
+                        help="seconds between checkpoints (with -checkpoint)")
+    parser.add_argument('-profile', type=str, nargs='?', const='',
+                        help="time each phase of the game loop, summarizing to stderr "
+                             "(and writing JSON lines per game to the file, if given)")
+    parser.add_argument('-metrics', type=str,
+                        help="serve live per-game metrics over HTTP at this port, host:port or unix socket path")
+    parser.add_argument('-seed', type=int, default=0,
+                        help="seed for python's and numpy's random number generators (defaults to 0)")
+    parser.add_argument('-cache', type=str, nargs='?', const='',
+                        help="reuse this run's results and model if it has already been run (and cache them if not). "
+                             "optional cache directory, defaults to .cache/results")
+    parser.add_argument('-config', type=str,
+                        help="play every run listed in this JSON file (see src/run_config.py), "
+                             "setting up once for all of them. other run flags are ignored")
     parser.add_argument('-e', type=float, default=0.3,
                         help="epsilon (exploration prob)")
     parser.add_argument('-memory_size', type=int, help="replay memory size")
     parser.add_argument('-sample_size', type=int, help="replay sample size")
+    parser.add_argument('-nn_backend', type=str,
+                        help="network implementation for nn: tf (default) or numpy")
+    parser.add_argument('-train_every', type=int,
+                        help="frames between minibatch updates (nn with -memory_size only)")
+    parser.add_argument('-prioritized', action="store_true",
+                        help="use prioritized experience replay")
+    parser.add_argument('-n_step', type=int,
+                        help="bootstrap replay targets from n steps ahead (defaults to 1)")
+    parser.add_argument('-prefetch', action="store_true",
+                        help="sample replay minibatches on a background thread (runs aren't reproducible)")
+    parser.add_argument('-replay_file', type=str,
+                        help="keep replay memory in this file, reusing its experience if it exists")
+    parser.add_argument('-workers', type=int,
+                        help="policyGradients: collect episodes on this many processes (0 = one per core)")
     parser.add_argument('-trace_threshold', type=float,
                         help="eligibility trace threshold")
     parser.add_argument('-trace_decay', type=float,
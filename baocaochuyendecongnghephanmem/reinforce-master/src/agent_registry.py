@@ -0,0 +1,196 @@
+"""
+Registry of bot agents, keyed by player type (main.py -p)
+
+Each entry is a builder that takes a config dict and returns an agent. Builders import
+what they need when they're called, so picking an agent only pays for that agent's
+imports (e.g. tensorflow is only loaded for the nn agent's tf backend)
+
+"""
+
+AGENT_BUILDERS = {}
+
+FEATURE_SETS = {
+    'v1': 'ContinuousFeaturesV1',
+    'v2': 'ContinuousFeaturesV2',
+    'v3': 'ContinuousFeaturesV3',
+    'v4': 'ContinuousFeaturesV4',
+    'v5': 'ContinuousFeaturesV5',
+    'v6': 'ContinuousFeaturesV6',
+}
+
+# dense columns replay needs for feature sets with more features than
+#   constants.DEFAULT_FEATURE_CAPACITY: v4 has one per (grid square, side of the
+#   paddle, direction, action), 1777 in all
+FEATURE_CAPACITIES = {
+    'v4': 2048,
+}
+
+# hyperparameters every builder can rely on being in its config
+DEFAULT_CONFIG = {
+    'epsilon': 0.3,
+    'discount': 0.993,
+    'feature_set': 'v2',
+    'step_size': '0.001',
+    'memory_size': None,    # replay memory size. None = per-agent default
+    'sample_size': None,    # replay sample / minibatch size. None = per-agent default
+    'n_step': 1,
+    'prioritized': False,
+    'replay_file': None,
+    'prefetch': False,
+    'trace_threshold': 0.1,
+    'trace_decay': 0.98,
+    'train_every': 4,
+    'nn_backend': 'tf',
+    'verbose': False,
+}
+
+
+def register(name):
+    """decorator that adds a builder to the registry under name"""
+    def decorator(builder):
+        AGENT_BUILDERS[name] = builder
+        return builder
+    return decorator
+
+
+def agent_names():
+    return sorted(AGENT_BUILDERS)
+
+
+def build_agent(name, config=None):
+    """builds the agent registered under name. config overrides DEFAULT_CONFIG"""
+    if name not in AGENT_BUILDERS:
+        raise ValueError('unknown player type %s. accepted values: %s' % (name, ', '.join(agent_names())))
+    full_config = dict(DEFAULT_CONFIG)
+    full_config.update(config or {})
+    return AGENT_BUILDERS[name](full_config)
+
+
+def make_feature_set(name):
+    """feature extractor for a feature set name. defaults to v2. cause it seems to work best"""
+    import feature_extractors
+    return getattr(feature_extractors, FEATURE_SETS.get(name, FEATURE_SETS['v2']))()
+
+
+def feature_capacity(name):
+    """number of distinct features a feature set can produce (rounded up)"""
+    from constants import DEFAULT_FEATURE_CAPACITY
+    return FEATURE_CAPACITIES.get(name, DEFAULT_FEATURE_CAPACITY)
+
+
+def make_step_size(spec):
+    """step size function for 'inv_sqrt', 'inv', or a constant"""
+    from agents import RLAgent
+    if spec == 'inv_sqrt':
+        return RLAgent.inverseSqrt
+    elif spec == 'inv':
+        return RLAgent.inverse
+    return RLAgent.constant(float(spec))
+
+
+def rl_args(config):
+    """the arguments shared by every feature-based RLAgent"""
+    return dict(epsilon=config['epsilon'],
+                gamma=config['discount'],
+                stepSize=make_step_size(config['step_size']))
+
+
+@register('followBaseline')
+def follow_baseline(config):
+    from agents import FollowBaseline
+    return FollowBaseline()
+
+
+@register('randomBaseline')
+def random_baseline(config):
+    from agents import RandomBaseline
+    return RandomBaseline()
+
+
+@register('simpleQLearning')
+def simple_q_learning(config):
+    from agents import DiscreteQLearning
+    return DiscreteQLearning(gamma=config['discount'],
+                             epsilon=config['epsilon'],
+                             stepSize=make_step_size(config['step_size']))
+
+
+@register('linearQ')
+def linear_q(config):
+    from agents import QLearning
+    return QLearning(make_feature_set(config['feature_set']), **rl_args(config))
+
+
+@register('linearReplayQ')
+def linear_replay_q(config):
+    from agents import QLearningReplayMemory
+    return QLearningReplayMemory(make_feature_set(config['feature_set']),
+                                 num_static_target_steps=500,
+                                 memory_size=config['memory_size'] or 5000,
+                                 replay_sample_size=config['sample_size'] or 4,
+                                 feature_capacity=feature_capacity(config['feature_set']),
+                                 prioritized=config['prioritized'],
+                                 replay_path=config['replay_file'],
+                                 n_step=config['n_step'],
+                                 prefetch=config['prefetch'],
+                                 **rl_args(config))
+
+
+@register('sarsa')
+def sarsa(config):
+    from agents import SARSA
+    return SARSA(make_feature_set(config['feature_set']), **rl_args(config))
+
+
+@register('sarsaLambda')
+def sarsa_lambda(config):
+    from agents import SARSALambda
+    return SARSALambda(make_feature_set(config['feature_set']),
+                       threshold=config['trace_threshold'],
+                       decay=config['trace_decay'],
+                       **rl_args(config))
+
+
+@register('nn')
+def nn(config):
+    # TODO - FEED IN CONTINUOUS/RAW DATA
+    #         might not help as much because already has higher level features
+    from agents import NNAgent
+    return NNAgent(make_feature_set(config['feature_set']), config['verbose'],
+                   replay_memory_size=config['memory_size'],
+                   batch_size=config['sample_size'] or 32,
+                   train_every=config['train_every'],
+                   backend=config['nn_backend'],
+                   **rl_args(config))
+
+
+@register('policyGradients')
+def policy_gradients(config):
+    # better for continuous featuer spaces
+    # very unstable
+    # critic net, actor net best for continous features spaces
+    # READ       https://arxiv.org/abs/1509.02971
+    # TODO - lower learning rate, gradient clipping
+    from agents import PolicyGradients
+    return PolicyGradients(make_feature_set(config['feature_set']), config['verbose'],
+                           **rl_args(config))
+
+
+@register('table')
+def table(config):
+    # plays a policy compiled with main.py -compile (load it with -rd)
+    from policy_table import TableAgent
+    return TableAgent(epsilon=config['epsilon'])
+
+
+############################################################################
+# # # # # # # # # test bed for experimental features # # # # # # # # # # # #
+############################################################################
+@register('test')
+def test(config):
+    from agents import PolicyGradients
+    import feature_extractors
+    return PolicyGradients(feature_extractors.ContinuousFeaturesV2(), config['verbose'],
+                           epsilon=config['epsilon'],
+                           gamma=config['discount'],
+                           stepSize=0.001)
@@ -6,22 +6,31 @@ import abc
 from constants import *
 from collections import defaultdict
 import re
+import os
 import math
 import random
 import utils 
-import tensorflow as tf
 import string
 # from function_approximators import *
 import random
 from feature_extractors import ContinuousFeaturesV2 as DiscreteFeaturizer
-from replay_memory import ReplayMemory
+from feature_extractors import FeatureIndex
+from replay_memory import ReplayMemory, PrioritizedReplayMemory, MmapReplayMemory, ReplayPrefetcher
 import copy
+import itertools
 from eligibility_tracer import EligibilityTrace
+from episode_buffer import EpisodeBuffer
+from nstep_buffer import NStepBuffer
+import model_file
 import numpy as np
 
 class BaseAgent(object):
     """abstract base class for all agents
     """
+    # frozen agents are being evaluated: the game loop never calls incorporateFeedback
+    #   and the weights are read-only, so several evaluators can share them
+    frozen = False
+
     def takeAction(self, state):
         raise NotImplementedError("Override me")
 
@@ -31,6 +40,50 @@ class BaseAgent(object):
     def reset(self):
         raise NotImplementedError("overide me")
 
+    def stats(self):
+        """agent-specific counters worth reporting at the end of a run"""
+        return {}
+
+    def gauges(self):
+        """live values for the metrics ring (see metrics.GAUGES). read after every game,
+            so keep them cheap
+        """
+        gauges = {'epsilon': getattr(self, 'explorationProb', None)}
+        memory = getattr(self, 'replay_memory', None)
+        if memory is not None:
+            gauges['replay_fill'] = memory.size() * 1.0 / memory.capacity
+        return gauges
+
+    def freeze(self):
+        """switch to evaluation mode (for good)"""
+        self.frozen = True
+
+    def close(self):
+        """release any threads or sessions the agent holds"""
+        pass
+
+    def snapshot(self):
+        """copy of everything needed to resume training, for checkpoints: a dict of
+            'meta' (scalars), 'arrays' (numpy arrays) and 'dicts' (sparse float dicts).
+            Everything is copied, so training can go on while it's being written
+        """
+        return {'meta': {'numIters': getattr(self, 'numIters', None)}, 'arrays': {}, 'dicts': {}}
+
+    def restore(self, snapshot):
+        """load a snapshot() back in"""
+        if snapshot['meta']['numIters'] is not None:
+            self.numIters = snapshot['meta']['numIters']
+
+    def snapshot_replay(self, snapshot, memory):
+        """adds a replay memory's contents to a snapshot"""
+        arrays, counters = memory.snapshot()
+        snapshot['arrays'].update(('replay_' + k, v) for k, v in arrays.iteritems())
+        snapshot['meta']['replay'] = counters
+
+    def restore_replay(self, snapshot, memory):
+        arrays = dict((k[len('replay_'):], v) for k, v in snapshot['arrays'].iteritems() if k.startswith('replay_'))
+        memory.restore(arrays, snapshot['meta']['replay'])
+
     def actions(self, state):
         """returns set of possible actions from a state
         """
@@ -40,9 +93,13 @@ class BaseAgent(object):
             return [[], [INPUT_L], [INPUT_R]]
 
     def read_model(self, path):
-        """reads model weights from file
-            works kind of like an inverse of str()
+        """reads model weights from file. returns a model_file.ModelFile, or for
+            models written in the old text format, the object they hold
         """
+        if model_file.is_model_file(path):
+            return model_file.read(path)
+
+        # old text format: works kind of like an inverse of str()
         model_str = open(path, 'r').read()
         model_str = re.sub("<type '", "", model_str)
         model_str = re.sub("'>", "", model_str)
@@ -51,12 +108,10 @@ class BaseAgent(object):
         newWeights = eval(model_str)
         return newWeights
 
-    def write_model(self, path, model=None):
-        """writes a model to file
+    def write_model(self, path, format='empty', arrays=(), keys=None, meta=None):
+        """writes a model to file (see model_file.write)
         """
-        file = open(path, 'w')
-        file.write(str(model))
-        file.close()
+        model_file.write(path, format, arrays, keys, meta)
 
 
 
@@ -86,6 +141,11 @@ class RLAgent(BaseAgent):
             score += self.weights[f] * v
         return score
 
+    def actionScores(self, state, actions):
+        """Q-values of each action in a state
+        """
+        return [self.getQ(state, action) for action in actions]
+
     def takeAction(self, state):
         """ returns action according to e-greedy policy
         """
@@ -93,12 +153,30 @@ class RLAgent(BaseAgent):
         actions = self.actions(state)
         if random.random() < self.explorationProb:
             return random.choice(actions)
-        scores = [(self.getQ(state, action), action) for action in actions]
+        scores = zip(self.actionScores(state, actions), actions)
         # break ties with random movement
         if utils.allSame([x[0] for x in scores]):
             return random.choice(scores)[1]
         return max(scores)[1]
 
+    def gauges(self):
+        gauges = super(RLAgent, self).gauges()
+        gauges['weights'] = len(self.weights)
+        return gauges
+
+    def freeze(self):
+        super(RLAgent, self).freeze()
+        self.weights = utils.FrozenWeights(self.weights)
+
+    def snapshot(self):
+        snapshot = super(RLAgent, self).snapshot()
+        snapshot['dicts']['weights'] = dict(self.weights)
+        return snapshot
+
+    def restore(self, snapshot):
+        super(RLAgent, self).restore(snapshot)
+        self.weights = defaultdict(float, snapshot['dicts']['weights'])
+
     def setStepSize(self, size):
         self.stepSize = size
 
@@ -126,8 +204,17 @@ class RLAgent(BaseAgent):
     def copyWeights(self):
         return copy.deepcopy(self.weights)
 
+    def read_model(self, path):
+        model = super(RLAgent, self).read_model(path)
+        if isinstance(model, model_file.ModelFile):
+            model.expect('linear')
+            model = itertools.izip(model.keys, model.arrays['weights'].tolist())
+        self.weights = defaultdict(float, model)
+
     def write_model(self, path):
-        super(RLAgent, self).write_model(path, self.weights)
+        keys = self.weights.keys()
+        weights = np.fromiter((self.weights[k] for k in keys), np.float64, len(keys))
+        super(RLAgent, self).write_model(path, 'linear', [('weights', weights)], keys)
 
 
 
@@ -172,12 +259,34 @@ class QLearningReplayMemory(RLAgent):
         towards a random sample of past experiences 
     """
     def __init__(self, featureExtractor, epsilon=0.5, gamma=0.993, stepSize=None, 
-        num_static_target_steps=750, memory_size=2500, replay_sample_size=4):
+        num_static_target_steps=750, memory_size=2500, replay_sample_size=4,
+        feature_capacity=DEFAULT_FEATURE_CAPACITY, prioritized=False, replay_path=None, n_step=1,
+        prefetch=False):
         super(QLearningReplayMemory, self).__init__(featureExtractor, epsilon, gamma, stepSize)
         self.num_static_target_steps = num_static_target_steps
         self.memory_size = memory_size
         self.sample_size = replay_sample_size
-        self.replay_memory = ReplayMemory(memory_size)
+        # transitions pass through here on their way to replay memory, which makes
+        #    targets bootstrap from n steps ahead rather than one
+        self.n_step_buffer = NStepBuffer(n_step, gamma)
+        self.prioritized = prioritized
+        self.replay_path = replay_path
+        self.feature_index = FeatureIndex(feature_capacity)
+        if prioritized and replay_path:
+            raise ValueError('priorities are not persisted, so prioritized replay can\'t be file-backed')
+        elif prioritized:
+            self.replay_memory = PrioritizedReplayMemory(memory_size, self.feature_index.capacity)
+        elif replay_path:
+            # the stored feature columns are only meaningful with the index that produced them
+            if os.path.exists(replay_path + '.keys'):
+                self.feature_index.read(replay_path + '.keys')
+            self.replay_memory = MmapReplayMemory(replay_path, memory_size, self.feature_index.capacity)
+        else:
+            self.replay_memory = ReplayMemory(memory_size, self.feature_index.capacity)
+        self.num_saved_features = len(self.feature_index)
+        # sample and gather minibatches on a background thread
+        self.prefetcher = ReplayPrefetcher(self.replay_memory, self.sample_size,
+                                           lambda: len(self.feature_index)) if prefetch else None
         self.static_target_weights = self.copyWeights()
 
 
@@ -201,34 +310,111 @@ class QLearningReplayMemory(RLAgent):
         """
         self.static_target_weights = self.copyWeights()
 
+    def read_model(self, path):
+        super(QLearningReplayMemory, self).read_model(path)
+        self.update_static_target()
+
+    def snapshot(self):
+        # taken between games, when the n-step window has been flushed
+        snapshot = super(QLearningReplayMemory, self).snapshot()
+        snapshot['dicts']['static_target_weights'] = dict(self.static_target_weights)
+        snapshot['meta']['feature_keys'] = list(self.feature_index.keys)
+        self.snapshot_replay(snapshot, self.replay_memory)
+        return snapshot
+
+    def restore(self, snapshot):
+        super(QLearningReplayMemory, self).restore(snapshot)
+        self.static_target_weights = defaultdict(float, snapshot['dicts']['static_target_weights'])
+        self.feature_index.columns = {}
+        self.feature_index.keys = []
+        for key in snapshot['meta']['feature_keys']:
+            self.feature_index.column(key)
+        self.restore_replay(snapshot, self.replay_memory)
+
+
+    def featurize_transition(self, state, action, newState):
+        """densifies the features of a SARS' tuple for storage in replay memory:
+            f(s, a), the index of a, f(s', a') for each a' in actions(s'), and a validity
+            mask over those next-action rows
+        """
+        features = self.feature_index.vectorize(self.featureExtractor.get_features(state, action))
+        actions = self.actions(state)
+        action_i = actions.index(action) if action in actions else 0
+
+        next_features = np.zeros((self.replay_memory.num_actions, self.feature_index.capacity))
+        next_valid = np.zeros(self.replay_memory.num_actions, dtype=np.bool_)
+        for i, newAction in enumerate(self.actions(newState)):
+            self.feature_index.vectorize(self.featureExtractor.get_features(newState, newAction),
+                                         out=next_features[i])
+            next_valid[i] = True
+        return features, action_i, next_features, next_valid
+
 
     def incorporateFeedback(self, state, action, reward, newState):
         """Perform a Q-learning update
         """
-        # TODO LEAVE TARGET AT REWARD IF END OF GAME
         if state == {}:
             return
         # update the auxiliary weights to the current weights every num_static_target_steps iterations
         if self.numIters % self.num_static_target_steps == 0:
             self.update_static_target()
 
-        self.replay_memory.store((state, action, reward, newState))
+        # states hold references to live game objects, so featurize them now rather than at sample time
+        features, action_i, next_features, next_valid = self.featurize_transition(state, action, newState)
+        done = newState['game_state'] == STATE_GAME_OVER
+        # the keys go to disk before any record that uses their columns does, so a crash
+        #   in between never leaves a record with columns the .keys file doesn't name
+        if self.replay_path and len(self.feature_index) != self.num_saved_features:
+            self.feature_index.write(self.replay_path + '.keys')
+            self.num_saved_features = len(self.feature_index)
+        for transition in self.n_step_buffer.push(features, action_i, reward, next_features, next_valid, done):
+            self.replay_memory.store(*transition)
+        # nothing to learn from until the first n-step transition comes out
+        if self.replay_memory.size() == 0:
+            return None
+
+        # only the first n columns have ever been assigned a feature. prefetched
+        #   batches may have been gathered before the latest columns were
+        if self.prefetcher:
+            indices, batch = self.prefetcher.get()
+        else:
+            indices = self.replay_memory.sample(self.sample_size)
+            batch = self.replay_memory.batch(indices, len(self.feature_index))
+        n = batch['features'].shape[1]
+        weights = self.feature_index.densify(self.weights)[:n]
+        static_weights = self.feature_index.densify(self.static_target_weights)[:n]
+
+        predictions = batch['features'].dot(weights)
+
+        # Use the static auxiliary weights as your target, leaving it at the reward at the end of a game
+        next_q = batch['next_features'].dot(static_weights)
+        next_q[~batch['next_valid']] = -float('inf')
+        # stored rewards are n-step returns, so bootstrap with gamma^n
+        targets = batch['reward'] + np.where(batch['done'], 0.0, self.n_step_buffer.gamma_n * next_q.max(axis=1))
+
+        errors = predictions - targets
+        if self.prioritized:
+            # scale updates down for transitions that are sampled more often than uniform
+            updates = self.getStepSize(self.numIters) * errors * self.replay_memory.importance_weights(indices)
+            self.replay_memory.update_priorities(indices, errors)
+        else:
+            updates = self.getStepSize(self.numIters) * errors
+        updates = np.clip(updates, -MAX_GRADIENT, MAX_GRADIENT)
+        gradient = updates.dot(batch['features'])
+        for i in np.flatnonzero(gradient):
+            self.weights[self.feature_index.keys[i]] -= gradient[i]
+        return None
 
-        for i in range(self.sample_size if self.replay_memory.isFull() else 1):
-            state, action, reward, newState = self.replay_memory.sample()
-            prediction = self.getQ(state, action)
+    def stats(self):
+        return self.prefetcher.stats() if self.prefetcher else {}
 
-            target = reward 
-            if newState['game_state'] != STATE_GAME_OVER:
-                # Use the static auxiliary weights as your target
-                target += self.discount * max(self.getStaticQ(newState, newAction) for newAction in self.actions(newState))
+    def freeze(self):
+        super(QLearningReplayMemory, self).freeze()
+        self.close()
 
-            update = self.getStepSize(self.numIters) * (prediction - target)
-            # clip gradient - TODO EXPORT TO UTILS?
-            update = max(-MAX_GRADIENT, update) if update < 0 else min(MAX_GRADIENT, update)
-            for f, v in self.featureExtractor.get_features(state, action).iteritems():
-                self.weights[f] = self.weights[f] - update * v
-        return None
+    def close(self):
+        if self.prefetcher and self.prefetcher.running:
+            self.prefetcher.stop()
 
 
 
@@ -280,6 +466,15 @@ class SARSALambda(RLAgent):
         super(SARSALambda, self).__init__(featureExtractor, epsilon, gamma, stepSize)
         self.eligibility_trace = EligibilityTrace(decay, threshold)
 
+    def snapshot(self):
+        snapshot = super(SARSALambda, self).snapshot()
+        snapshot['dicts']['eligibility_trace'] = dict(self.eligibility_trace.data)
+        return snapshot
+
+    def restore(self, snapshot):
+        super(SARSALambda, self).restore(snapshot)
+        self.eligibility_trace.data = defaultdict(float, snapshot['dicts']['eligibility_trace'])
+
     def incorporateFeedback(self, state, action, reward, newState):
         """performs a SARSA update. Leverages the eligibility trace to update 
             parameters towards sum of discounted rewards
@@ -310,8 +505,18 @@ class SARSALambda(RLAgent):
 
 class NNAgent(BaseAgent):
     """Approximation using the NN
+
+        by default the network trains on each transition as it happens. Given a
+            replay_memory_size, it instead stores transitions and every train_every frames
+            trains on a minibatch of batch_size of them, against targets from a copy of the
+            network that is refreshed every num_static_target_steps frames
+
+        the network itself is either the tensorflow implementation ('tf') or an
+            equivalent numpy one ('numpy'), which doesn't import tensorflow
     """
-    def __init__(self, featureExtractor, verbose, epsilon=0.5, gamma=0.993, stepSize=None):
+    def __init__(self, featureExtractor, verbose, epsilon=0.5, gamma=0.993, stepSize=None,
+        replay_memory_size=None, batch_size=32, train_every=4, num_static_target_steps=500,
+        backend='tf'):
         self.featureExtractor = featureExtractor
         self.verbose = verbose
         self.explorationProb = epsilon
@@ -321,9 +526,20 @@ class NNAgent(BaseAgent):
 
 #        self.feature_len = 11
         self.feature_len = 5
-        self.input_placeholder, self.target_placeholder, self.loss, \
-            self.train_step, self.sess, self.output, self.merged, self.log_writer = \
-                                                    self.define_model(self.feature_len)
+        if backend == 'numpy':
+            from numpy_q_network import NumpyQNetwork as QNetwork
+        elif backend == 'tf':
+            from tf_q_network import TFQNetwork as QNetwork
+        else:
+            raise ValueError('unknown network backend %s' % backend)
+        self.network = QNetwork(self.feature_len, verbose, NUM_ACTIONS, replay=bool(replay_memory_size))
+
+        self.replay_memory = None
+        if replay_memory_size:
+            self.batch_size = batch_size
+            self.train_every = train_every
+            self.num_static_target_steps = num_static_target_steps
+            self.replay_memory = ReplayMemory(replay_memory_size, self.feature_len)
 
     def toFeatureVector(self, state, action):
         """converts state/action pair to 1xN matrix for learning
@@ -331,20 +547,66 @@ class NNAgent(BaseAgent):
         features = self.featureExtractor.get_features(state, action)
         return utils.dictToNpMatrix(features)
 
+    def toFeatureMatrix(self, state, actions):
+        """stacks the feature vectors of a state paired with each action into
+            a len(actions)xN matrix, so that they can all be evaluated in one pass
+        """
+        return np.vstack([self.toFeatureVector(state, action) for action in actions])
+
 
     def getQ(self, state, action, features=None):
         """Network forward pass
         """
         if features is None:
             features = self.toFeatureVector(state, action)
+        return self.network.q_values(features)[0]
+
+    def getQs(self, state, actions):
+        """Network forward pass for every action at once. returns a list of Q-values
+        """
+        return self.network.q_values(self.toFeatureMatrix(state, actions)).tolist()
+
+    def actionScores(self, state, actions):
+        return self.getQs(state, actions)
 
-        # output is a 1x1 matrix
-        output = self.sess.run(self.output,
-            feed_dict={
-                self.input_placeholder: features,
-            })
+    def freeze(self):
+        super(NNAgent, self).freeze()
+        self.network.freeze()
 
-        return output[0][0]
+    def close(self):
+        self.network.close()
+
+    # network variables, in get_weights/set_weights order
+    NETWORK_VARIABLES = ['w_0', 'b_0', 'w_1', 'b_1']
+
+    def read_model(self, path):
+        model = super(NNAgent, self).read_model(path)
+        if not isinstance(model, model_file.ModelFile):
+            raise ValueError('%s has no network weights' % path)
+        model.expect('q_network')
+        self.network.set_weights([np.array(model.arrays[k]) for k in self.NETWORK_VARIABLES])
+        if self.replay_memory is not None:
+            self.network.update_target()
+
+    def write_model(self, path):
+        super(NNAgent, self).write_model(path, 'q_network',
+                                         zip(self.NETWORK_VARIABLES, self.network.get_weights()))
+
+    def snapshot(self):
+        snapshot = super(NNAgent, self).snapshot()
+        network_state = self.network.snapshot()
+        snapshot['arrays'].update(('network_%d' % i, v) for i, v in enumerate(network_state))
+        snapshot['meta']['network_arrays'] = len(network_state)
+        if self.replay_memory is not None:
+            self.snapshot_replay(snapshot, self.replay_memory)
+        return snapshot
+
+    def restore(self, snapshot):
+        super(NNAgent, self).restore(snapshot)
+        self.network.restore([np.array(snapshot['arrays']['network_%d' % i])
+                              for i in range(snapshot['meta']['network_arrays'])])
+        if self.replay_memory is not None:
+            self.restore_replay(snapshot, self.replay_memory)
 
 
     def takeAction(self, state):
@@ -355,7 +617,7 @@ class NNAgent(BaseAgent):
         if random.random() < self.explorationProb:
             return random.choice(actions)
 
-        scores = [(self.getQ(state, action), action) for action in actions]
+        scores = zip(self.getQs(state, actions), actions)
 
         if utils.allSame([q[0] for q in scores]):
             return random.choice(scores)[1]
@@ -364,94 +626,43 @@ class NNAgent(BaseAgent):
 
 
     def incorporateFeedback(self, state, action, reward, newState):
-        """perform NN Q-learning update
+        """perform NN Q-learning update. The target (max over next-state actions) is
+            computed by the network in the same call as the training step
         """
         # no feedback at start of game
         if state == {}:
             return
 
-        cur_features = self.toFeatureVector(state, action)
-        target = reward
+        if self.replay_memory is not None:
+            return self.incorporateReplayFeedback(state, action, reward, newState)
 
-        if newState['game_state'] != STATE_GAME_OVER:
-            target += self.discount * max([self.getQ(newState, action) for action in self.actions(newState)])
-
-        if self.verbose:
-            summary, _ = self.sess.run([self.merged, self.train_step],
-                feed_dict={
-                    self.input_placeholder: cur_features,
-                    self.target_placeholder: [[target]],
-                })
-            self.log_writer.add_summary(
-                summary, self.numIters)
-        else:
-            self.sess.run([self.train_step],
-                feed_dict={
-                    self.input_placeholder: cur_features,
-                    self.target_placeholder: [[target]],
-                })
-
-
-    def define_model(self, input_size):
-        """Defines a Q-learning network
-        """
-        # input and output placeholders
-        inputs = tf.placeholder(tf.float32, shape=[None, input_size], name="input")
-        targets = tf.placeholder(tf.float32, shape=[None, 1], name="target")
-
-        # layer 0
-        w_0 = tf.Variable(tf.random_normal([input_size, 16]))
-        b_0 = tf.Variable(tf.random_normal([16])) 
-        fc_0 = tf.add(tf.matmul(inputs, w_0), b_0)
-        fc_0 = tf.sigmoid(fc_0)
-
-        # layer 1
-        w_1 = tf.Variable(tf.random_normal([16, 1])) 
-        b_1 = tf.Variable(tf.random_normal([1])) 
-        fc_1 = tf.add(tf.matmul(fc_0, w_1), b_1)
-        fc_1 = tf.nn.sigmoid(fc_1)
-
-        # training
-        loss = tf.reduce_sum(tf.square(fc_1 - targets))
-        starter_learning_rate = 0.1
-        global_step = tf.Variable(0, trainable=False)
-        learning_rate = tf.train.exponential_decay(starter_learning_rate, global_step,
-                                           10000, 0.96, staircase=True)
-        optimizer = tf.train.GradientDescentOptimizer(learning_rate)
-        train_step = optimizer.minimize(loss)
-
-        # get session, initialize stuff
-        sess = tf.Session()
-        sess.run(tf.initialize_all_variables())
-
-        # log stuff if verbose 
-        if self.verbose:
-            self.variable_summaries(w_0, 'w_0')
-            self.variable_summaries(b_0, 'b_0')
-            self.variable_summaries(w_1, 'w_1')
-            self.variable_summaries(b_1, 'b_1')        
-            self.variable_summaries(fc_1, 'output')
-            self.variable_summaries(fc_1, 'loss')
-
-            merged = tf.merge_all_summaries()
-            log_writer = tf.train.SummaryWriter('./', sess.graph)
-        else:
-            merged, log_writer = None, None
+        self.network.train(self.toFeatureVector(state, action),
+                           self.toFeatureMatrix(newState, self.actions(newState)),
+                           reward,
+                           # don't bootstrap past the end of the game
+                           self.discount if newState['game_state'] != STATE_GAME_OVER else 0.0)
 
-        return inputs, targets, loss, train_step, sess, fc_1, merged, log_writer
 
-
-    def variable_summaries(self, var, name):
-        """produces mean/std/max/min logging summaries for a variable
+    def incorporateReplayFeedback(self, state, action, reward, newState):
+        """store a transition, then every train_every frames train on a minibatch
+            sampled from replay memory
         """
-        with tf.name_scope('summaries'):
-            mean = tf.reduce_mean(var)
-            tf.scalar_summary('mean/' + name, mean)
-            with tf.name_scope('stddev'):
-                stddev = tf.sqrt(tf.reduce_sum(tf.square(var - mean)))
-            tf.scalar_summary('sttdev/' + name, stddev)
-            tf.scalar_summary('max/' + name, tf.reduce_max(var))
-            tf.scalar_summary('min/' + name, tf.reduce_min(var))
+        next_actions = self.actions(newState)
+        next_features = np.zeros((self.replay_memory.num_actions, self.feature_len))
+        next_features[:len(next_actions)] = self.toFeatureMatrix(newState, next_actions)
+        next_valid = np.arange(self.replay_memory.num_actions) < len(next_actions)
+        self.replay_memory.store(self.toFeatureVector(state, action), 0, reward,
+                                 next_features, next_valid, newState['game_state'] == STATE_GAME_OVER)
+
+        if self.numIters % self.num_static_target_steps == 0:
+            self.network.update_target()
+
+        if self.numIters % self.train_every != 0 or self.replay_memory.size() < self.batch_size:
+            return
+
+        batch = self.replay_memory.batch(self.replay_memory.sample(self.batch_size))
+        self.network.train_batch(batch['features'], batch['next_features'], batch['next_valid'],
+                                 batch['reward'], np.where(batch['done'], 0.0, self.discount))
 
 
 
@@ -461,7 +672,7 @@ class NNAgent(BaseAgent):
 class PolicyGradients(BaseAgent):
     """Approximation using policy gradients
     """
-    def __init__(self, featureExtractor, verbose, epsilon=0.5, gamma=0.993, stepSize=None):
+    def __init__(self, featureExtractor, verbose, epsilon=0.5, gamma=0.993, stepSize=None, batch_size=10):
         self.featureExtractor = featureExtractor
         self.verbose = verbose
         self.explorationProb = epsilon
@@ -474,7 +685,7 @@ class PolicyGradients(BaseAgent):
 
         self.hidden_units = 15               # num hidden layer units
         self.input_dim = 5                   # input dimensionality
-        self.batch_size = 10                 # num reward events (episodes) to process before actually applying gradient update
+        self.batch_size = batch_size         # num reward events (episodes) to process before actually applying gradient update
         self.learning_rate = 1e-4            # learning rate for rmsprop
         self.rmsprop_decay = 0.9             # rmsprop decay rate
 
@@ -482,20 +693,19 @@ class PolicyGradients(BaseAgent):
         # this is small but it's easy to scale up when we have things working. Plus, our input dimension is pretty damn small
         self.model = {}
         self.model['W1'] = np.random.randn(self.hidden_units, self.input_dim) / np.sqrt(self.input_dim)   # xavier initialization
-        # 1xN matrix so that dimensions can agree during updates 
-        self.model['W2'] = np.asmatrix(np.random.randn(self.hidden_units) / np.sqrt(self.hidden_units))   # xavier initialization
+        self.model['W2'] = np.random.randn(self.hidden_units) / np.sqrt(self.hidden_units)   # xavier initialization
 
-        # make grad buffer 1xN matrix so that dimension agrees with result of get_network_gradients()
         # buffer for adding up gradients over a batch
-        self.batch_grad_buffer = {k: np.asmatrix(np.zeros_like(v)) for k, v in self.model.iteritems()}  
+        self.batch_grad_buffer = {k: np.zeros_like(v) for k, v in self.model.iteritems()}  
         # rmsprop memory
         self.rmsprop_grad_history = {k: np.zeros_like(v) for k, v in self.model.iteritems()}  
 
         # memory devices for accumulating information in between epsodes (reward events)
-        self.observations_buffer = []       # history of observed states
-        self.hidden_states_buffer = []      # history of hidden state activations
-        self.losses_buffer = []      # history of losses 
-        self.rewards_buffer = []            # history of rewards
+        #   one row per frame, preallocated and reused across episodes
+        self.observations_buffer = EpisodeBuffer(self.input_dim)        # history of observed states
+        self.hidden_states_buffer = EpisodeBuffer(self.hidden_units)    # history of hidden state activations
+        self.losses_buffer = EpisodeBuffer()                            # history of losses 
+        self.rewards_buffer = EpisodeBuffer()                           # history of rewards
 
         # how many episodes (periods of gameplay in between rewards) have occured?
         self.episode_number = 0
@@ -505,17 +715,17 @@ class PolicyGradients(BaseAgent):
         self.cumulative_reward = 0
 
     def toFeatureVector(self, state, action):
-        """converts state/action pair to 1xN matrix for learning
+        """converts state/action pair to a length N vector for learning
         """
         features = self.featureExtractor.get_features(state, action)
-        return utils.dictToNpMatrix(features)
+        return np.array([features[k] for k in sorted(features)], dtype=np.float64)
 
     def policy_network_forward_pass(self, x):
         """Computes forward pass of the policy network.
             Policy network spits out a softmax over possible actions (i.e. P(going  left) )
             Network also uses relu activations in hidden layer
         """
-        h = np.dot(self.model['W1'], x.T)  # W1 is a row but x is also a row. we want a column so transpose
+        h = np.dot(self.model['W1'], x)
         h[h<0] = 0 # relu on hidden state
         p_left = np.dot(self.model['W2'], h)  
         p_left = utils.sigmoid(p_left)
@@ -527,7 +737,7 @@ class PolicyGradients(BaseAgent):
 
             TODO -- gradients blow up? nan?
         """
-        dW2 = np.dot(stacked_hidden_states.T, stacked_losses).ravel() # flatten with ravel
+        dW2 = np.dot(stacked_hidden_states.T, stacked_losses)
         dh = np.outer(stacked_losses, self.model['W2'])
         dh[stacked_hidden_states <= 0] = 0 # backprop prelu
         dW1 = np.dot(dh.T, stacked_observations)
@@ -537,17 +747,87 @@ class PolicyGradients(BaseAgent):
         """Given the reward history of an episode, calculate discounted
              sum of rewards for each moment in time
 
-            r_discounted[t] = r[t] + gamma * r[t-1] + gamma^2 * r[t-2] + ...
+            r_discounted[t] = r[t] + gamma * r[t+1] + gamma^2 * r[t+2] + ...
         """
-        discounted_reward = np.zeros_like(stacked_rewards)
-        tmp_reward = 0
-        for t in reversed(xrange(0, stacked_rewards.size)):
-            # TODO - THINK ABOUT THIS
-#            if stacked_rewards[t] != 0: 
-#                running_add = 0 # reset sum at game boundary (TODO - REMOVE?) 
-            tmp_reward = tmp_reward * self.discount + stacked_rewards[t]
-            discounted_reward[t] = tmp_reward
-        return discounted_reward
+        # TODO - THINK ABOUT THIS: reset sum at game boundary (nonzero reward)?
+        return utils.discountedCumsum(stacked_rewards, self.discount)
+
+    def gauges(self):
+        gauges = super(PolicyGradients, self).gauges()
+        gauges['weights'] = sum(v.size for v in self.model.itervalues())
+        gauges['running_reward'] = self.running_reward
+        return gauges
+
+    def freeze(self):
+        super(PolicyGradients, self).freeze()
+        for v in self.model.itervalues():
+            v.flags.writeable = False
+
+    def read_model(self, path):
+        model = super(PolicyGradients, self).read_model(path)
+        if not isinstance(model, model_file.ModelFile):
+            raise ValueError('%s has no policy network weights' % path)
+        model.expect('policy_network')
+        for k, v in self.model.iteritems():
+            if model.arrays[k].shape != v.shape:
+                raise ValueError('%s has %s shape %s, not %s' % (path, k, model.arrays[k].shape, v.shape))
+        self.model = {k: np.array(model.arrays[k]) for k in self.model}
+
+    def write_model(self, path):
+        super(PolicyGradients, self).write_model(path, 'policy_network', sorted(self.model.items()))
+
+    # per-frame histories of the current (unfinished) episode
+    EPISODE_BUFFERS = ['observations_buffer', 'hidden_states_buffer', 'losses_buffer', 'rewards_buffer']
+
+    def snapshot(self):
+        snapshot = super(PolicyGradients, self).snapshot()
+        arrays = snapshot['arrays']
+        for k in self.model:
+            arrays[k] = self.model[k].copy()
+            arrays['rmsprop_' + k] = self.rmsprop_grad_history[k].copy()
+            arrays['batch_grad_' + k] = self.batch_grad_buffer[k].copy()
+        for name in self.EPISODE_BUFFERS:
+            arrays[name] = getattr(self, name).view().copy()
+        snapshot['meta'].update(gameIters=self.gameIters,
+                                episode_number=self.episode_number,
+                                running_reward=self.running_reward,
+                                cumulative_reward=self.cumulative_reward)
+        return snapshot
+
+    def restore(self, snapshot):
+        super(PolicyGradients, self).restore(snapshot)
+        arrays = snapshot['arrays']
+        for k in self.model:
+            self.model[k] = np.array(arrays[k])
+            self.rmsprop_grad_history[k] = np.array(arrays['rmsprop_' + k])
+            self.batch_grad_buffer[k] = np.array(arrays['batch_grad_' + k])
+        for name in self.EPISODE_BUFFERS:
+            buffer = getattr(self, name)
+            buffer.clear()
+            for row in arrays[name]:
+                buffer.append(row)
+        meta = snapshot['meta']
+        self.gameIters = meta['gameIters']
+        self.episode_number = meta['episode_number']
+        self.running_reward = meta['running_reward']
+        self.cumulative_reward = meta['cumulative_reward']
+
+    def take_gradients(self):
+        """returns the gradients summed since the last call and resets the sum
+        """
+        grads = self.batch_grad_buffer
+        self.batch_grad_buffer = {k: np.zeros_like(v) for k, v in self.model.iteritems()}
+        return grads
+
+    def apply_gradients(self, grads):
+        """one rmsprop step along a dict of summed gradients (same keys as the model)
+        """
+        for k in self.model:
+            g = grads[k]  # get gradient for this layer
+            # rmsprop update: http://sebastianruder.com/optimizing-gradient-descent/index.html#rmsprop 
+            # also            http://www.cs.toronto.edu/~tijmen/csc321/slides/lecture_slides_lec6.pdf
+            self.rmsprop_grad_history[k] = self.rmsprop_decay * self.rmsprop_grad_history[k] + (1 - self.rmsprop_decay) * np.square(g)
+            self.model[k] += self.learning_rate * g / (np.sqrt(self.rmsprop_grad_history[k]) + self.learning_rate)
 
     def takeAction(self, state):
         """ samples an action from the distribution perscribed by policy network
@@ -559,16 +839,18 @@ class PolicyGradients(BaseAgent):
         self.numIters += 1
         self.gameIters += 1
 
-        # featurize state, convert to 1xN matrix
+        # featurize state, convert to vector
         x = self.toFeatureVector(state, INPUT_L)
 
         # ask policy network for action distribution and sample from it
         left_prob, h = self.policy_network_forward_pass(x)
         action = INPUT_L if random.random() < left_prob else INPUT_R
+        if self.frozen:
+            return action
 
         # record stuff into memory of this episode
         self.observations_buffer.append(x) 
-        self.hidden_states_buffer.append(h.T) # h is a column. remember it as a row so that it stacks nicely
+        self.hidden_states_buffer.append(h)
 
         # calculate "fake" loss that encourages action that was taken to be taken in the future
         y = 1 if action == INPUT_L else 0
@@ -594,16 +876,11 @@ class PolicyGradients(BaseAgent):
         if reward != 0:
             self.episode_number += 1
 
-            # stack all the things we've been remembering for this episode
-            stacked_observations = np.vstack(self.observations_buffer)
-            stacked_hidden_states = np.vstack(self.hidden_states_buffer) 
-            stacked_losses = np.vstack(self.losses_buffer)
-            stacked_rewards = np.vstack(self.rewards_buffer)
-            # reset memory
-            self.observations_buffer = []
-            self.hidden_states_buffer = []
-            self.losses_buffer = []
-            self.rewards_buffer = []
+            # everything we've been remembering for this episode, one row per frame
+            stacked_observations = self.observations_buffer.view()
+            stacked_hidden_states = self.hidden_states_buffer.view()
+            stacked_losses = self.losses_buffer.view().copy()
+            stacked_rewards = self.rewards_buffer.view()
 
             # compute discounted rewards back through time
             discounted_stacked_rewards = self.calc_discounted_rewards(stacked_rewards)
@@ -619,21 +896,20 @@ class PolicyGradients(BaseAgent):
 
             # get gradients
             grad = self.get_network_gradients(stacked_hidden_states, stacked_observations, stacked_losses)
+            # reset memory (the views above are dead after this)
+            self.observations_buffer.clear()
+            self.hidden_states_buffer.clear()
+            self.losses_buffer.clear()
+            self.rewards_buffer.clear()
 
             # accumulate gradients (will be used at the end of each batch)
             for k in self.model: 
                 self.batch_grad_buffer[k] += grad[k]
 
-            # rmsprop parameter update when batches are done
-            if self.episode_number % self.batch_size == 0:
-                for k, v in self.model.iteritems():
-                    g = self.batch_grad_buffer[k]  # get gradient for this layer
-                    # rmsprop update: http://sebastianruder.com/optimizing-gradient-descent/index.html#rmsprop 
-                    # also            http://www.cs.toronto.edu/~tijmen/csc321/slides/lecture_slides_lec6.pdf
-                    self.rmsprop_grad_history[k] = self.rmsprop_decay * self.rmsprop_grad_history[k] + (1 - self.rmsprop_decay) * np.square(g)
-                    self.model[k] += self.learning_rate * np.asmatrix(g) / (np.sqrt(self.rmsprop_grad_history[k]) + self.learning_rate)
-                    # reset batch gradient memory
-                    self.batch_grad_buffer[k] = np.zeros_like(v)
+            # rmsprop parameter update when batches are done. with no batch size the
+            #   caller collects gradients with take_gradients and applies them itself
+            if self.batch_size is not None and self.episode_number % self.batch_size == 0:
+                self.apply_gradients(self.take_gradients())
 
             # moving average of reward (interpolate)
             #   TODO - DO THIS INSTEAD OF CUMULATIVE REWARDS???
@@ -654,7 +930,8 @@ class DiscreteQLearning(BaseAgent):
         self.Q_values = defaultdict(lambda: defaultdict(float))
         self.gamma = gamma          # discount factor
         self.epsilon = epsilon      # randomness factor
-        self.stepSize = stepSize    # step size
+        # step size. either a constant or, like RLAgent, a function of the number of iterations
+        self.getStepSize = stepSize if callable(stepSize) else RLAgent.constant(stepSize)
         self.numIters = 1
         return
 
@@ -667,16 +944,41 @@ class DiscreteQLearning(BaseAgent):
         if random.random() < self.epsilon:
             return random.choice(actions)
 
-        state = DiscreteFeaturizer.process_state(state)
-        state = utils.serializeBinaryVector(state)
-
-        scores = [(self.Q_values[state][utils.serializeList(action)], action) for action in actions]
+        scores = zip(self.actionScores(state, actions), actions)
         # break ties with random movement
         if utils.allSame([x[0] for x in scores]):
             return random.choice(scores)[1]
         return max(scores)[1]
 
 
+    def actionScores(self, state, actions):
+        """Q-values of each action in a (raw) state
+        """
+        state = utils.serializeBinaryVector(DiscreteFeaturizer.process_state(state))
+        return [self.Q_values[state][utils.serializeList(action)] for action in actions]
+
+
+    def snapshot(self):
+        snapshot = super(DiscreteQLearning, self).snapshot()
+        # flattened to (serialized state, serialized action) keys
+        snapshot['dicts']['q_values'] = dict(((state, action), q) for state, actions in self.Q_values.iteritems()
+                                             for action, q in actions.iteritems())
+        return snapshot
+
+    def restore(self, snapshot):
+        super(DiscreteQLearning, self).restore(snapshot)
+        self.Q_values = defaultdict(lambda: defaultdict(float))
+        for (state, action), q in snapshot['dicts']['q_values'].iteritems():
+            self.Q_values[state][action] = q
+
+    def gauges(self):
+        return {'epsilon': self.epsilon, 'weights': sum(len(v) for v in self.Q_values.itervalues())}
+
+    def freeze(self):
+        super(DiscreteQLearning, self).freeze()
+        self.Q_values = utils.FrozenWeights(
+            ((k, utils.FrozenWeights(v)) for k, v in self.Q_values.iteritems()), utils.FrozenWeights())
+
     def incorporateFeedback(self, state, action, reward, newState):
         """Update Q towards interpolation between prediction and target
             for expected utility of being in state s and taking action a
@@ -691,7 +993,8 @@ class DiscreteQLearning(BaseAgent):
 
         prediction = self.Q_values[serialized_state][serialized_action]
         target = reward + self.gamma * self.Q_values[serialized_newSate][serialized_opt_action]
-        self.Q_values[serialized_state][serialized_action] = (1 - self.stepSize) * prediction + self.stepSize * target
+        stepSize = self.getStepSize(self.numIters)
+        self.Q_values[serialized_state][serialized_action] = (1 - stepSize) * prediction + stepSize * target
 
         # return None to signify this is an off-policy algorithm
         return None
@@ -711,10 +1014,20 @@ class DiscreteQLearning(BaseAgent):
 
 
     def read_model(self, path):
-        self.Q_values = super(DiscreteQLearning, self).read_model(path)
+        model = super(DiscreteQLearning, self).read_model(path)
+        if isinstance(model, model_file.ModelFile):
+            model.expect('q_table')
+            Q_values = defaultdict(lambda: defaultdict(float))
+            for (state, action), q in itertools.izip(model.keys, model.arrays['q_values'].tolist()):
+                Q_values[state][action] = q
+            model = Q_values
+        self.Q_values = model
 
     def write_model(self, path):
-        super(DiscreteQLearning, self).write_model(path, self.Q_values)
+        # flattened to one (serialized state, serialized action) key per Q-value
+        keys = [(state, action) for state, actions in self.Q_values.iteritems() for action in actions]
+        q_values = np.fromiter((self.Q_values[state][action] for state, action in keys), np.float64, len(keys))
+        super(DiscreteQLearning, self).write_model(path, 'q_table', [('q_values', q_values)], keys)
 
 
 
@@ -733,6 +1046,10 @@ class FollowBaseline(BaseAgent):
         return
 
     def takeAction(self, state):
+        if self.frozen:
+            # the game loop doesn't give frozen agents feedback, but this one
+            #   steers by it, so look at the state here instead
+            self.incorporateFeedback(state, None, 0, None)
         if self.press_space:
             self.press_space = False
             return [INPUT_SPACE]
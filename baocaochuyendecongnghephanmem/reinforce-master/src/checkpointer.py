@@ -0,0 +1,162 @@
+"""
+Periodic, asynchronous training checkpoints
+
+Between games, every N games and/or T seconds, the game loop takes a snapshot of the
+    agent (copies of its weights, replay memory, traces, optimizer state and counters)
+    along with the random number generators' states and the run's progress. A background
+    thread serializes the snapshot into a model file, so the loop only pays for the copy
+
+Starting a run with an existing checkpoint resumes it: the agent, the random number
+    generators and the game counters are restored to where the checkpoint left them
+
+"""
+import Queue
+import atexit
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+import weakref
+import numpy as np
+
+import model_file
+
+
+# checkpointers whose writer threads may still be running. weak, so a closed one (and
+#   the agent it snapshots) isn't kept alive until exit
+_checkpointers = weakref.WeakSet()
+
+
+def _close_checkpointers():
+    """don't let the interpreter exit halfway through a write"""
+    for checkpointer in list(_checkpointers):
+        checkpointer.close()
+
+atexit.register(_close_checkpointers)
+
+
+class Checkpointer(object):
+    """checkpoints agent to path every every_episodes games and/or every_seconds seconds
+        (whichever comes first). With neither, only the end of the run is checkpointed
+    """
+    def __init__(self, agent, path, every_episodes=None, every_seconds=None):
+        self.agent = agent
+        self.path = path
+        self.every_episodes = every_episodes
+        self.every_seconds = every_seconds
+        self.last_episode = 0
+        self.last_time = time.time()
+
+        self.written = 0            # checkpoints written
+        self.skipped = 0            # checkpoints dropped because the last one was still being written
+        self.snapshot_time = 0.0    # seconds the game loop spent taking snapshots
+        self.write_time = 0.0       # seconds the writer thread spent serializing them
+
+        # room for one snapshot: the loop never waits on the writer
+        self.queue = Queue.Queue(maxsize=1)
+        self.thread = threading.Thread(target=self.write_loop)
+        self.thread.daemon = True
+        self.thread.start()
+        _checkpointers.add(self)
+
+    def due(self, episode):
+        """whether a checkpoint is due after episode games"""
+        return (self.every_episodes is not None and episode - self.last_episode >= self.every_episodes) or \
+            (self.every_seconds is not None and time.time() - self.last_time >= self.every_seconds)
+
+    def save(self, progress, wait=False):
+        """snapshots the agent and queues it for writing. progress is a dict of the run's
+            counters (episode, cumulative_score, cumulative_time). with wait, blocks until
+            it has been written
+        """
+        start = time.time()
+        snapshot = self.agent.snapshot()
+        meta = snapshot['meta']
+        meta['progress'] = progress
+        meta['random_state'] = random.getstate()
+        np_state = np.random.get_state()
+        snapshot['arrays']['np_random_keys'] = np_state[1].copy()
+        meta['np_random_state'] = (np_state[0],) + tuple(np_state[2:])
+        self.snapshot_time += time.time() - start
+
+        self.last_episode = progress['episode']
+        self.last_time = time.time()
+        try:
+            self.queue.put(snapshot, block=wait)
+        except Queue.Full:
+            self.skipped += 1
+        if wait:
+            self.queue.join()
+
+    def maybe_save(self, progress):
+        if self.due(progress['episode']):
+            self.save(progress)
+
+    def write_loop(self):
+        while True:
+            snapshot = self.queue.get()
+            if snapshot is None:
+                # close()'s signal to stop
+                self.queue.task_done()
+                return
+            try:
+                start = time.time()
+                self.write(snapshot)
+                self.write_time += time.time() - start
+                self.written += 1
+            except Exception as e:
+                # keep the thread alive: the next checkpoint may well succeed
+                print >> sys.stderr, 'checkpoint to %s failed: %s' % (self.path, e)
+            finally:
+                self.queue.task_done()
+
+    def write(self, snapshot):
+        arrays = sorted(snapshot['arrays'].items())
+        keys = {}
+        for name, weights in snapshot['dicts'].iteritems():
+            keys[name] = weights.keys()
+            arrays.append(('dict_' + name, np.fromiter(weights.itervalues(), np.float64, len(weights))))
+        model_file.write(self.path, 'checkpoint', arrays, keys,
+                         dict(snapshot['meta'], agent=self.agent.__class__.__name__))
+
+    def load(self):
+        """restores the agent and random number generators from the checkpoint, if there
+            is one. returns its progress dict, or None
+        """
+        if not os.path.exists(self.path):
+            return None
+        model = model_file.read(self.path)
+        model.expect('checkpoint')
+        meta = model.meta
+        if meta['agent'] != self.agent.__class__.__name__:
+            raise ValueError('%s is a checkpoint of a %s, not a %s' %
+                             (self.path, meta['agent'], self.agent.__class__.__name__))
+
+        dicts = {}
+        for name, keys in (model.keys or {}).iteritems():
+            dicts[name] = dict(itertools.izip(keys, model.arrays.pop('dict_' + name).tolist()))
+        self.agent.restore({'meta': meta, 'arrays': model.arrays, 'dicts': dicts})
+
+        random.setstate(meta['random_state'])
+        np_state = meta['np_random_state']
+        np.random.set_state((np_state[0], np.array(model.arrays['np_random_keys'])) + tuple(np_state[1:]))
+
+        self.last_episode = meta['progress']['episode']
+        return meta['progress']
+
+    def stats(self):
+        return {
+            'checkpoints_written': self.written,
+            'checkpoints_skipped': self.skipped,
+            'checkpoint_snapshot_seconds': self.snapshot_time,
+            'checkpoint_write_seconds': self.write_time,
+        }
+
+    def close(self):
+        """waits for any pending write to finish, then stops the writer thread"""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        _checkpointers.discard(self)
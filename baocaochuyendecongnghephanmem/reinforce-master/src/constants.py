@@ -46,6 +46,24 @@ SPEED_STEP = 3
 
 # experience replay constants
 DEFAULT_REPLAY_CAPACITY = 10000
+# max number of distinct sparse features that can be densified for replay
+#   (enough for every feature set except v4: see agent_registry.FEATURE_CAPACITIES)
+DEFAULT_FEATURE_CAPACITY = 64
+# max number of candidate actions in any one state
+NUM_ACTIONS = 3
+# prioritized replay: priority exponent, initial importance sampling exponent, and
+#   the constant added to td errors so that no transition has zero priority
+DEFAULT_PRIORITY_ALPHA = 0.6
+DEFAULT_PRIORITY_BETA = 0.4
+# prioritized replay: sample() calls over which beta is annealed to 1 (linearReplayQ
+#   samples once a frame, so this is on the order of a thousand games)
+DEFAULT_PRIORITY_BETA_STEPS = 200000
+PRIORITY_EPSILON = 1e-3
+# number of minibatches the replay prefetcher keeps ready (only fills when the learner
+# is slower than sampling; see ReplayPrefetcher)
+DEFAULT_PREFETCH_DEPTH = 4
 
 # Learning constants
 MAX_GRADIENT = 5
+# smallest gamma^t utils.discountedCumsum scales rewards by (far above the denormals)
+MIN_DISCOUNT_SCALE = 1e-100
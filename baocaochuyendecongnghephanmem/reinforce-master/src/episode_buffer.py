@@ -0,0 +1,34 @@
+import numpy as np
+
+
+class EpisodeBuffer(object):
+    """growable float array of rows, for accumulating per-frame values over an episode
+
+        rows are written into preallocated storage that doubles whenever it runs out,
+            so appending is amortized O(1) and reading everything back (view()) is free.
+            clear() keeps the storage around for the next episode
+    """
+
+    def __init__(self, width=None, capacity=1024):
+        self.width = width      # None for a buffer of scalars
+        shape = (capacity,) if width is None else (capacity, width)
+        self.data = np.zeros(shape)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, row):
+        if self.size == self.data.shape[0]:
+            grown = np.zeros((2 * self.data.shape[0],) + self.data.shape[1:])
+            grown[:self.size] = self.data
+            self.data = grown
+        self.data[self.size] = row
+        self.size += 1
+
+    def view(self):
+        """everything appended since the last clear() (not a copy)"""
+        return self.data[:self.size]
+
+    def clear(self):
+        self.size = 0
@@ -0,0 +1,182 @@
+"""
+Multi-model evaluation server
+
+Scores many saved models against one shared, seeded schedule of games: game i of every
+    model is played from seed + i, so the models are compared on the same games and a
+    model's score doesn't depend on where its games were played
+
+An EvaluationServer keeps a pool of worker processes for its whole life. Every worker
+    imports the game and agents once, keeps one game it plays everything on, and keeps
+    the last MAX_LOADED_MODELS models it loaded, so scoring hundreds of models (or the
+    same ones on a new schedule) costs gameplay, not startup. A model's games are split
+    across workers when there are fewer models than workers
+
+"""
+import collections
+import math
+import multiprocessing
+import random
+import time
+import numpy as np
+
+from experiment_runner import init_worker
+from results_store import confidence_interval
+
+# models a worker keeps loaded
+MAX_LOADED_MODELS = 32
+
+# the worker's game and its loaded agents, by model
+_game = []
+_agents = collections.OrderedDict()
+
+
+def model_key(spec):
+    """what a loaded agent is good for: its player, config and the contents of its model
+        file (a file rewritten in place, like a job queue worker's, is a new model)
+    """
+    from result_cache import file_hash
+
+    return (spec['player'], file_hash(spec['read_model']), repr(sorted((spec.get('config') or {}).items())))
+
+
+def load_agent(spec):
+    """spec's frozen agent, loading its model unless this worker already has"""
+    import agent_registry
+
+    key = model_key(spec)
+    if key in _agents:
+        agent = _agents.pop(key)
+    else:
+        agent = agent_registry.build_agent(spec['player'], spec.get('config'))
+        agent.read_model(spec['read_model'])
+        agent.freeze()
+        if len(_agents) >= MAX_LOADED_MODELS:
+            _agents.popitem(last=False)[1].close()
+    _agents[key] = agent
+    return agent
+
+
+def play_schedule(job):
+    """plays one model's share of the schedule (in a worker).
+        returns (job id, per-game (score, frames, bricks), seconds)
+    """
+    import game_engine
+    from constants import INPUT_ENTER
+
+    job_id, spec, seeds = job
+    agent = load_agent(spec)
+    if not _game:
+        _game.append(game_engine.BotControlledBreakout(agent, False, False, False, 0, None, None))
+    game = _game[0]
+    game.agent = agent
+
+    start = time.time()
+    results = []
+    for seed in seeds:
+        random.seed(seed)
+        np.random.seed(seed)
+        game.play_episode()
+        results.append((game.score, game.time, len(game.bricks)))
+        game.take_input([INPUT_ENTER])
+    return job_id, results, time.time() - start
+
+
+def scheduled(specs, games, seed):
+    """specs, set up to be evaluated on games games seeded seed, seed + 1, ... (which
+        writes no models)
+    """
+    return [dict(spec, games=games, seed=seed, eval=True, schedule=True, write_model=None) for spec in specs]
+
+
+def run_scheduled(spec):
+    """plays the whole schedule of a spec from scheduled (in a worker) and returns its record"""
+    _, results, seconds = play_schedule((None, spec, range(spec['seed'], spec['seed'] + spec['games'])))
+    results = np.array(results, dtype=np.int64).reshape(-1, 3)
+    record = dict(spec, score=results[:, 0], frames=results[:, 1], bricks=results[:, 2], seconds=seconds)
+    return dict(record, stats=model_stats(record))
+
+
+def model_stats(record):
+    """summary statistics of an evaluated model's games"""
+    scores = record['score'].astype(np.float64)
+    mean, half_width = confidence_interval(len(scores), scores.sum(), (scores * scores).sum())
+    return {
+        'games': len(scores),
+        'mean_score': mean,
+        'ci95': half_width,
+        'std_score': scores.std(ddof=1) if len(scores) > 1 else float('nan'),
+        'median_score': np.median(scores),
+        'min_score': scores.min(),
+        'max_score': scores.max(),
+        'mean_frames': record['frames'].mean(),
+        'mean_bricks': record['bricks'].mean(),
+        'seconds': record['seconds'],
+    }
+
+
+class EvaluationServer(object):
+    """scores models on a pool of processes (defaults to one per core). with a cache (a
+        result_cache.ResultCache), models it has already scored on a schedule aren't
+        played again
+    """
+    def __init__(self, processes=None, quiet=True, cache=None):
+        self.processes = processes or multiprocessing.cpu_count()
+        self.pool = multiprocessing.Pool(self.processes, init_worker, (quiet,))
+        self.cache = cache
+
+    def imap(self, specs, games, seed=0):
+        """records of specs (dicts with a player, a read_model and optionally a config,
+            e.g. from experiment_runner.expand_grid) evaluated on games games seeded seed,
+            seed + 1, ...: cached ones first, then the rest as they finish. every record
+            holds its per-game arrays, like experiment_runner's, and its model_stats
+        """
+        for _, record in self.indexed(specs, games, seed):
+            yield record
+
+    def evaluate(self, specs, games, seed=0):
+        """records of specs (see imap), in spec order"""
+        records = [None] * len(specs)
+        for i, record in self.indexed(specs, games, seed):
+            records[i] = record
+        return records
+
+    def indexed(self, specs, games, seed):
+        """(index in specs, record) of every spec, as imap produces them"""
+        specs = scheduled(specs, games, seed)
+        missing = []
+        for i, spec in enumerate(specs):
+            record = self.cache.get(spec) if self.cache else None
+            if record is None:
+                missing.append(i)
+            else:
+                yield i, dict(record, stats=model_stats(record))
+        if not missing:
+            return
+
+        # split models into pieces when there are too few to keep every worker busy
+        pieces = min(games, max(1, int(math.ceil(2.0 * self.processes / len(missing)))))
+        schedule = np.arange(seed, seed + games)
+        jobs = [((i, j), specs[i], [int(s) for s in seeds]) for i in missing
+                for j, seeds in enumerate(np.array_split(schedule, pieces)) if len(seeds)]
+        remaining = collections.Counter(i for (i, _), _, _ in jobs)
+        played = collections.defaultdict(dict)
+        seconds = collections.defaultdict(float)
+        for (i, j), results, elapsed in self.pool.imap_unordered(play_schedule, jobs):
+            played[i][j] = results
+            seconds[i] += elapsed
+            remaining[i] -= 1
+            if remaining[i]:
+                continue
+            # the pieces back in schedule order
+            pieces_played = played.pop(i)
+            results = np.array([game for j in sorted(pieces_played) for game in pieces_played[j]],
+                               dtype=np.int64).reshape(-1, 3)
+            record = dict(specs[i], score=results[:, 0], frames=results[:, 1], bricks=results[:, 2],
+                          seconds=seconds.pop(i))
+            if self.cache:
+                self.cache.put(record)
+            yield i, dict(record, stats=model_stats(record))
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
@@ -0,0 +1,206 @@
+"""
+In-process experiment runner
+
+An experiment is a list of run specs, each the equivalent of one main.py invocation
+    (player, games, hyperparameters, model to read/write, evaluation mode). expand_grid
+    builds them from a declarative grid. ExperimentRunner runs them on a pool of worker
+    processes, one per core by default (or one after another in this process); every
+    worker imports the game and agents once and plays run after run on the same game, and
+    each run comes back as a record (a dict) holding its spec and per-game results as
+    arrays
+
+"""
+import itertools
+import multiprocessing
+import os
+import random
+import sys
+import time
+import numpy as np
+
+
+def expand_grid(players, games, runs=1, grid=None, config=None, **spec):
+    """one run spec per (player, combination of grid values, run number)
+
+        grid maps config keys (see agent_registry.DEFAULT_CONFIG) to lists of values to try,
+            config holds config values shared by every run. Remaining keyword arguments
+            (read_model, write_model, checkpoint, metrics, csv, eval, seed) are copied into every spec;
+            file paths are formatted with the run's player, run number and config, e.g.
+            'sarsaLambda-{trace_decay}-{run}.model'. Runs of the same player and config
+            share a config_id. With a seed, run n is seeded seed + n, so the nth runs of
+            every config see the same random numbers
+    """
+    grid = grid or {}
+    names = sorted(grid)
+    specs = []
+    for player in players:
+        for values in itertools.product(*[grid[name] for name in names]):
+            run_config = dict(config or {})
+            run_config.update(zip(names, values))
+            config_id = '-'.join([player] + ['%s=%s' % (n, v) for n, v in zip(names, values)])
+            for run in range(1, runs + 1):
+                fields = dict(run_config, player=player, run=run)
+                run_spec = dict(spec, player=player, games=games, run=run, config=run_config,
+                                config_id=config_id, run_id='%s-%s' % (config_id, run))
+                for path in ['read_model', 'write_model', 'checkpoint', 'metrics', 'csv']:
+                    if run_spec.get(path) is not None:
+                        run_spec[path] = run_spec[path].format(**fields)
+                if run_spec.get('seed') is not None:
+                    run_spec['seed'] += run
+                specs.append(run_spec)
+    return specs
+
+
+# the game this process plays its runs on
+_game = []
+
+
+def init_worker(quiet):
+    """pool initializer. quiet workers throw away what the game prints"""
+    if quiet:
+        sys.stdout = open(os.devnull, 'w')
+
+
+def run_spec(spec):
+    """plays one run (in a worker) and returns its record"""
+    import agent_registry
+    import game_engine
+
+    if spec.get('seed') is not None:
+        random.seed(spec['seed'])
+        np.random.seed(spec['seed'])
+
+    agent = agent_registry.build_agent(spec['player'], spec.get('config'))
+    if _game:
+        game = _game[0]
+        game.reuse(agent, spec['games'], spec.get('write_model'), spec.get('read_model'))
+    else:
+        game = game_engine.BotControlledBreakout(agent, False, False, False, spec['games'],
+                                                 spec.get('write_model'), spec.get('read_model'))
+        _game.append(game)
+    if spec.get('eval'):
+        agent.freeze()
+    if spec.get('checkpoint') is not None:
+        # resumes from (and checkpoints to) spec['checkpoint']: a run can be played on in
+        #   stages, each spec's games being the total to reach
+        import checkpointer
+        game.checkpointer = checkpointer.Checkpointer(agent, spec['checkpoint'])
+    metrics_server = None
+    if spec.get('metrics') is not None:
+        # serves the run's live metrics at spec['metrics'] (see metrics.MetricsServer)
+        import metrics
+        game.metrics = metrics.MetricsRing()
+        metrics_server = metrics.MetricsServer(game.metrics, spec['metrics'],
+                                               {'run_id': spec['run_id'], 'pid': os.getpid()})
+
+    start = time.time()
+    game.run()
+    if game.checkpointer:
+        game.checkpointer.close()
+    if metrics_server:
+        metrics_server.close()
+    agent.close()
+
+    return make_record(spec, game, time.time() - start)
+
+
+def run_quietly(spec):
+    """run_spec, throwing away what the game prints"""
+    stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+    try:
+        return run_spec(spec)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+
+def make_record(spec, game, seconds):
+    """a run's record: its spec, plus the per-game results of the game it played and the
+        index of the first of them (0 unless it resumed from a checkpoint)
+    """
+    results = np.array(game.episode_results, dtype=np.int64).reshape(-1, 3)
+    return dict(spec,
+                first_game=game.first_episode,
+                score=results[:, 0],
+                frames=results[:, 1],
+                bricks=results[:, 2],
+                seconds=seconds)
+
+
+def csv_lines(record):
+    """a record's games in main.py -csv format"""
+    yield 'cum_score,score,time,bricks'
+    for cum_score, score, frames, bricks in zip(np.cumsum(record['score']), record['score'],
+                                                record['frames'], record['bricks']):
+        yield '%s,%s,%s,%s' % (cum_score, score, frames, bricks)
+
+
+def write_csv(record, path):
+    """writes a record's games to path in main.py -csv format"""
+    with open(path, 'w') as f:
+        for line in csv_lines(record):
+            f.write(line + '\n')
+
+
+class ExperimentRunner(object):
+    """runs specs on a pool of processes (defaults to one per core), or one after another
+        in this process if in_process. with a cache (a result_cache.ResultCache), runs it
+        already holds aren't run again, and runs that finish are added to it. in process,
+        each run is only looked up once the runs before it have played, so a run can read
+        a model an earlier one writes
+    """
+    def __init__(self, processes=None, quiet=True, cache=None, in_process=False):
+        self.cache = cache
+        if in_process:
+            self.processes = 1
+            self.pool = None
+            self.run_one = run_quietly if quiet else run_spec
+        else:
+            self.processes = processes or multiprocessing.cpu_count()
+            self.pool = multiprocessing.Pool(self.processes, init_worker, (quiet,))
+
+    def cached(self, specs):
+        """cached records of specs (None where there isn't one)"""
+        return [self.cache.get(spec) if self.cache else None for spec in specs]
+
+    def imap(self, specs):
+        """records of specs: cached ones first, then the rest in the order they finish
+            (in process: in spec order)
+        """
+        if not self.pool:
+            for spec in specs:
+                record = self.cache.get(spec) if self.cache else None
+                if record is None:
+                    record = self.run_one(spec)
+                    if self.cache:
+                        self.cache.put(record)
+                yield record
+            return
+        records = self.cached(specs)
+        for record in records:
+            if record is not None:
+                yield record
+        missing = [spec for spec, record in zip(specs, records) if record is None]
+        for record in self.pool.imap_unordered(run_spec, missing):
+            if self.cache:
+                self.cache.put(record)
+            yield record
+
+    def run(self, specs):
+        """records of specs, in spec order"""
+        if not self.pool:
+            return list(self.imap(specs))
+        records = self.cached(specs)
+        missing = [spec for spec, record in zip(specs, records) if record is None]
+        computed = iter(self.pool.map(run_spec, missing, chunksize=1))
+        for i, record in enumerate(records):
+            if record is None:
+                records[i] = next(computed)
+                if self.cache:
+                    self.cache.put(records[i])
+        return records
+
+    def close(self):
+        if self.pool:
+            self.pool.close()
+            self.pool.join()
@@ -8,6 +8,9 @@ from collections import defaultdict
 from utils import *
 from copy import deepcopy
 import math
+import os
+import ast
+import numpy as np
 
 
 class FeatureExtractor(object):
@@ -26,6 +29,57 @@ class FeatureExtractor(object):
         pass
 
 
+class FeatureIndex(object):
+    """assigns each sparse feature key a column in a dense vector, in order of
+        first appearance. This lets sparse feature dicts be packed into fixed-width
+        numpy arrays (e.g. for replay memory) and mapped back onto sparse weights
+    """
+    def __init__(self, capacity=DEFAULT_FEATURE_CAPACITY):
+        self.capacity = capacity
+        self.columns = {}
+        self.keys = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def column(self, key):
+        """column of a feature key, allocating a new one if it's never been seen"""
+        if key not in self.columns:
+            if len(self.keys) >= self.capacity:
+                raise ValueError('feature index is full (%d features)' % self.capacity)
+            self.columns[key] = len(self.keys)
+            self.keys.append(key)
+        return self.columns[key]
+
+    def vectorize(self, features, out=None):
+        """packs a sparse feature dict into a dense vector of length capacity"""
+        if out is None:
+            out = np.zeros(self.capacity)
+        for k, v in features.iteritems():
+            out[self.column(k)] = v
+        return out
+
+    def densify(self, weights):
+        """dense vector of the weights of every indexed feature (length len(self))"""
+        return np.fromiter((weights[k] for k in self.keys), np.float64, len(self.keys))
+
+    def write(self, path):
+        """writes the feature keys to file, one repr() per line in column order"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            for k in self.keys:
+                f.write(repr(k) + '\n')
+        os.rename(tmp_path, path)
+
+    def read(self, path):
+        """reads feature keys written by write(), replacing the current columns"""
+        self.columns = {}
+        self.keys = []
+        with open(path) as f:
+            for line in f:
+                self.column(ast.literal_eval(line))
+
+
 class SimpleDiscreteFeatureExtractor(FeatureExtractor):
     def __init__(self):
         super(SimpleDiscreteFeatureExtractor, self).__init__()
@@ -329,6 +329,31 @@ class BotControlledBreakout(Breakout):
         self.agent = agent
         if self.model_path is not None:
             self.agent.read_model(self.model_path)
+        # set to a checkpointer.Checkpointer to checkpoint (and resume) training
+        self.checkpointer = None
+        # set to a phase_timer.PhaseTimer to time every phase of the game loop
+        self.phase_timer = None
+        # set to a metrics.MetricsRing to publish every game's metrics
+        self.metrics = None
+        # (score, frames, bricks) of every game run() plays, from game first_episode on
+        #   (later than 0 when it resumed from a checkpoint)
+        self.episode_results = []
+        self.first_episode = 0
+
+    def reuse(self, agent, batches, write_model, model_path):
+        """sets the game up for another run, by another agent, without building a new one"""
+        self.agent = agent
+        self.batches = batches
+        self.write_model = write_model
+        self.model_path = model_path
+        if self.model_path is not None:
+            self.agent.read_model(self.model_path)
+        self.checkpointer = None
+        self.phase_timer = None
+        self.metrics = None
+        self.episode_results = []
+        self.first_episode = 0
+        self.init_game()
 
     def run(self):
         if self.csv:
@@ -336,37 +361,58 @@ class BotControlledBreakout(Breakout):
 
         cumulative_score = 0
         cumulative_time = 0
-        for episode in xrange(self.batches):
-            new_action = None
-            prev_state = None
-            state = self.get_state()
-            while state['game_state'] != STATE_GAME_OVER:
-                # if newAction is none then we're dealing with an off-policy algorithm:
-                #    query the external acting policy for the next action.
-                # otherwise, we're training an on-policy algorithm, so take the action
-                #    specified by the agent in incorporateFeedback
-                if new_action is None:
-                    action = self.agent.takeAction(state)
-                else:
-                    action = new_action
-                reward, new_state = self.executeAction(action)
-                new_action = self.agent.incorporateFeedback(
-                    state, action, reward, new_state)
-                state = new_state
+        first_episode = 0
+        progress = self.checkpointer.load() if self.checkpointer else None
+        if progress is not None:
+            first_episode = progress['episode']
+            cumulative_score = progress['cumulative_score']
+            cumulative_time = progress['cumulative_time']
+        self.first_episode = first_episode
+
+        # the timed loop is only swapped in when timing, so not timing costs nothing
+        timer = self.phase_timer
+        play_episode = self.play_episode if timer is None else self.play_episode_timed
+
+        start = time.time()
+        for episode in xrange(first_episode, self.batches):
+            play_episode()
 
             # bookeeping...
             cumulative_score += self.score
             cumulative_time += self.time
+            self.episode_results.append((self.score, self.time, len(self.bricks)))
+            if self.metrics:
+                self.metrics.record(episode, self.score, self.time, self.agent)
 
+            output_start = time.time()
             if not self.csv:
                 print 'episode %s complete.' % episode
             if self.verbose:
                 print 'score,%s|frames,%s|bricks,%s' % (self.score, self.time, len(self.bricks))
             elif self.csv:
                 print "%s,%s,%s,%s" % (cumulative_score, self.score, self.time, len(self.bricks))
+            if timer:
+                timer.record('output', time.time() - output_start)
 
             self.take_input([INPUT_ENTER])
 
+            if self.checkpointer:
+                checkpoint_start = time.time()
+                progress = {'episode': episode + 1, 'cumulative_score': cumulative_score,
+                            'cumulative_time': cumulative_time}
+                # the last one is written before we carry on, the rest in the background
+                if episode + 1 == self.batches:
+                    self.checkpointer.save(progress, wait=True)
+                else:
+                    self.checkpointer.maybe_save(progress)
+                if timer:
+                    timer.record('checkpoint', time.time() - checkpoint_start)
+
+            if timer:
+                timer.end_episode(episode)
+
+        self.frames_per_second = cumulative_time / max(time.time() - start, 1e-9)
+
         if self.write_model is not None:
             self.agent.write_model(self.write_model)
 
@@ -376,9 +422,72 @@ class BotControlledBreakout(Breakout):
             print '\tGames: %s' % self.batches
             print '\tMean score: %s' % (cumulative_score * 1.0 / self.batches)
             print '\tMean time: %s' % (cumulative_time * 1.0 / self.batches)
+            print '\t%s frames/sec: %.0f' % ('Evaluation' if self.agent.frozen else 'Training',
+                                             self.frames_per_second)
+            agent_stats = self.agent.stats()
+            if agent_stats:
+                print 'Agent summary:'
+                for k, v in sorted(agent_stats.items()):
+                    print '\t%s: %s' % (k, v)
+            if self.checkpointer:
+                print 'Checkpoint summary:'
+                for k, v in sorted(self.checkpointer.stats().items()):
+                    print '\t%s: %s' % (k, v)
+
+        if timer:
+            timer.close()
+            # stderr, so it doesn't end up in -csv output
+            timer.report()
 
         self.take_input([INPUT_QUIT])
 
+    def play_episode(self):
+        """plays one game, the agent learning from it unless it's frozen"""
+        new_action = None
+        state = self.get_state()
+        while state['game_state'] != STATE_GAME_OVER:
+            # if newAction is none then we're dealing with an off-policy algorithm:
+            #    query the external acting policy for the next action.
+            # otherwise, we're training an on-policy algorithm, so take the action
+            #    specified by the agent in incorporateFeedback
+            if new_action is None:
+                action = self.agent.takeAction(state)
+            else:
+                action = new_action
+            reward, new_state = self.executeAction(action)
+            # frozen agents are only being evaluated: no learning
+            if not self.agent.frozen:
+                new_action = self.agent.incorporateFeedback(
+                    state, action, reward, new_state)
+            state = new_state
+
+    def play_episode_timed(self):
+        """play_episode, timing every call into self.phase_timer"""
+        clock = time.time
+        durations = self.phase_timer.durations
+        record_action = durations['takeAction'].append
+        record_execute = durations['executeAction'].append
+        record_feedback = durations['incorporateFeedback'].append
+
+        new_action = None
+        state = self.get_state()
+        while state['game_state'] != STATE_GAME_OVER:
+            if new_action is None:
+                start = clock()
+                action = self.agent.takeAction(state)
+                record_action(clock() - start)
+            else:
+                action = new_action
+            start = clock()
+            reward, new_state = self.executeAction(action)
+            record_execute(clock() - start)
+            if not self.agent.frozen:
+                start = clock()
+                new_action = self.agent.incorporateFeedback(
+                    state, action, reward, new_state)
+                record_feedback(clock() - start)
+            state = new_state
+
 
 class OracleControlledBreakout(Breakout):
     """Breakout subclass for oracle-controlled games.
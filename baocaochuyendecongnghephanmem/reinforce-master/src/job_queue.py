@@ -0,0 +1,290 @@
+"""
+Job queue for spreading experiments over several machines
+
+A Coordinator is a drop-in for ExperimentRunner (imap, run, close) that, instead of a
+    local pool, hands its run specs out over TCP to Workers on any number of hosts (see
+    test_scripts/job_worker.py). Jobs are training or evaluation run specs, as built by
+    experiment_runner.expand_grid or evaluation_server.scheduled, and their records
+    stream back to whoever iterates over imap, typically into a ResultsStore
+
+The protocol is newline-delimited JSON over one connection per worker. A worker asks for
+    a job ('get') and is sent one ('job'), told to ask again later ('wait') or told to
+    stop ('exit'). While it plays a job it sends a 'heartbeat' every HEARTBEAT_SECONDS,
+    then the job's 'result' (or 'failed', with the traceback). A worker that disconnects
+    or goes quiet for longer than the coordinator's timeout is taken for dead, and its
+    job goes back to the front of the queue, up to max_attempts times
+
+Model files travel with the jobs, so the hosts share no filesystem: a job carries the
+    model it reads, and a result carries the model it wrote, which the coordinator saves
+    at the spec's write_model path
+
+"""
+import base64
+import collections
+import json
+import os
+import Queue
+import shutil
+import socket
+import SocketServer
+import tempfile
+import threading
+import time
+import traceback
+import numpy as np
+
+# a working worker says so this often
+HEARTBEAT_SECONDS = 5
+# an idle worker asks for work this often
+POLL_SECONDS = 1
+
+
+def split_address(address, default_host='127.0.0.1'):
+    """(host, port) of a port or host:port"""
+    host, _, port = address.rpartition(':')
+    return host or default_host, int(port)
+
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return base64.b64encode(f.read())
+
+
+def write_file(path, data):
+    """writes base64 data to path, all at once (via a temporary file)"""
+    with open(path + '.tmp', 'wb') as f:
+        f.write(base64.b64decode(data))
+    os.rename(path + '.tmp', path)
+
+
+class JobHandler(SocketServer.StreamRequestHandler):
+    """one connected worker: hands it jobs, and takes its results"""
+    def handle(self):
+        coordinator = self.server.coordinator
+        worker = '%s:%s' % self.client_address[:2]
+        self.request.settimeout(coordinator.timeout)
+        job = None
+        try:
+            for line in iter(self.rfile.readline, ''):
+                message = json.loads(line)
+                if message['op'] == 'get':
+                    if coordinator.closing:
+                        self.send({'op': 'exit'})
+                        return
+                    job = coordinator.next_job()
+                    if job is None:
+                        self.send({'op': 'wait'})
+                    else:
+                        self.send({'op': 'job', 'id': job['id'], 'spec': job['spec'],
+                                   'model': read_file(job['spec']['read_model'])
+                                   if job['spec'].get('read_model') else None})
+                elif message['op'] == 'result':
+                    coordinator.finish(job, message)
+                    job = None
+                elif message['op'] == 'failed':
+                    coordinator.retry(job, 'failed on %s:\n%s' % (worker, message['error']))
+                    job = None
+                # heartbeats only keep the connection from timing out
+        except (socket.error, ValueError):
+            pass
+        finally:
+            if job is not None:
+                coordinator.retry(job, 'lost worker %s' % worker)
+
+    def send(self, message):
+        self.wfile.write(json.dumps(message) + '\n')
+
+
+class JobServer(SocketServer.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class Coordinator(object):
+    """hands specs out to the workers that connect to address (a port or host:port; use
+        0.0.0.0:port to take workers from other machines). workers that are lost (no word
+        for timeout seconds) have their job retried; a job that fails max_attempts times
+        fails the experiment. with a cache (a result_cache.ResultCache), cached runs
+        aren't handed out
+    """
+    def __init__(self, address, cache=None, timeout=6 * HEARTBEAT_SECONDS, max_attempts=3):
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.cache = cache
+        self.lock = threading.Lock()
+        self.pending = collections.deque()
+        self.next_id = 0
+        self.closing = False
+        self.jobs_done = 0
+        self.retries = 0
+
+        self.server = JobServer(split_address(address), JobHandler)
+        self.server.coordinator = self
+        self.address = '%s:%s' % self.server.server_address[:2]
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def next_job(self):
+        """a waiting job, or None"""
+        with self.lock:
+            if not self.pending:
+                return None
+            job = self.pending.popleft()
+            job['attempts'] += 1
+            return job
+
+    def retry(self, job, error):
+        with self.lock:
+            self.retries += 1
+            if job['attempts'] >= self.max_attempts:
+                job['results'].put((job, None, error))
+            else:
+                self.pending.appendleft(job)
+
+    def finish(self, job, message):
+        spec = job['spec']
+        if message['model'] is not None:
+            write_file(spec['write_model'], message['model'])
+        results = message['results']
+        record = dict(results, **spec)
+        for column in ['score', 'frames', 'bricks']:
+            record[column] = np.array(results[column], dtype=np.int64)
+        with self.lock:
+            self.jobs_done += 1
+        job['results'].put((job, record, None))
+
+    def indexed(self, specs):
+        """(index in specs, record) of every spec, as imap produces them"""
+        for spec in specs:
+            if spec.get('checkpoint') is not None:
+                raise ValueError('%s checkpoints to a local file: it can only run on an ExperimentRunner'
+                                 % spec['run_id'])
+
+        results = Queue.Queue()
+        jobs = []
+        for i, spec in enumerate(specs):
+            record = self.cache.get(spec) if self.cache else None
+            if record is None:
+                jobs.append({'id': self.next_id, 'index': i, 'spec': spec, 'attempts': 0, 'results': results})
+                self.next_id += 1
+            else:
+                yield i, record
+        with self.lock:
+            self.pending.extend(jobs)
+
+        for _ in jobs:
+            # a timeout keeps the wait interruptible
+            job, record, error = results.get(True, 1e9)
+            if record is None:
+                with self.lock:
+                    self.pending = collections.deque(j for j in self.pending if j['results'] is not results)
+                raise RuntimeError('%s failed after %d attempts: %s' % (job['spec'].get('run_id'),
+                                                                        job['attempts'], error))
+            if self.cache:
+                self.cache.put(record)
+            yield job['index'], record
+
+    def imap(self, specs):
+        """records of specs: cached ones first, then the rest in the order they finish"""
+        for _, record in self.indexed(specs):
+            yield record
+
+    def run(self, specs):
+        """records of specs, in spec order"""
+        records = [None] * len(specs)
+        for i, record in self.indexed(specs):
+            records[i] = record
+        return records
+
+    def stats(self):
+        return {'jobs_done': self.jobs_done, 'retries': self.retries}
+
+    def close(self):
+        """tells the workers to stop (as they next ask for work) and stops serving"""
+        with self.lock:
+            self.closing = True
+        # give connected workers a poll to hear it
+        time.sleep(2 * POLL_SECONDS)
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Worker(object):
+    """plays the jobs the Coordinator at address hands out, until it says to stop"""
+    def __init__(self, address):
+        self.address = split_address(address)
+        self.lock = threading.Lock()
+
+    def send(self, message):
+        with self.lock:
+            self.socket.sendall(json.dumps(message) + '\n')
+
+    def heartbeat(self, stop):
+        while not stop.wait(HEARTBEAT_SECONDS):
+            self.send({'op': 'heartbeat'})
+
+    def run(self):
+        # the coordinator may not be up yet
+        while True:
+            try:
+                self.socket = socket.create_connection(self.address)
+                break
+            except socket.error:
+                time.sleep(POLL_SECONDS)
+        lines = self.socket.makefile('rb')
+        workdir = tempfile.mkdtemp(prefix='job_worker')
+        try:
+            while True:
+                self.send({'op': 'get'})
+                line = lines.readline()
+                if not line:
+                    return
+                message = json.loads(line)
+                if message['op'] == 'exit':
+                    return
+                if message['op'] == 'wait':
+                    time.sleep(POLL_SECONDS)
+                    continue
+                self.play(message, workdir)
+        finally:
+            lines.close()
+            self.socket.close()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def play(self, job, workdir):
+        """runs a job's spec, with heartbeats, and sends back its result"""
+        import evaluation_server
+        import experiment_runner
+
+        spec = dict(job['spec'])
+        # the job's model files live in workdir while it runs
+        if job['model'] is not None:
+            spec['read_model'] = os.path.join(workdir, 'read.model')
+            write_file(spec['read_model'], job['model'])
+        if spec.get('write_model') is not None:
+            spec['write_model'] = os.path.join(workdir, 'write.model')
+            if os.path.exists(spec['write_model']):
+                os.remove(spec['write_model'])
+
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self.heartbeat, args=(stop,))
+        heartbeat.daemon = True
+        heartbeat.start()
+        try:
+            run = evaluation_server.run_scheduled if spec.get('schedule') else experiment_runner.run_spec
+            record = run(spec)
+        except Exception:
+            self.send({'op': 'failed', 'error': traceback.format_exc()})
+            return
+        finally:
+            stop.set()
+            heartbeat.join()
+        results = {'seconds': record['seconds'], 'first_game': record.get('first_game', 0)}
+        for column in ['score', 'frames', 'bricks']:
+            results[column] = record[column].tolist()
+        if 'stats' in record:
+            results['stats'] = record['stats']
+        self.send({'op': 'result', 'results': results,
+                   'model': read_file(spec['write_model']) if spec.get('write_model') is not None and
+                   os.path.exists(spec['write_model']) else None})
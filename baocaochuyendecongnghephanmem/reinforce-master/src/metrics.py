@@ -0,0 +1,165 @@
+"""
+Live metrics for long training runs
+
+The game loop records one row per game into a MetricsRing: score, frames, frames/sec,
+    agent iterations/sec and the agent's gauges (weight table size, replay memory fill,
+    epsilon, running reward). A MetricsServer thread serves the ring over HTTP, on a TCP
+    port or a unix socket, so a watcher can scrape many runs without touching their
+    game loops
+
+The ring has a single writer and takes no locks. A row is written with one numpy
+    assignment (atomic under the GIL) before the row count is bumped, and readers copy
+    rows the same way, then drop any the writer lapped while they were copying
+
+"""
+import BaseHTTPServer
+import SocketServer
+import httplib
+import json
+import math
+import os
+import socket
+import threading
+import time
+import urlparse
+import numpy as np
+
+# agent values recorded with every game. see BaseAgent.gauges
+GAUGES = ['weights', 'replay_fill', 'epsilon', 'running_reward']
+
+DTYPE = np.dtype([
+    ('episode', np.int64),
+    ('time', np.float64),               # unix time the game ended
+    ('score', np.int64),
+    ('frames', np.int64),
+    ('frames_per_sec', np.float64),
+    ('iters_per_sec', np.float64),      # agent numIters per second
+] + [(gauge, np.float64) for gauge in GAUGES])
+
+
+class MetricsRing(object):
+    """the metrics of the last capacity games"""
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.rows = np.zeros(capacity, dtype=DTYPE)
+        self.count = 0      # rows ever written. row i lives at i % capacity
+        self.last_time = time.time()
+        self.last_iters = None
+
+    def record(self, episode, score, frames, agent):
+        """adds a game's row. called by the game loop when a game ends"""
+        now = time.time()
+        seconds = max(now - self.last_time, 1e-9)
+        iters = getattr(agent, 'numIters', None)
+        iters_per_sec = (iters - self.last_iters) / seconds if iters is not None and self.last_iters is not None else np.nan
+        gauges = agent.gauges()
+        self.rows[self.count % self.capacity] = (
+            (episode, now, score, frames, frames / seconds, iters_per_sec) +
+            tuple(np.nan if gauges.get(gauge) is None else gauges[gauge] for gauge in GAUGES))
+        self.count += 1
+        self.last_time = now
+        self.last_iters = iters
+
+    def read(self, since=0):
+        """(rows written after the first since, oldest first, and the count to pass as
+            since next time). at most the last capacity rows are still there
+        """
+        count = self.count
+        first = max(since, count - self.capacity)
+        rows = self.rows[np.arange(first, count) % self.capacity]
+        # rows the writer overwrote while they were being copied are gone
+        lapped = max(self.count - self.capacity - first, 0)
+        return rows[lapped:], count
+
+
+def to_json(rows):
+    """rows as a list of dicts, NaN (unknown) as None"""
+    return [dict((name, None if isinstance(v, float) and math.isnan(v) else v)
+                 for name, v in zip(DTYPE.names, row)) for row in rows.tolist()]
+
+
+class MetricsHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """GET /metrics[?since=N]: {'labels': ..., 'count': N, 'rows': [...]}"""
+    def do_GET(self):
+        url = urlparse.urlparse(self.path)
+        if url.path != '/metrics':
+            self.send_error(404)
+            return
+        since = int(urlparse.parse_qs(url.query).get('since', ['0'])[0])
+        rows, count = self.server.ring.read(since)
+        body = json.dumps({'labels': self.server.labels, 'count': count, 'rows': to_json(rows)})
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # the run's own output is on stdout/stderr; keep scrapes out of it
+        pass
+
+
+class TCPMetricsServer(BaseHTTPServer.HTTPServer):
+    allow_reuse_address = True
+
+
+class UnixMetricsServer(SocketServer.UnixStreamServer):
+    pass
+
+
+def is_unix_address(address):
+    return '/' in address or address.endswith('.sock')
+
+
+class MetricsServer(object):
+    """serves ring from a background thread. address is a port, host:port, or the
+        path of a unix socket (anything with a / in it, or ending in .sock)
+    """
+    def __init__(self, ring, address, labels=None):
+        self.address = address
+        if is_unix_address(address):
+            if os.path.exists(address):
+                os.remove(address)
+            self.server = UnixMetricsServer(address, MetricsHandler)
+        else:
+            host, _, port = address.rpartition(':')
+            self.server = TCPMetricsServer((host or '127.0.0.1', int(port)), MetricsHandler)
+        self.server.ring = ring
+        self.server.labels = labels or {}
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if is_unix_address(self.address) and os.path.exists(self.address):
+            os.remove(self.address)
+
+
+class UnixHTTPConnection(httplib.HTTPConnection):
+    def __init__(self, path, timeout):
+        httplib.HTTPConnection.__init__(self, 'localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+def scrape(address, since=0, timeout=5):
+    """fetches a MetricsServer's rows (see MetricsHandler)"""
+    if is_unix_address(address):
+        connection = UnixHTTPConnection(address, timeout)
+    else:
+        host, _, port = address.rpartition(':')
+        connection = httplib.HTTPConnection(host or '127.0.0.1', int(port), timeout=timeout)
+    try:
+        connection.request('GET', '/metrics?since=%d' % since)
+        response = connection.getresponse()
+        if response.status != 200:
+            raise IOError('%s answered %s %s' % (address, response.status, response.reason))
+        return json.loads(response.read())
+    finally:
+        connection.close()
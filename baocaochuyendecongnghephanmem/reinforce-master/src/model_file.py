@@ -0,0 +1,114 @@
+"""
+Binary model files
+
+A model file is a fixed-size prefix (magic, version, offset of the array data), a
+    repr()'d header dict describing the model and where its arrays live, then the raw
+    arrays, each aligned to 64 bytes. Sparse models also store their feature keys, as a
+    marshalled list in a uint8 array, so the weights can be a plain float64 array
+
+Files are written to a temporary path and renamed into place, so a reader never sees a
+    half-written model. Arrays are memory-mapped on read rather than loaded
+
+"""
+import ast
+import gc
+import marshal
+import os
+import struct
+import numpy as np
+
+MAGIC = 'RLMODEL\x00'
+VERSION = 1
+PREFIX = struct.Struct('<8sqq')     # magic, version, offset of the first array
+ALIGN = 64
+
+
+def align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+class ModelFile(object):
+    """what read() returns: the model's format name, a dict of scalar metadata,
+        a dict of (memory-mapped) arrays, and the feature keys if it has them
+    """
+    def __init__(self, path, format, meta, arrays, keys):
+        self.path = path
+        self.format = format
+        self.meta = meta
+        self.arrays = arrays
+        self.keys = keys
+
+    def expect(self, format):
+        """raises unless this file holds a model of the given format"""
+        if self.format != format:
+            raise ValueError('%s holds a %s model, not a %s model' % (self.path, self.format, format))
+
+
+def is_model_file(path):
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def write(path, format, arrays=(), keys=None, meta=None):
+    """atomically writes a model file. arrays is a list of (name, array) pairs,
+        keys optional feature keys: a list of strings, numbers and tuples of them
+        (or a dict of such lists)
+    """
+    arrays = [(name, np.array(array, copy=False, order='C')) for name, array in arrays]
+    if keys is not None:
+        keys = keys if isinstance(keys, dict) else list(keys)
+        arrays.append(('keys', np.frombuffer(marshal.dumps(keys, 2), dtype=np.uint8)))
+
+    layout = []
+    offset = 0
+    for name, array in arrays:
+        # record arrays (e.g. replay memory) need their field layout, not just their size
+        dtype = array.dtype.descr if array.dtype.fields else array.dtype.str
+        layout.append((name, dtype, array.shape, offset))
+        offset = align(offset + array.nbytes)
+    header = repr({'format': format, 'meta': meta or {}, 'arrays': layout})
+    data_start = align(PREFIX.size + len(header))
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(PREFIX.pack(MAGIC, VERSION, data_start))
+        f.write(header)
+        for (name, array), (_, _, _, offset) in zip(arrays, layout):
+            f.seek(data_start + offset)
+            f.write(array.data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(tmp_path, path)
+
+
+def read(path, mmap_mode='r'):
+    """reads a model file, memory-mapping its arrays with mmap_mode
+        ('r' read-only, 'c' copy-on-write)
+    """
+    with open(path, 'rb') as f:
+        magic, version, data_start = PREFIX.unpack(f.read(PREFIX.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('%s is not a version %d model file' % (path, VERSION))
+        header = ast.literal_eval(f.read(data_start - PREFIX.size).rstrip('\x00'))
+
+    arrays = {}
+    for name, dtype, shape, offset in header['arrays']:
+        if np.prod(shape) == 0:
+            # mmap can't map zero bytes
+            arrays[name] = np.zeros(shape, dtype=np.dtype(dtype))
+        else:
+            # (memmap reads an empty shape as "the rest of the file", so map scalars as (1,))
+            arrays[name] = np.memmap(path, dtype=np.dtype(dtype), mode=mmap_mode,
+                                     offset=data_start + offset, shape=shape or (1,)).reshape(shape)
+    keys = None
+    if 'keys' in arrays:
+        # unmarshalling millions of key tuples would otherwise set off a garbage
+        #   collection every few hundred of them, each walking the whole heap
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            keys = marshal.loads(arrays.pop('keys').tobytes())
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+    return ModelFile(path, header['format'], header['meta'], arrays, keys)
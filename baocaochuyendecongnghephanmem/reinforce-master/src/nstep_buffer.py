@@ -0,0 +1,52 @@
+from collections import deque
+
+
+class NStepBuffer(object):
+    """turns a stream of one-step transitions into n-step transitions
+
+        keeps a rolling window of the last n transitions along with the discounted
+            sum of their rewards, so each push is O(1). Once the window is full, every
+            push emits (s_t, a_t, r_t + gamma r_{t+1} + ... + gamma^{n-1} r_{t+n-1}, s_{t+n}, done).
+            When a transition ends the game, everything left in the window is emitted
+            with a truncated return and done set, so nothing bootstraps across games
+
+        with n = 1 this emits exactly the transitions it's given
+    """
+
+    def __init__(self, n, gamma):
+        self.n = n
+        self.gamma = gamma
+        self.window = deque()   # (features, action, reward) of the oldest transitions not yet emitted
+        self.window_return = 0.0
+        self.gamma_n = gamma ** n
+
+    def __len__(self):
+        return len(self.window)
+
+    def push(self, features, action, reward, next_features, next_valid, done):
+        """add a one-step transition. returns a list of the n-step transitions (same field order)
+            that are now complete
+        """
+        self.window_return += self.gamma ** len(self.window) * reward
+        self.window.append((features, action, reward))
+
+        emitted = []
+        if len(self.window) == self.n:
+            emitted.append(self.pop(next_features, next_valid, done))
+        if done:
+            while self.window:
+                emitted.append(self.pop(next_features, next_valid, done))
+            self.window_return = 0.0    # start the next game free of round-off
+        return emitted
+
+    def pop(self, next_features, next_valid, done):
+        """emit the oldest transition in the window and slide the window forward"""
+        features, action, reward = self.window.popleft()
+        transition = (features, action, self.window_return, next_features, next_valid, done)
+        self.window_return = (self.window_return - reward) / self.gamma if self.window else 0.0
+        return transition
+
+    def clear(self):
+        """drop everything in the window"""
+        self.window.clear()
+        self.window_return = 0.0
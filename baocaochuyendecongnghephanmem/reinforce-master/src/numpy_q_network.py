@@ -0,0 +1,128 @@
+"""
+Numpy backend for NNAgent's Q-network. Same network and training rule as the
+tensorflow backend, without the per-call session overhead (or the tensorflow import)
+
+"""
+import numpy as np
+
+
+def sigmoid(x):
+    """elementwise sigmoid of an array"""
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+class NumpyQNetwork(object):
+    """input_size -> 16 -> 1 sigmoid network estimating Q(s, a) from a feature row,
+        trained with exponentially decaying SGD. Every method works on a batch of
+        rows so that scoring all of a state's actions is one pass
+
+        mirrors TFQNetwork: same initialization distribution, loss, learning rate schedule
+            and (with replay=True) target network
+    """
+    hidden_units = 16
+    starter_learning_rate = 0.1
+    decay_steps = 10000
+    decay_rate = 0.96
+
+    def __init__(self, input_size, verbose, num_actions, replay=False):
+        self.input_size = input_size
+        self.verbose = verbose
+        self.num_actions = num_actions
+        self.weights = [
+            np.random.randn(input_size, self.hidden_units),  # w_0
+            np.random.randn(self.hidden_units),              # b_0
+            np.random.randn(self.hidden_units, 1),           # w_1
+            np.random.randn(1),                              # b_1
+        ]
+        # like tensorflow's global steps, one per training mode
+        self.global_step = 0
+        self.batch_global_step = 0
+        self.target_weights = [w.copy() for w in self.weights] if replay else None
+
+    def learning_rate(self, step):
+        """staircase exponential decay"""
+        return self.starter_learning_rate * self.decay_rate ** (step // self.decay_steps)
+
+    def forward(self, x, weights=None):
+        """forward pass over a matrix of feature rows. returns (Q-values column, hidden activations)
+        """
+        w_0, b_0, w_1, b_1 = self.weights if weights is None else weights
+        h = sigmoid(np.dot(x, w_0) + b_0)
+        return sigmoid(np.dot(h, w_1) + b_1), h
+
+    def q_values(self, features):
+        """Network forward pass over a matrix of feature rows. returns a vector of Q-values
+        """
+        return self.forward(np.asarray(features))[0][:, 0]
+
+    def sgd_step(self, x, d_output, h, output, learning_rate):
+        """backprop d(loss)/d(output) through the network and take a gradient step"""
+        w_0, b_0, w_1, b_1 = self.weights
+        d_z1 = d_output * output * (1 - output)
+        d_h = np.dot(d_z1, w_1.T)
+        d_z0 = d_h * h * (1 - h)
+        grads = [np.dot(x.T, d_z0), d_z0.sum(axis=0), np.dot(h.T, d_z1), d_z1.sum(axis=0)]
+        for w, g in zip(self.weights, grads):
+            w -= learning_rate * g
+
+    def train(self, features, next_features, reward, bootstrap):
+        """one SGD step on a single transition towards r + bootstrap * max Q(s', .),
+            where next_features has one row per next-state action
+        """
+        x = np.asarray(features)
+        target = reward + bootstrap * self.q_values(next_features).max()
+        output, h = self.forward(x)
+        # loss = sum((output - target)^2)
+        self.sgd_step(x, 2 * (output - target), h, output, self.learning_rate(self.global_step))
+        self.global_step += 1
+
+    def train_batch(self, features, next_features, next_valid, rewards, bootstrap):
+        """one SGD step on a minibatch, with targets from the target network.
+            next_features is batch x num_actions x input_size, masked by next_valid
+        """
+        batch_size = features.shape[0]
+        next_q = self.forward(next_features.reshape(-1, self.input_size), self.target_weights)[0]
+        # Q-values are sigmoids in [0, 1], so pushing invalid rows down by 2 rules them out
+        next_q = next_q.reshape(batch_size, self.num_actions) - 2.0 * (1.0 - next_valid)
+        targets = (rewards + bootstrap * next_q.max(axis=1))[:, np.newaxis]
+
+        output, h = self.forward(features)
+        # loss = mean((output - target)^2)
+        self.sgd_step(features, 2 * (output - targets) / batch_size, h, output,
+                      self.learning_rate(self.batch_global_step))
+        self.batch_global_step += 1
+
+    def update_target(self):
+        """copy the current weights into the target network"""
+        self.target_weights = [w.copy() for w in self.weights]
+
+    def get_weights(self):
+        """current weights as a list of numpy arrays [w_0, b_0, w_1, b_1]"""
+        return [w.copy() for w in self.weights]
+
+    def snapshot(self):
+        """copies of everything training changes (weights, target weights, global steps)"""
+        state = [w.copy() for w in self.weights] + [np.array([self.global_step, self.batch_global_step])]
+        if self.target_weights is not None:
+            state += [w.copy() for w in self.target_weights]
+        return state
+
+    def restore(self, state):
+        """load a snapshot() back in"""
+        self.weights = [np.array(w, dtype=np.float64) for w in state[:4]]
+        self.global_step, self.batch_global_step = [int(s) for s in state[4]]
+        if self.target_weights is not None:
+            self.target_weights = [np.array(w, dtype=np.float64) for w in state[5:]]
+
+    def close(self):
+        """nothing to release (TFQNetwork closes its session)"""
+        pass
+
+    def freeze(self):
+        """make the weights read-only"""
+        for w in self.weights:
+            w.flags.writeable = False
+
+    def set_weights(self, weights):
+        """overwrite the current weights with a list of numpy arrays [w_0, b_0, w_1, b_1]"""
+        self.weights = [np.array(w, dtype=np.float64) for w in weights]
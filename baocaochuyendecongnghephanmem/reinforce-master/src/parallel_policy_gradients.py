@@ -0,0 +1,176 @@
+"""
+Parallel episode collection for PolicyGradients
+
+The parent process owns the policy (W1/W2 and the rmsprop history). Every update it
+    sends a copy of the weights to its worker processes, each worker plays its share of
+    the batch's reward events in its own headless game, and sends back its summed
+    gradients. The parent adds them up and takes one rmsprop step, exactly as if one
+    agent had played the whole batch
+
+Worker i always plays the ith share, and is seeded from the run's seed and i, so a run
+    is reproducible from its seed and number of workers
+
+"""
+import multiprocessing
+import random
+import time
+import traceback
+import numpy as np
+
+from constants import *
+
+# each worker process keeps its own agent and game between updates, so a game that's
+#   still going when a worker hits its quota picks up where it left off next update
+_worker = {}
+
+
+def init_worker(featureExtractor, gamma, seed, index):
+    """builds the worker's agent and game, seeded from the run's seed and the worker's index"""
+    from agents import PolicyGradients
+    from game_engine import BotControlledBreakout
+
+    random.seed((seed, index))
+    np.random.seed([seed % 2 ** 32, index])
+    # no batch size: the worker only collects gradients, the parent applies them
+    agent = PolicyGradients(featureExtractor, False, gamma=gamma, batch_size=None)
+    _worker['agent'] = agent
+    _worker['game'] = BotControlledBreakout(agent, False, False, False, 0, None, None)
+
+
+def collect_gradients(args):
+    """plays num_episodes reward events with the given weights.
+        returns (summed gradients, [(score, frames, bricks) of every game that finished])
+    """
+    model, num_episodes = args
+    agent, game = _worker['agent'], _worker['game']
+    agent.model = model
+
+    games = []
+    start = agent.episode_number
+    state = game.get_state()
+    while agent.episode_number - start < num_episodes:
+        action = agent.takeAction(state)
+        reward, new_state = game.executeAction(action)
+        agent.incorporateFeedback(state, action, reward, new_state)
+        state = new_state
+        if state['game_state'] == STATE_GAME_OVER:
+            games.append((game.score, game.time, len(game.bricks)))
+            game.take_input([INPUT_ENTER])
+            state = game.get_state()
+    return agent.take_gradients(), games
+
+
+def serve(conn, featureExtractor, gamma, seed, index):
+    """a worker process: plays the jobs the parent sends down conn, until it sends None"""
+    init_worker(featureExtractor, gamma, seed, index)
+    for job in iter(conn.recv, None):
+        try:
+            conn.send((collect_gradients(job), None))
+        except Exception:
+            conn.send((None, traceback.format_exc()))
+
+
+class ParallelPolicyGradients(object):
+    """trains a PolicyGradients agent with episode collection spread over num_workers
+        processes (defaults to one per core)
+    """
+    def __init__(self, agent, num_workers=None, seed=0):
+        self.agent = agent
+        self.num_workers = num_workers or multiprocessing.cpu_count()
+        self.conns = []
+        self.workers = []
+        for i in range(self.num_workers):
+            conn, worker_conn = multiprocessing.Pipe()
+            worker = multiprocessing.Process(target=serve, args=(
+                worker_conn, agent.featureExtractor, agent.discount, seed, i))
+            worker.daemon = True
+            worker.start()
+            self.conns.append(conn)
+            self.workers.append(worker)
+        self.num_updates = 0
+        self.update_time = 0.0
+
+    def split_batch(self):
+        """how many reward events each worker plays per update"""
+        quota, extra = divmod(self.agent.batch_size, self.num_workers)
+        return [quota + (1 if i < extra else 0) for i in range(self.num_workers)]
+
+    def update(self):
+        """one policy update: fan out, sum gradients, rmsprop step.
+            returns the games that finished along the way
+        """
+        start = time.time()
+        # worker i plays share i, every update
+        jobs = [(conn, n) for conn, n in zip(self.conns, self.split_batch()) if n > 0]
+        for conn, n in jobs:
+            conn.send((self.agent.model, n))
+        results = []
+        for conn, _ in jobs:
+            result, error = conn.recv()
+            if error is not None:
+                raise RuntimeError('policy gradient worker failed:\n%s' % error)
+            results.append(result)
+
+        grads = {k: np.zeros_like(v) for k, v in self.agent.model.iteritems()}
+        games = []
+        for worker_grads, worker_games in results:
+            for k in grads:
+                grads[k] += worker_grads[k]
+            games += worker_games
+        self.agent.apply_gradients(grads)
+        self.agent.episode_number += self.agent.batch_size
+
+        self.num_updates += 1
+        self.update_time += time.time() - start
+        return games
+
+    def stats(self):
+        return {
+            'workers': self.num_workers,
+            'policy_updates': self.num_updates,
+            'mean_update_seconds': self.update_time / max(self.num_updates, 1),
+        }
+
+    def run(self, batches, csv=False, verbose=False, write_model=None):
+        """plays (at least) batches games, reporting them like BotControlledBreakout.run"""
+        if csv:
+            print 'cum_score,score,time,bricks'
+
+        cumulative_score = 0
+        cumulative_time = 0
+        episode = 0
+        while episode < batches:
+            for score, frames, bricks in self.update():
+                if episode == batches:
+                    break
+                cumulative_score += score
+                cumulative_time += frames
+
+                if not csv:
+                    print 'episode %s complete.' % episode
+                if verbose:
+                    print 'score,%s|frames,%s|bricks,%s' % (score, frames, bricks)
+                elif csv:
+                    print "%s,%s,%s,%s" % (cumulative_score, score, frames, bricks)
+                episode += 1
+
+        self.close()
+
+        if write_model is not None:
+            self.agent.write_model(write_model)
+
+        if verbose:
+            print '\nFINAL STATS:'
+            print 'Performance summary:'
+            print '\tGames: %s' % batches
+            print '\tMean score: %s' % (cumulative_score * 1.0 / batches)
+            print '\tMean time: %s' % (cumulative_time * 1.0 / batches)
+            print 'Parallel summary:'
+            for k, v in sorted(self.stats().items()):
+                print '\t%s: %s' % (k, v)
+
+    def close(self):
+        for conn in self.conns:
+            conn.send(None)
+        for worker in self.workers:
+            worker.join()
@@ -0,0 +1,103 @@
+"""
+Per-phase timing of the bot game loop
+
+With a PhaseTimer attached, BotControlledBreakout.run plays every episode through a
+    timed copy of its frame loop, recording how long each takeAction, executeAction
+    (physics and get_state) and incorporateFeedback call takes, plus the per-game output
+    and checkpointing. Without one, the untimed loop runs as before
+
+Durations are buffered during an episode and reduced when it ends: its per-phase call
+    counts and latency percentiles go out as one JSON line, and its calls are added to
+    run-wide log2 latency histograms, which go out as the last line
+
+"""
+import json
+import sys
+import numpy as np
+
+PHASES = ['takeAction', 'executeAction', 'incorporateFeedback', 'output', 'checkpoint']
+
+# histogram bucket i counts calls that took [2^i, 2^(i+1)) microseconds. the first bucket
+#   also holds anything faster, the last anything slower
+NUM_BUCKETS = 24
+
+
+def buckets(durations):
+    """histogram bucket of every duration (in seconds)"""
+    micros = np.maximum(durations * 1e6, 1.0)
+    return np.minimum(np.log2(micros).astype(np.int64), NUM_BUCKETS - 1)
+
+
+class PhaseTimer(object):
+    """collects the game loop's phase timings, writing them to path (a JSON line per
+        episode, then one for the whole run) if given
+    """
+    def __init__(self, path=None):
+        self.out = open(path, 'w') if path else None
+        # this episode's durations, in seconds. the game loop appends to these directly
+        self.durations = dict((phase, []) for phase in PHASES)
+        self.counts = dict((phase, 0) for phase in PHASES)
+        self.seconds = dict((phase, 0.0) for phase in PHASES)
+        self.histograms = dict((phase, np.zeros(NUM_BUCKETS, dtype=np.int64)) for phase in PHASES)
+        self.episodes = 0
+
+    def record(self, phase, seconds):
+        self.durations[phase].append(seconds)
+
+    def end_episode(self, episode):
+        """folds the episode's durations into the run's and exports its summary"""
+        summary = {}
+        for phase in PHASES:
+            if not self.durations[phase]:
+                continue
+            durations = np.array(self.durations[phase])
+            del self.durations[phase][:]
+            self.counts[phase] += len(durations)
+            self.seconds[phase] += durations.sum()
+            self.histograms[phase] += np.bincount(buckets(durations), minlength=NUM_BUCKETS)
+            p50, p99 = np.percentile(durations, [50, 99]) * 1e6
+            summary[phase] = {
+                'calls': len(durations),
+                'seconds': durations.sum(),
+                'mean_us': durations.mean() * 1e6,
+                'p50_us': p50,
+                'p99_us': p99,
+                'max_us': durations.max() * 1e6,
+            }
+        self.episodes += 1
+        if self.out:
+            self.out.write(json.dumps({'episode': episode, 'phases': summary}) + '\n')
+
+    def stats(self):
+        stats = {}
+        for phase in PHASES:
+            if self.counts[phase]:
+                stats['%s_calls' % phase] = self.counts[phase]
+                stats['%s_seconds' % phase] = self.seconds[phase]
+                stats['%s_mean_us' % phase] = self.seconds[phase] / self.counts[phase] * 1e6
+        return stats
+
+    def report(self, out=sys.stderr):
+        """prints where the run's time went, phase by phase, with latency histograms"""
+        total = sum(self.seconds.values()) or 1.0
+        print >> out, 'Phase summary (%s episodes):' % self.episodes
+        for phase in PHASES:
+            if not self.counts[phase]:
+                continue
+            print >> out, '\t%s: %s calls, %.3fs (%.1f%%), mean %.1fus' % (
+                phase, self.counts[phase], self.seconds[phase], 100.0 * self.seconds[phase] / total,
+                self.seconds[phase] / self.counts[phase] * 1e6)
+            nonzero = np.flatnonzero(self.histograms[phase])
+            for i in range(nonzero[0], nonzero[-1] + 1):
+                print >> out, '\t\t%8dus+ %s' % (2 ** i, self.histograms[phase][i])
+
+    def close(self):
+        """exports the run's totals and histograms"""
+        if self.out:
+            self.out.write(json.dumps({'run': dict(
+                (phase, {'calls': self.counts[phase],
+                         'seconds': self.seconds[phase],
+                         'histogram_log2_us': self.histograms[phase].tolist()})
+                for phase in PHASES if self.counts[phase])}) + '\n')
+            self.out.close()
+            self.out = None
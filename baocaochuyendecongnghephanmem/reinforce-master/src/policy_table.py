@@ -0,0 +1,155 @@
+"""
+Greedy policies compiled into lookup tables
+
+ContinuousFeaturesV2 and ContinuousFeaturesV4 only ever produce a handful of distinct
+    feature vectors, so a trained agent's greedy choice can be worked out once for each
+    of them. A PolicyTable stores those choices, and TableAgent plays from it with one
+    array index per frame instead of featurizing and scoring every action
+
+"""
+import random
+import numpy as np
+import pygame
+
+from agents import BaseAgent
+from constants import *
+import model_file
+import utils
+
+# table entry for states where every action scores the same. the agents break those
+#   ties randomly, so the table agent does too
+TIE = -1
+
+# actions in the order table entries refer to them
+TABLE_ACTIONS = [[], [INPUT_L], [INPUT_R]]
+
+
+class DiscreteConfigurationsV2(object):
+    """ball left/right of the paddle x ball moving left/right"""
+    name = 'v2'
+    num_configurations = 4
+
+    @staticmethod
+    def index(state):
+        return 2 * (state['ball'].centerx >= state['paddle'].centerx) + (state['ball_vel'][0] >= 0)
+
+    @staticmethod
+    def representative(i):
+        """a game state whose features are those of configuration i"""
+        ball_right, moving_right = divmod(i, 2)
+        paddle = pygame.Rect(300, PADDLE_Y, PADDLE_WIDTH, PADDLE_HEIGHT)
+        ball = pygame.Rect(0, 0, BALL_DIAMETER, BALL_DIAMETER)
+        ball.centerx = paddle.centerx + (100 if ball_right else -100)
+        return {'game_state': STATE_PLAYING, 'paddle': paddle, 'ball': ball,
+                'ball_vel': [5 if moving_right else -5, 5]}
+
+
+class DiscreteConfigurationsV4(object):
+    """10x10 ball grid cell x ball left/right of the paddle x ball moving left/right"""
+    name = 'v4'
+    num_configurations = 100 * 4
+
+    @staticmethod
+    def index(state):
+        cell = utils.discretizeLocation(state['ball'].x, state['ball'].y)
+        return 4 * cell + 2 * (state['ball'].x >= state['paddle'].x) + (state['ball_vel'][0] >= 0)
+
+    @staticmethod
+    def representative(i):
+        """a game state whose features are those of configuration i"""
+        cell, rest = divmod(i, 4)
+        ball_right, moving_right = divmod(rest, 2)
+        row, col = divmod(cell, 10)
+        ball = pygame.Rect(col * (SCREEN_SIZE[0] / 10), row * (SCREEN_SIZE[1] / 10),
+                           BALL_DIAMETER, BALL_DIAMETER)
+        paddle = pygame.Rect(ball.x + (-1 if ball_right else 1), PADDLE_Y, PADDLE_WIDTH, PADDLE_HEIGHT)
+        return {'game_state': STATE_PLAYING, 'paddle': paddle, 'ball': ball,
+                'ball_vel': [5 if moving_right else -5, 5]}
+
+
+# feature extractor class name => its configurations
+CONFIGURATIONS = {
+    'ContinuousFeaturesV2': DiscreteConfigurationsV2,
+    'ContinuousFeaturesV4': DiscreteConfigurationsV4,
+}
+
+
+def configurations_for(agent):
+    """the configurations of an agent's feature set. DiscreteQLearning always uses v2"""
+    extractor = getattr(agent, 'featureExtractor', None)
+    name = 'ContinuousFeaturesV2' if extractor is None else extractor.__class__.__name__
+    if name not in CONFIGURATIONS:
+        raise ValueError('can\'t compile a policy over %s features. compilable: %s' %
+                         (name, ', '.join(sorted(CONFIGURATIONS))))
+    return CONFIGURATIONS[name]
+
+
+class PolicyTable(object):
+    """greedy action index (into TABLE_ACTIONS, or TIE) for every feature configuration"""
+    def __init__(self, configurations, actions):
+        self.configurations = configurations
+        self.actions = actions
+
+    @classmethod
+    def compile(cls, agent):
+        """enumerates every configuration of the agent's feature set and records its greedy action
+        """
+        configurations = configurations_for(agent)
+        if not hasattr(agent, 'actionScores'):
+            raise ValueError('%s has no action values to compile' % agent.__class__.__name__)
+
+        actions = np.empty(configurations.num_configurations, dtype=np.int8)
+        for i in xrange(configurations.num_configurations):
+            scores = agent.actionScores(configurations.representative(i), TABLE_ACTIONS)
+            if utils.allSame(scores):
+                actions[i] = TIE
+            else:
+                # same tie-breaking as the agents' max over (score, action) pairs
+                actions[i] = max(zip(scores, TABLE_ACTIONS, range(len(TABLE_ACTIONS))))[2]
+        return cls(configurations, actions)
+
+    def greedy(self, state):
+        """the compiled greedy action for a game state (in play)"""
+        a = self.actions[self.configurations.index(state)]
+        return random.choice(TABLE_ACTIONS) if a == TIE else TABLE_ACTIONS[a]
+
+    def write(self, path):
+        model_file.write(path, 'policy_table', [('actions', self.actions)],
+                         meta={'feature_set': self.configurations.name})
+
+    @classmethod
+    def read(cls, path):
+        model = model_file.read(path)
+        model.expect('policy_table')
+        by_name = dict((c.name, c) for c in CONFIGURATIONS.values())
+        return cls(by_name[model.meta['feature_set']], model.arrays['actions'])
+
+
+class TableAgent(BaseAgent):
+    """plays a compiled PolicyTable (read_model loads it). e-greedy, doesn't learn
+    """
+    def __init__(self, epsilon=0.0):
+        self.explorationProb = epsilon
+        self.table = None
+        self.numIters = 1
+
+    def takeAction(self, state):
+        self.numIters += 1
+        if state['game_state'] == STATE_BALL_IN_PADDLE:
+            return [INPUT_SPACE]
+        if random.random() < self.explorationProb:
+            return random.choice(TABLE_ACTIONS)
+        return self.table.greedy(state)
+
+    def incorporateFeedback(self, state, action, reward, newState):
+        return None
+
+    def freeze(self):
+        super(TableAgent, self).freeze()
+        self.table.actions.flags.writeable = False
+
+    def read_model(self, path):
+        self.table = PolicyTable.read(path)
+
+    def write_model(self, path):
+        self.table.write(path)
@@ -1,61 +1,396 @@
-import random
+import os
+import time
+import atexit
+import threading
+import weakref
+import Queue
+import numpy as np
 import constants
+from segment_tree import SumTree, MinTree
 
 
 class ReplayMemory(object):
-    """replay memory of agent experience. allows agents to 
+    """replay memory of agent experience. allows agents to
         make use of experience replay
+
+        experience is kept in a fixed-capacity ring buffer backed by a preallocated
+            numpy structured array, so the memory footprint is known up front
+            (see nbytes) and storing a transition is O(1). Each record holds
+            the featurized SARS' tuple:
+                features        dense f(s, a) for the action that was taken
+                action          index of the action that was taken
+                reward          reward observed for that action
+                next_features   dense f(s', a') for every candidate action a'
+                next_valid      which rows of next_features are real actions in s'
+                done            whether s' ended the game
     """
 
-    def __init__(self, capacity=constants.DEFAULT_REPLAY_CAPACITY):
-        self.experience = {}
-        self.start_i = 0
-        self.end_i = -1
+    def __init__(self, capacity=constants.DEFAULT_REPLAY_CAPACITY,
+                 feature_dim=constants.DEFAULT_FEATURE_CAPACITY,
+                 num_actions=constants.NUM_ACTIONS):
         self.capacity = capacity
+        self.feature_dim = feature_dim
+        self.num_actions = num_actions
+        self.dtype = self.make_dtype(feature_dim, num_actions)
+        self.experience = np.zeros(capacity, dtype=self.dtype)
+        self.next_i = 0         # slot the next transition will be written to
+        self.num_stored = 0
+
+    @staticmethod
+    def make_dtype(feature_dim, num_actions):
+        """record layout of a single stored transition"""
+        return np.dtype([
+            ('features', np.float64, (feature_dim,)),
+            ('action', np.int8),
+            ('reward', np.float64),
+            ('next_features', np.float64, (num_actions, feature_dim)),
+            ('next_valid', np.bool_, (num_actions,)),
+            ('done', np.bool_),
+        ])
+
+    @property
+    def nbytes(self):
+        """bytes used by the experience buffer (fixed at construction)"""
+        return self.experience.nbytes
 
     def size(self):
         """size of replay memory buffer"""
-        return self.end_i + 1 - self.start_i
+        return self.num_stored
 
     def isFull(self):
         """is the replay memory at capacity?"""
-        return self.size() >= self.capacity
-
-    def store(self, sars):
-        """store sars' tuple"""
-        self.end_i += 1
-        self.experience[self.end_i] = sars
-        if self.isFull():
-            self.dropSample()
-
-    def dropSample(self):
-        """Removes a random experience tuple from the replay memory
-            The memory is biased against throwing away SARS' tuples with
-            nonzero reward. This helps the agent hold on to its most informative records
+        return self.num_stored >= self.capacity
+
+    def store(self, features, action, reward, next_features, next_valid, done):
+        """store a featurized sars' tuple, overwriting the oldest one when full.
+            returns the index it was written to
         """
-        bias = 0.9
+        i = self.next_i
+        self.experience['features'][i] = features
+        self.experience['action'][i] = action
+        self.experience['reward'][i] = reward
+        self.experience['next_features'][i] = next_features
+        self.experience['next_valid'][i] = next_valid
+        self.experience['done'][i] = done
 
-        while True:
-            del_index = random.randint(self.start_i, self.end_i)
-            del_sars = self.experience[del_index]
-            if abs(del_sars[2]) > 0 and random.random() < bias:
-                continue
-            del self.experience[del_index]
-            if del_index == self.start_i:
-                break
-
-            first_sars = self.experience[self.start_i]
-            del self.experience[self.start_i]
-            self.experience[del_index] = first_sars
-            break
-        self.start_i += 1
-
-    def sample(self):
-        """Sample an experience tuple
+        self.next_i = (i + 1) % self.capacity
+        self.num_stored = min(self.num_stored + 1, self.capacity)
+        return i
+
+    def sample(self, batch_size=1, rng=np.random):
+        """Sample the indices of batch_size experience tuples uniformly
+            (with replacement) from everything stored so far, drawing from rng
+            (a np.random.RandomState, the global one by default)
+        """
+        if self.num_stored == 0:
+            return np.zeros(0, dtype=np.intp)
+        return rng.randint(0, self.num_stored, size=batch_size)
+
+    def snapshot(self):
+        """copy of the memory's contents, as (arrays, counters) dicts for checkpointing"""
+        return {'experience': self.experience.copy()}, {'next_i': self.next_i, 'num_stored': self.num_stored}
+
+    def restore(self, arrays, counters):
+        """load a snapshot() back in"""
+        if arrays['experience'].shape != self.experience.shape or arrays['experience'].dtype != self.dtype:
+            raise ValueError('replay snapshot doesn\'t fit a memory of capacity %d' % self.capacity)
+        self.experience[:] = arrays['experience']
+        self.next_i = counters['next_i']
+        self.num_stored = counters['num_stored']
+
+    def __getitem__(self, indices):
+        """get stored records. fancy-indexing with the output of sample()
+            returns a copy of the batch as a structured array
+        """
+        return self.experience[indices]
+
+    def batch(self, indices, num_features=None):
+        """gathers the records at indices into a dict of field => array, copying
+            only the first num_features feature columns (all of them by default)
+        """
+        cols = slice(None, num_features)
+        return {
+            'features': self.experience['features'][indices, cols],
+            'action': self.experience['action'][indices],
+            'reward': self.experience['reward'][indices],
+            'next_features': self.experience['next_features'][indices, :, cols],
+            'next_valid': self.experience['next_valid'][indices],
+            'done': self.experience['done'][indices],
+        }
+
+
+class PrioritizedReplayMemory(ReplayMemory):
+    """replay memory that samples transitions in proportion to their priority
+        (Schaul et al. 2015). priorities live in a sum tree, so storing, re-prioritizing
+        and drawing a batch are all O(log n)
+
+        alpha controls how strongly priorities skew sampling (0 = uniform) and beta how
+            strongly the importance-sampling weights correct for it (1 = fully). beta is
+            annealed towards 1 by beta_increment on every sample() call, by default
+            reaching it after DEFAULT_PRIORITY_BETA_STEPS calls
+    """
+
+    def __init__(self, capacity=constants.DEFAULT_REPLAY_CAPACITY,
+                 feature_dim=constants.DEFAULT_FEATURE_CAPACITY,
+                 num_actions=constants.NUM_ACTIONS,
+                 alpha=constants.DEFAULT_PRIORITY_ALPHA,
+                 beta=constants.DEFAULT_PRIORITY_BETA,
+                 beta_increment=None):
+        super(PrioritizedReplayMemory, self).__init__(capacity, feature_dim, num_actions)
+        self.alpha = alpha
+        self.beta = beta
+        if beta_increment is None:
+            beta_increment = (1.0 - beta) / constants.DEFAULT_PRIORITY_BETA_STEPS
+        self.beta_increment = beta_increment
+        self.priority_sums = SumTree(capacity)
+        self.priority_mins = MinTree(capacity)
+        # new transitions get the largest priority seen so far so they're replayed at least once
+        self.max_priority = 1.0
+
+    def store(self, features, action, reward, next_features, next_valid, done):
+        """store a sars' tuple with maximal priority"""
+        i = super(PrioritizedReplayMemory, self).store(
+            features, action, reward, next_features, next_valid, done)
+        self.priority_sums[i] = self.max_priority
+        self.priority_mins[i] = self.max_priority
+        return i
+
+    def sample(self, batch_size=1, rng=np.random):
+        """Sample the indices of batch_size experience tuples proportional to their priority.
+            the priority mass is split into batch_size equal segments and one index is
+            drawn from each (with rng)
+        """
+        if self.num_stored == 0:
+            return np.zeros(0, dtype=np.intp)
+        segment = self.priority_sums.total() / batch_size
+        prefix_sums = (np.arange(batch_size) + rng.random_sample(batch_size)) * segment
+        indices = self.priority_sums.find(prefix_sums)
+        self.beta = min(1.0, self.beta + self.beta_increment)
+        # guard against float round-off walking past the last stored transition
+        return np.minimum(indices, self.num_stored - 1)
+
+    def importance_weights(self, indices):
+        """importance-sampling weights (N * P(i))^-beta, scaled so the largest
+            possible weight is 1
+        """
+        total = self.priority_sums.total()
+        probs = self.priority_sums[indices] / total
+        max_weight = (self.num_stored * self.priority_mins.min() / total) ** -self.beta
+        return (self.num_stored * probs) ** -self.beta / max_weight
+
+    def snapshot(self):
+        arrays, counters = super(PrioritizedReplayMemory, self).snapshot()
+        arrays['priority_sums'] = self.priority_sums.tree.copy()
+        arrays['priority_mins'] = self.priority_mins.tree.copy()
+        counters.update(max_priority=self.max_priority, beta=self.beta)
+        return arrays, counters
+
+    def restore(self, arrays, counters):
+        super(PrioritizedReplayMemory, self).restore(arrays, counters)
+        self.priority_sums.tree[:] = arrays['priority_sums']
+        self.priority_mins.tree[:] = arrays['priority_mins']
+        self.max_priority = counters['max_priority']
+        self.beta = counters['beta']
+
+    def update_priorities(self, indices, td_errors):
+        """re-prioritize transitions by the magnitude of their latest td errors"""
+        priorities = (np.abs(td_errors) + constants.PRIORITY_EPSILON) ** self.alpha
+        self.priority_sums[indices] = priorities
+        self.priority_mins[indices] = priorities
+        self.max_priority = max(self.max_priority, priorities.max())
+
+
+class MmapReplayMemory(ReplayMemory):
+    """replay memory kept in a memory-mapped file so that it outlives the process and can
+        be bigger than RAM
+
+        the file is a small fixed-size header followed by the same records as ReplayMemory.
+        the header holds the buffer geometry and fill counters
+
+        opening an existing file reuses its geometry. opening with readonly=True maps it
+        read-only, for inspecting a file no process is writing to: once the ring wraps,
+        the writer overwrites records below num_stored in place, so a concurrent reader
+        could see a half-written one
+    """
+    MAGIC = 'RPLYMMAP'
+    VERSION = 1
+    HEADER_DTYPE = np.dtype([
+        ('magic', 'S8'),
+        ('version', '<i8'),
+        ('capacity', '<i8'),
+        ('feature_dim', '<i8'),
+        ('num_actions', '<i8'),
+        ('next_i', '<i8'),
+        ('num_stored', '<i8'),
+    ])
+    HEADER_BYTES = 4096     # leave room to grow the header without moving records
+
+    def __init__(self, path, capacity=None, feature_dim=None, num_actions=None, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        if os.path.exists(path):
+            self.header = np.memmap(path, dtype=self.HEADER_DTYPE, mode='r' if readonly else 'r+', shape=())
+            if self.header['magic'] != self.MAGIC or self.header['version'] != self.VERSION:
+                raise ValueError('%s is not a version %d replay file' % (path, self.VERSION))
+            for name, requested in [('capacity', capacity), ('feature_dim', feature_dim),
+                                    ('num_actions', num_actions)]:
+                if requested is not None and requested != self.header[name]:
+                    raise ValueError('%s has %s %d, not %d' % (path, name, self.header[name], requested))
+        elif readonly:
+            raise IOError('no replay file at %s' % path)
+        else:
+            self.header = np.memmap(path, dtype=self.HEADER_DTYPE, mode='w+', shape=())
+            self.header['magic'] = self.MAGIC
+            self.header['version'] = self.VERSION
+            self.header['capacity'] = capacity or constants.DEFAULT_REPLAY_CAPACITY
+            self.header['feature_dim'] = feature_dim or constants.DEFAULT_FEATURE_CAPACITY
+            self.header['num_actions'] = num_actions or constants.NUM_ACTIONS
+            self.header.flush()
+
+        self.capacity = int(self.header['capacity'])
+        self.feature_dim = int(self.header['feature_dim'])
+        self.num_actions = int(self.header['num_actions'])
+        self.dtype = self.make_dtype(self.feature_dim, self.num_actions)
+        # mode r+ grows the (sparse) file to fit the records if it was just created
+        self.experience = np.memmap(path, dtype=self.dtype, mode='r' if readonly else 'r+',
+                                    offset=self.HEADER_BYTES, shape=(self.capacity,))
+
+    @property
+    def next_i(self):
+        return int(self.header['next_i'])
+
+    @next_i.setter
+    def next_i(self, i):
+        self.header['next_i'] = i
+
+    @property
+    def num_stored(self):
+        return int(self.header['num_stored'])
+
+    @num_stored.setter
+    def num_stored(self, n):
+        self.header['num_stored'] = n
+
+    def store(self, features, action, reward, next_features, next_valid, done):
+        """store a sars' tuple in the backing file"""
+        if self.readonly:
+            raise IOError('replay file %s is open read-only' % self.path)
+        return super(MmapReplayMemory, self).store(features, action, reward, next_features, next_valid, done)
+
+    def snapshot(self):
+        """copy of the stored records (not the unused rest of the file) and counters. the
+            file alone can't be the checkpoint: training goes on overwriting it after one
+            is taken
         """
-        if self.end_i == -1:
-            return
-        if not self.isFull():
-            return self.experience[self.end_i]
-        rand_i = random.randint(self.start_i, self.end_i)
-        return self.experience[rand_i]
+        return ({'experience': np.array(self.experience[:self.num_stored])},
+                {'next_i': self.next_i, 'num_stored': self.num_stored})
+
+    def restore(self, arrays, counters):
+        """write a snapshot() back into the file"""
+        if self.readonly:
+            raise IOError('replay file %s is open read-only' % self.path)
+        records = arrays['experience']
+        if records.dtype != self.dtype or len(records) > self.capacity:
+            raise ValueError('replay snapshot doesn\'t fit %s (capacity %d)' % (self.path, self.capacity))
+        self.experience[:len(records)] = records
+        self.next_i = counters['next_i']
+        self.num_stored = counters['num_stored']
+        self.flush()
+
+    def flush(self):
+        """write dirty pages back to the file"""
+        if not self.readonly:
+            self.experience.flush()
+            self.header.flush()
+
+
+# prefetchers whose threads may still be running. weak, so a stopped prefetcher (and
+#   the memory it samples) isn't kept alive until exit
+_prefetchers = weakref.WeakSet()
+
+
+def _stop_prefetchers():
+    """joins every running prefetcher before interpreter teardown pulls modules out from under it"""
+    for prefetcher in list(_prefetchers):
+        prefetcher.stop()
+
+atexit.register(_stop_prefetchers)
+
+
+class ReplayPrefetcher(object):
+    """background thread that keeps a small queue of ready minibatches drawn from a
+        replay memory
+
+        get() is O(1) when a batch is waiting. When none is, the learner has outrun the
+            prefetcher: get() counts a stall and samples inline instead of waiting. When the
+            queue is full, the learner is the bottleneck: the thread counts a wait and blocks.
+            sampling holds the GIL, so the thread only gets ahead while the learner is in
+            numpy or tensorflow code that releases it, or learns slower than it samples
+            (e.g. with prioritized replay). with uniform replay on linearReplayQ stalls
+            outnumber hits and prefetching saves next to nothing. the stats say which it is
+
+        batches are sampled while the learner keeps storing, so they may be a few frames
+            stale (and, with prioritized replay, drawn from slightly stale priorities).
+            the thread draws from its own RandomState (seeded from np.random), so it leaves
+            the global random stream alone, but which batches the learner gets still
+            depends on thread timing: prefetched runs aren't reproducible
+    """
+
+    def __init__(self, memory, batch_size, num_features=None, depth=constants.DEFAULT_PREFETCH_DEPTH):
+        self.memory = memory
+        self.batch_size = batch_size
+        # callable giving how many feature columns to gather (all of them by default)
+        self.num_features = num_features or (lambda: None)
+        self.rng = np.random.RandomState(np.random.randint(2 ** 31 - 1))
+        self.queue = Queue.Queue(maxsize=depth)
+        self.hits = 0               # get() calls served from the queue
+        self.stalls = 0             # get() calls that found the queue empty
+        self.producer_waits = 0     # batches that had to wait for room in the queue
+        self.running = True
+        self.thread = threading.Thread(target=self.fill)
+        self.thread.daemon = True
+        self.thread.start()
+        _prefetchers.add(self)
+
+    def next_batch(self):
+        """sample a minibatch. returns (indices, batch)"""
+        indices = self.memory.sample(self.batch_size, self.rng)
+        return indices, self.memory.batch(indices, self.num_features())
+
+    def fill(self):
+        while self.running:
+            if self.memory.size() == 0:
+                time.sleep(0.001)
+                continue
+            item = self.next_batch()
+            if self.queue.full():
+                self.producer_waits += 1
+            while self.running:
+                try:
+                    self.queue.put(item, timeout=0.1)
+                    break
+                except Queue.Full:
+                    pass
+
+    def get(self):
+        """a minibatch (indices, batch), from the queue if one is ready"""
+        try:
+            item = self.queue.get_nowait()
+            self.hits += 1
+            return item
+        except Queue.Empty:
+            self.stalls += 1
+            return self.next_batch()
+
+    def stats(self):
+        return {
+            'prefetch_queue_depth': self.queue.qsize(),
+            'prefetch_hits': self.hits,
+            'prefetch_stalls': self.stalls,
+            'prefetch_producer_waits': self.producer_waits,
+        }
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+        _prefetchers.discard(self)
@@ -0,0 +1,137 @@
+"""
+Content-addressed cache of finished runs
+
+A seeded run is a pure function of the code, the agent, its hyperparameters, the seed,
+    the number of games and the model it starts from. The cache keys each finished run
+    by a hash of exactly those (the code by the contents of main.py and src/, the model
+    by the contents of its file) and keeps its per-game results and the model it wrote,
+    so asking for the same run again just hands them back
+
+Runs that aren't reproducible from their spec alone aren't cached: unseeded runs, runs
+    resumed from checkpoints, runs that keep replay memory in a file (which carries
+    experience over from earlier runs) and runs that prefetch replay batches (which
+    batches they learn from depends on thread timing)
+
+"""
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+
+import agent_registry
+import model_file
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_code_version = []
+
+
+def code_version():
+    """hash of main.py and every module in src/ (computed once per process)"""
+    if not _code_version:
+        digest = hashlib.sha1()
+        src = os.path.join(ROOT, 'src')
+        for path in [os.path.join(ROOT, 'main.py')] + sorted(
+                os.path.join(src, name) for name in os.listdir(src) if name.endswith('.py')):
+            with open(path, 'rb') as f:
+                digest.update(os.path.basename(path))
+                digest.update(hashlib.sha1(f.read()).digest())
+        _code_version.append(digest.hexdigest())
+    return _code_version[0]
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), ''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cacheable(spec):
+    config = spec.get('config') or {}
+    return (spec.get('seed') is not None and spec.get('checkpoint') is None and
+            not config.get('replay_file') and not config.get('prefetch'))
+
+
+def key(spec):
+    """the hash a run spec (see experiment_runner.expand_grid) is cached under"""
+    config = dict(agent_registry.DEFAULT_CONFIG)
+    config.update(spec.get('config') or {})
+    # only what the run's outcome depends on: not where its files go
+    identity = {
+        'code': code_version(),
+        'player': spec['player'],
+        'config': config,
+        'seed': spec['seed'],
+        'games': spec['games'],
+        'eval': bool(spec.get('eval')),
+        # played on evaluation_server's per-game seed schedule
+        'schedule': bool(spec.get('schedule')),
+        'read_model': file_hash(spec['read_model']) if spec.get('read_model') else None,
+    }
+    return hashlib.sha1(json.dumps(identity, sort_keys=True)).hexdigest()
+
+
+class ResultCache(object):
+    """cache directory: one subdirectory per run, holding its results (a model_file
+        'run_results' file) and, if it wrote one, its model
+    """
+    def __init__(self, path=os.path.join(ROOT, '.cache', 'results')):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+    def entry(self, spec):
+        k = spec.get('cache_key') or key(spec)
+        return os.path.join(self.path, k[:2], k)
+
+    def get(self, spec):
+        """the cached record of spec's run (like experiment_runner.run_spec's), or None.
+            copies the cached model to spec's write_model. sets spec's cache_key to the
+            key it looked under, which put stores the run's record under: by then the run
+            may have overwritten its read_model (-rd and -wr the same file)
+        """
+        if not cacheable(spec):
+            return None
+        # a model some earlier run is yet to write: this one hasn't been run on it
+        if spec.get('read_model') and not os.path.exists(spec['read_model']):
+            self.misses += 1
+            return None
+        spec['cache_key'] = key(spec)
+        entry = self.entry(spec)
+        results_path = os.path.join(entry, 'results')
+        if not os.path.exists(results_path) or \
+                (spec.get('write_model') and not os.path.exists(os.path.join(entry, 'model'))):
+            self.misses += 1
+            return None
+        results = model_file.read(results_path)
+        results.expect('run_results')
+        if spec.get('write_model'):
+            shutil.copyfile(os.path.join(entry, 'model'), spec['write_model'])
+        self.hits += 1
+        return dict(spec, cached=True, seconds=results.meta['seconds'],
+                    **dict((name, np.array(results.arrays[name])) for name in ['score', 'frames', 'bricks']))
+
+    def put(self, record):
+        """caches a finished run's record, and the model it wrote, under the key get
+            looked its spec up under
+        """
+        if not cacheable(record):
+            return
+        entry = self.entry(record)
+        if not os.path.isdir(entry):
+            os.makedirs(entry)
+        # the model first: an entry only counts once its results are there
+        if record.get('write_model'):
+            shutil.copyfile(record['write_model'], os.path.join(entry, 'model.tmp'))
+            os.rename(os.path.join(entry, 'model.tmp'), os.path.join(entry, 'model'))
+        model_file.write(os.path.join(entry, 'results'), 'run_results',
+                         [(name, record[name]) for name in ['score', 'frames', 'bricks']],
+                         meta={'run_id': record.get('run_id'), 'player': record['player'],
+                               'seed': record['seed'], 'games': record['games'],
+                               'seconds': record.get('seconds', 0.0)})
+
+    def stats(self):
+        return {'cache_hits': self.hits, 'cache_misses': self.misses}
@@ -0,0 +1,175 @@
+"""
+Store of per-game results
+
+Runs (as returned by experiment_runner) are added to a SQLite database: one row per
+    run, keyed by run id, with its player, config and whether it was an evaluation run,
+    and one row per game it played, keyed by the game's index in the run. A run played
+    on in stages (successive halving, resumed checkpoints) adds each stage's games after
+    the last one's. Adding a record again (say, a cached run replayed from a config file)
+    replaces its games instead of duplicating them
+
+Reductions stream over the database a run at a time (or in SQL), so summarizing
+    thousands of runs never needs them all in memory
+
+"""
+import ast
+import math
+import os
+import sqlite3
+import numpy as np
+
+# per-game result columns
+COLUMNS = ['score', 'frames', 'bricks']
+
+# two-sided 95% normal quantile, for confidence intervals
+Z_95 = 1.96
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    config_id TEXT NOT NULL,
+    player TEXT NOT NULL,
+    config TEXT NOT NULL,
+    eval INTEGER NOT NULL,
+    seconds REAL NOT NULL DEFAULT 0,
+    UNIQUE (run_id, eval)
+);
+CREATE TABLE IF NOT EXISTS games (
+    run INTEGER NOT NULL REFERENCES runs (id),
+    game INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    frames INTEGER NOT NULL,
+    bricks INTEGER NOT NULL,
+    PRIMARY KEY (run, game)
+);
+"""
+
+
+def confidence_interval(n, total, total_squares):
+    """(mean, half width of its 95% confidence interval) from a sample's size, sum and
+        sum of squares
+    """
+    mean = total * 1.0 / n
+    if n < 2:
+        return mean, float('nan')
+    variance = max(total_squares - n * mean * mean, 0.0) / (n - 1)
+    return mean, Z_95 * math.sqrt(variance / n)
+
+
+class ResultsStore(object):
+    """results database at path (':memory:' for a throwaway one)"""
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def add(self, record):
+        """adds a run record's games, from its first_game on (0 by default), replacing any
+            the run already has there. the run's seconds only grow by the new games' share
+        """
+        evaluation = int(bool(record.get('eval')))
+        with self.db:
+            row = self.db.execute('SELECT id FROM runs WHERE run_id = ? AND eval = ?',
+                                  (record['run_id'], evaluation)).fetchone()
+            if row is None:
+                run = self.db.execute(
+                    'INSERT INTO runs (run_id, config_id, player, config, eval) VALUES (?, ?, ?, ?, ?)',
+                    (record['run_id'], record.get('config_id', record['player']), record['player'],
+                     repr(record.get('config') or {}), evaluation)).lastrowid
+            else:
+                run = row[0]
+            first = record.get('first_game', 0)
+            games = len(record['score'])
+            replaced = self.db.execute('SELECT COUNT(*) FROM games WHERE run = ? AND game >= ? AND game < ?',
+                                       (run, first, first + games)).fetchone()[0]
+            if games > replaced:
+                self.db.execute('UPDATE runs SET seconds = seconds + ? WHERE id = ?',
+                                (record.get('seconds', 0.0) * (games - replaced) / games, run))
+            self.db.executemany(
+                'INSERT OR REPLACE INTO games (run, game, score, frames, bricks) VALUES (?, ?, ?, ?, ?)',
+                ((run, first + i, int(s), int(f), int(b)) for i, (s, f, b) in
+                 enumerate(zip(record['score'], record['frames'], record['bricks']))))
+
+    def add_csv(self, path, evaluation=False):
+        """adds a main.py -csv file as a run. the test scripts name them
+            player-run[-config values].csv, which gives its run and config ids
+        """
+        run_id = os.path.basename(path)[:-len('.csv')]
+        fields = run_id.split('-')
+        games = np.loadtxt(path, delimiter=',', skiprows=1, dtype=np.int64, ndmin=2).reshape(-1, 4)
+        self.add({'run_id': run_id, 'config_id': '-'.join(fields[:1] + fields[2:]), 'player': fields[0],
+                  'eval': evaluation, 'score': games[:, 1], 'frames': games[:, 2], 'bricks': games[:, 3]})
+
+    def config_ids(self, evaluation=None):
+        return [c for c, in self.db.execute(
+            'SELECT DISTINCT config_id FROM runs WHERE ? IS NULL OR eval = ? ORDER BY config_id',
+            (evaluation, evaluation))]
+
+    def runs(self, config_id=None, evaluation=None):
+        """(run_id, eval, config dict) of the matching runs"""
+        return [(run_id, bool(evaluated), ast.literal_eval(config)) for run_id, evaluated, config in self.db.execute(
+            'SELECT run_id, eval, config FROM runs WHERE (? IS NULL OR config_id = ?) AND (? IS NULL OR eval = ?) '
+            'ORDER BY id', (config_id, config_id, evaluation, evaluation))]
+
+    def run_column(self, run_id, column='score', evaluation=False):
+        """one run's per-game column as an array"""
+        column = self._column(column)
+        rows = self.db.execute(
+            'SELECT g.%s FROM games g JOIN runs r ON g.run = r.id WHERE r.run_id = ? AND r.eval = ? '
+            'ORDER BY g.game' % column, (run_id, int(evaluation)))
+        return np.fromiter((v for v, in rows), dtype=np.int64)
+
+    def totals(self, config_id, column='score', evaluation=None, games=None):
+        """each matching run's column summed over its first games games (all of them by
+            default). the totals of score are the runs' cumulative scores
+        """
+        column = self._column(column)
+        rows = self.db.execute(
+            'SELECT SUM(g.%s) FROM games g JOIN runs r ON g.run = r.id '
+            'WHERE r.config_id = ? AND (? IS NULL OR r.eval = ?) AND (? IS NULL OR g.game < ?) '
+            'GROUP BY r.id ORDER BY r.id' % column, (config_id, evaluation, evaluation, games, games))
+        return np.fromiter((v for v, in rows), dtype=np.int64)
+
+    def summary(self, column='score', evaluation=None, games=None):
+        """per config: (config_id, runs, mean total, 95% confidence half width). totals as
+            in totals(), reduced in the database
+        """
+        column = self._column(column)
+        rows = self.db.execute(
+            'SELECT config_id, COUNT(*), SUM(total), SUM(total * total) FROM ('
+            '  SELECT r.config_id AS config_id, SUM(g.%s) * 1.0 AS total FROM games g JOIN runs r ON g.run = r.id'
+            '  WHERE (? IS NULL OR r.eval = ?) AND (? IS NULL OR g.game < ?) GROUP BY r.id'
+            ') GROUP BY config_id ORDER BY config_id' % column, (evaluation, evaluation, games, games))
+        return [(config_id, n) + confidence_interval(n, total, squares) for config_id, n, total, squares in rows]
+
+    def learning_curve(self, config_id, column='score', evaluation=None, cumulative=True):
+        """mean and 95% confidence half width of column (or its running total) at every
+            game, over config_id's runs. streams one run at a time: memory is only ever a
+            few arrays the length of the longest run. games past the end of shorter runs
+            average over the runs that got that far
+        """
+        n = total = squares = np.zeros(0)
+        for run_id, evaluated, _ in self.runs(config_id, evaluation):
+            values = self.run_column(run_id, column, evaluated).astype(np.float64)
+            if cumulative:
+                values = np.cumsum(values)
+            if len(values) > len(n):
+                grow = len(values) - len(n)
+                n, total, squares = [np.concatenate([a, np.zeros(grow)]) for a in (n, total, squares)]
+            n[:len(values)] += 1
+            total[:len(values)] += values
+            squares[:len(values)] += values * values
+
+        mean = total / np.maximum(n, 1)
+        variance = np.maximum(squares - n * mean * mean, 0.0) / np.maximum(n - 1, 1)
+        half_width = np.where(n > 1, Z_95 * np.sqrt(variance / np.maximum(n, 1)), np.nan)
+        return mean, half_width
+
+    def _column(self, column):
+        if column not in COLUMNS:
+            raise ValueError('unknown column %s. columns: %s' % (column, ', '.join(COLUMNS)))
+        return column
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,130 @@
+"""
+Runs from a config file
+
+main.py -config runs.json plays every run a JSON file lists in one go, so pygame,
+    tensorflow and the game are set up once rather than once per run. The file holds a
+    list of entries, each expanded into runs by experiment_runner.expand_grid, and
+    optionally defaults shared by every entry, the number of processes to play them on
+    and a results database to add them to:
+
+    {
+        "defaults": {"games": 500, "config": {"epsilon": 0.3}},
+        "processes": 1,
+        "store": "results.db",
+        "runs": [
+            {"player": "sarsaLambda", "runs": 3, "config": {"trace_decay": 0.9},
+             "write_model": "sarsaLambda-{run}.model", "csv": "sarsaLambda-{run}.csv"},
+            {"players": ["linearQ", "sarsa"], "seeds": [7, 8],
+             "grid": {"step_size": ["inv_sqrt", "0.001"], "feature_set": ["v1", "v2"]}},
+            {"name": "test", "player": "linearQ", "games": 100, "eval": true, "seed": 1000,
+             "read_model": "linearQ-1.model"}
+        ]
+    }
+
+config and grid take agent_registry.DEFAULT_CONFIG keys. Runs are seeded seed + run
+    (seed defaults to 0), or with seeds, one run per seed. A name sets entries apart whose
+    run ids would otherwise clash. With one process runs are played back to back in this
+    one, in file order, so a run can read a model an earlier one writes; with more, on a
+    pool of that many workers, each set up once, in no particular order (so no run can
+    read a model another one writes: load refuses files where one does)
+
+"""
+import json
+import os
+import sys
+
+import agent_registry
+from experiment_runner import ExperimentRunner, expand_grid, write_csv
+
+ENTRY_KEYS = ['name', 'player', 'players', 'games', 'runs', 'seed', 'seeds', 'grid', 'config',
+              'read_model', 'write_model', 'checkpoint', 'metrics', 'csv', 'eval']
+
+# entry keys that go straight into the run specs
+SPEC_KEYS = ['seed', 'read_model', 'write_model', 'checkpoint', 'metrics', 'csv', 'eval']
+
+
+def to_str(value):
+    """json's unicode strings (and those in lists and dicts) as plain ones"""
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    if isinstance(value, list):
+        return [to_str(v) for v in value]
+    if isinstance(value, dict):
+        return dict((to_str(k), to_str(v)) for k, v in value.items())
+    return value
+
+
+def entry_specs(entry):
+    """the run specs of one (defaults applied) entry"""
+    unknown = set(entry) - set(ENTRY_KEYS)
+    if unknown:
+        raise ValueError('unknown run keys %s. keys: %s' % (', '.join(sorted(unknown)), ', '.join(ENTRY_KEYS)))
+    unknown = (set(entry.get('config') or {}) | set(entry.get('grid') or {})) - set(agent_registry.DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError('unknown config keys %s. keys: %s' % (', '.join(sorted(unknown)),
+                                                               ', '.join(sorted(agent_registry.DEFAULT_CONFIG))))
+
+    seeds = entry.get('seeds')
+    spec = dict((key, entry[key]) for key in SPEC_KEYS if key in entry)
+    spec.setdefault('seed', 0)
+    specs = expand_grid(entry.get('players') or [entry['player']], entry.get('games', 1),
+                        len(seeds) if seeds else entry.get('runs', 1),
+                        entry.get('grid'), entry.get('config'), **spec)
+    for spec in specs:
+        if seeds:
+            spec['seed'] = seeds[spec['run'] - 1]
+        if 'name' in entry:
+            spec['config_id'] = '%s-%s' % (entry['name'], spec['config_id'])
+            spec['run_id'] = '%s-%s' % (spec['config_id'], spec['run'])
+    return specs
+
+
+def load(path):
+    """(run specs, processes, results database path or None) of a config file"""
+    with open(path) as f:
+        runs = to_str(json.load(f))
+    defaults = runs.get('defaults', {})
+
+    specs = []
+    run_ids = set()
+    for entry in runs['runs']:
+        merged = dict(defaults, **entry)
+        merged['config'] = dict(defaults.get('config') or {}, **(entry.get('config') or {}))
+        for spec in entry_specs(merged):
+            if spec['run_id'] in run_ids:
+                raise ValueError('%s lists run %s twice. set the entries apart with a "name"' % (path, spec['run_id']))
+            run_ids.add(spec['run_id'])
+            specs.append(spec)
+
+    processes = runs.get('processes', 1)
+    if processes != 1:
+        written = dict((os.path.abspath(spec['write_model']), spec['run_id']) for spec in specs
+                       if spec.get('write_model'))
+        for spec in specs:
+            if spec.get('read_model') and os.path.abspath(spec['read_model']) in written:
+                raise ValueError('%s reads the model %s writes, which needs "processes": 1' %
+                                 (spec['run_id'], written[os.path.abspath(spec['read_model'])]))
+    return specs, processes, runs.get('store')
+
+
+def run_file(path, cache=None, out=sys.stdout):
+    """plays every run in a config file, printing a line per run as it finishes"""
+    from results_store import ResultsStore
+
+    specs, processes, store_path = load(path)
+    runner = ExperimentRunner(processes, cache=cache, in_process=processes == 1)
+    store = ResultsStore(store_path) if store_path else None
+    print >> out, 'run_id,games,cum_score,mean_score,seconds'
+    try:
+        for record in runner.imap(specs):
+            if record.get('csv'):
+                write_csv(record, record['csv'])
+            if store:
+                store.add(record)
+            print >> out, '%s,%s,%s,%.2f,%.1f' % (record['run_id'], len(record['score']), record['score'].sum(),
+                                                  record['score'].mean(), record['seconds'])
+            out.flush()
+    finally:
+        runner.close()
+        if store:
+            store.close()
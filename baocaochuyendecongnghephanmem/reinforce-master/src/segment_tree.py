@@ -0,0 +1,80 @@
+import numpy as np
+
+
+class SegmentTree(object):
+    """array-backed binary tree over a fixed number of leaves where every internal node
+        holds operation(left child, right child). Setting a batch of leaves and reducing
+        over all of them are both O(log n)
+
+        node 1 is the root and the children of node i are 2i and 2i + 1, so leaf j
+            lives at node num_leaves + j
+    """
+
+    def __init__(self, capacity, operation, neutral):
+        self.capacity = capacity
+        self.num_leaves = 1
+        while self.num_leaves < capacity:
+            self.num_leaves *= 2
+        self.depth = int(np.log2(self.num_leaves))
+        self.operation = operation
+        self.neutral = neutral
+        self.tree = np.full(2 * self.num_leaves, neutral, dtype=np.float64)
+
+    def __getitem__(self, indices):
+        return self.tree[np.asarray(indices) + self.num_leaves]
+
+    def __setitem__(self, indices, values):
+        """set leaves, then recompute their ancestors one level at a time"""
+        tree = self.tree
+        if np.isscalar(indices):
+            node = indices + self.num_leaves
+            tree[node] = values
+            while node > 1:
+                node //= 2
+                tree[node] = self.operation(tree[2 * node], tree[2 * node + 1])
+            return
+        # duplicate nodes just get recomputed to the same value, so no need to dedupe
+        nodes = np.asarray(indices) + self.num_leaves
+        tree[nodes] = values
+        for _ in xrange(self.depth):
+            nodes = nodes // 2
+            tree[nodes] = self.operation(tree[2 * nodes], tree[2 * nodes + 1])
+
+    def reduce(self):
+        """operation applied over every leaf"""
+        return self.tree[1]
+
+
+class SumTree(SegmentTree):
+    """segment tree of sums. supports proportional sampling: leaf j is found with
+        probability leaf[j] / total
+    """
+
+    def __init__(self, capacity):
+        super(SumTree, self).__init__(capacity, np.add, 0.0)
+
+    def total(self):
+        return self.reduce()
+
+    def find(self, prefix_sums):
+        """for each value v in prefix_sums, finds the leaf j such that
+            sum(leaf[:j]) <= v < sum(leaf[:j + 1]). All values are looked up at once
+        """
+        values = np.array(prefix_sums, dtype=np.float64)
+        nodes = np.ones(values.shape, dtype=np.intp)
+        for _ in xrange(self.depth):
+            left = 2 * nodes
+            go_right = values >= self.tree[left]
+            values -= np.where(go_right, self.tree[left], 0.0)
+            nodes = left + go_right
+        return nodes - self.num_leaves
+
+
+class MinTree(SegmentTree):
+    """segment tree of minimums"""
+
+    def __init__(self, capacity):
+        super(MinTree, self).__init__(capacity, np.minimum, float('inf'))
+
+    def min(self):
+        return self.reduce()
@@ -0,0 +1,120 @@
+"""
+Successive-halving and Hyperband hyperparameter sweeps
+
+Rather than training every configuration of a grid for the full number of games, a
+    successive-halving sweep trains them all for a few games, ranks them by mean cumulative
+    score, keeps the top 1/eta, trains those on for eta times as many games, and so on up
+    to the full budget. Hyperband runs several such brackets, from many configurations
+    started on a small budget to a few started on the full one, in case a configuration
+    only pulls ahead late
+
+Runs are played on in stages from checkpoints (which resume exactly), so a configuration
+    that survives to the full budget ends up with the same games and model as if it had
+    been trained in one go
+
+"""
+import collections
+import math
+import os
+import random
+import shutil
+import tempfile
+import numpy as np
+
+
+def rungs(min_games, max_games, eta=3):
+    """game counts configurations are compared at: max_games, 1/eta of that, 1/eta^2 of
+        that... down to min_games (or just under), smallest first
+    """
+    games = [max_games]
+    while games[0] > min_games and games[0] // eta > 0:
+        games.insert(0, games[0] // eta)
+    return games
+
+
+class Sweep(object):
+    """the runs of an experiment (see experiment_runner.expand_grid), trained on demand
+        and only ever forwards: every game a run has played is remembered, so asking for
+        a configuration's score at fewer games than it has played costs nothing. every
+        stage of every run is added to store (a results_store.ResultsStore), if given
+    """
+    def __init__(self, runner, specs, checkpoint_dir=None, store=None):
+        self.runner = runner
+        self.store = store
+        self.specs = dict((spec['run_id'], spec) for spec in specs)
+        self.config_ids = []
+        self.runs = collections.defaultdict(list)
+        for spec in specs:
+            if spec['config_id'] not in self.runs:
+                self.config_ids.append(spec['config_id'])
+            self.runs[spec['config_id']].append(spec['run_id'])
+
+        self.own_checkpoint_dir = checkpoint_dir is None
+        self.checkpoint_dir = checkpoint_dir or tempfile.mkdtemp(prefix='sweep-')
+        self.scores = dict((run_id, np.zeros(0, dtype=np.int64)) for run_id in self.specs)
+        self.games_played = 0
+
+    def games(self, config_id):
+        """fewest games any run of config_id has played"""
+        return min(len(self.scores[run_id]) for run_id in self.runs[config_id])
+
+    def train(self, config_ids, games):
+        """plays every run of config_ids on until it has played games games"""
+        jobs = []
+        for config_id in config_ids:
+            for run_id in self.runs[config_id]:
+                if len(self.scores[run_id]) < games:
+                    jobs.append(dict(self.specs[run_id], games=games,
+                                     checkpoint=os.path.join(self.checkpoint_dir, run_id + '.ckpt')))
+        for record in self.runner.imap(jobs):
+            self.scores[record['run_id']] = np.concatenate([self.scores[record['run_id']], record['score']])
+            self.games_played += len(record['score'])
+            if self.store is not None:
+                self.store.add(record)
+
+    def score(self, config_id, games):
+        """mean cumulative score of config_id's runs over their first games games"""
+        return np.mean([self.scores[run_id][:games].sum() for run_id in self.runs[config_id]])
+
+    def full_cost(self, games):
+        """games the whole grid would take at games games per run"""
+        return games * len(self.specs)
+
+    def close(self):
+        """removes the checkpoints (unless they were put in a directory of the caller's)"""
+        if self.own_checkpoint_dir:
+            shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+
+
+def successive_halving(sweep, min_games, max_games, eta=3, config_ids=None):
+    """one successive-halving bracket over config_ids (defaults to all of sweep's).
+        returns its rungs, as (games, [(config_id, score), ...] best first) pairs; the
+        best configuration is the first in the last rung
+    """
+    survivors = list(config_ids or sweep.config_ids)
+    results = []
+    for games in rungs(min_games, max_games, eta):
+        sweep.train(survivors, games)
+        ranked = sorted(((c, sweep.score(c, games)) for c in survivors), key=lambda x: -x[1])
+        results.append((games, ranked))
+        survivors = [c for c, _ in ranked[:max(1, len(ranked) // eta)]]
+    return results
+
+
+def hyperband(sweep, min_games, max_games, eta=3, seed=0):
+    """Hyperband: successive-halving brackets starting at min_games, eta * min_games, ...,
+        max_games, each on a random sample of configurations sized so that the brackets
+        cost about the same. returns (best config_id, its score at max_games, every
+        bracket's rungs)
+    """
+    rng = random.Random(seed)
+    s_max = int(math.floor(math.log(max_games * 1.0 / min_games, eta) + 1e-9))
+    brackets = []
+    for s in range(s_max, -1, -1):
+        n = min(len(sweep.config_ids), int(math.ceil((s_max + 1.0) / (s + 1) * eta ** s)))
+        config_ids = rng.sample(sweep.config_ids, n)
+        brackets.append(successive_halving(sweep, max_games // eta ** s, max_games, eta, config_ids))
+
+    finalists = set(bracket[-1][1][0][0] for bracket in brackets)
+    best = max(finalists, key=lambda c: sweep.score(c, max_games))
+    return best, sweep.score(best, max_games), brackets
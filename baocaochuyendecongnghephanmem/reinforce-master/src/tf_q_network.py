@@ -0,0 +1,225 @@
+"""
+Tensorflow backend for NNAgent's Q-network
+
+"""
+import numpy as np
+import tensorflow as tf
+
+
+class TFQNetwork(object):
+    """input_size -> 16 -> 1 sigmoid network estimating Q(s, a) from a feature row,
+        trained with exponentially decaying SGD. Every method works on a batch of
+        rows so that scoring all of a state's actions is one session call
+
+        with replay=True it also holds a target network (a frozen copy of the weights
+            that update_target refreshes) and a minibatch training step against it
+
+        each network lives in its own graph, with a session bound to it, so networks
+            never see (or initialize, or finalize) each other's variables
+    """
+    def __init__(self, input_size, verbose, num_actions, replay=False):
+        self.input_size = input_size
+        self.verbose = verbose
+        self.num_actions = num_actions
+        self.num_updates = 0
+        self.graph = tf.Graph()
+
+        with self.graph.as_default():
+            self.input_placeholder, self.next_input_placeholder, self.reward_placeholder, \
+                self.bootstrap_placeholder, self.loss, self.train_step, self.sess, self.output, \
+                self.merged, self.log_writer, self.variables = self.define_model(input_size)
+
+            if replay:
+                self.batch_input_placeholder, self.batch_next_input_placeholder, \
+                    self.batch_next_valid_placeholder, self.batch_reward_placeholder, \
+                    self.batch_bootstrap_placeholder, self.batch_train_step, self.update_target_op = \
+                        self.define_replay_model(input_size, self.variables)
+
+            # everything training changes (weights, target weights, global steps), for snapshots
+            self.state_variables = tf.global_variables()
+            # restore and set_weights feed values through these, so they add no ops (and
+            #   work on a frozen network)
+            self.state_placeholders = [tf.placeholder(v.dtype.base_dtype, v.get_shape()) for v in self.state_variables]
+            self.restore_op = tf.group(*[v.assign(p) for v, p in zip(self.state_variables, self.state_placeholders)])
+            self.weight_placeholders = [self.state_placeholders[self.state_variables.index(v)] for v in self.variables]
+            self.set_weights_op = tf.group(*[v.assign(p) for v, p in zip(self.variables, self.weight_placeholders)])
+
+    def q_values(self, features):
+        """Network forward pass over a matrix of feature rows. returns a vector of Q-values
+        """
+        output = self.sess.run(self.output,
+            feed_dict={
+                self.input_placeholder: features,
+            })
+        return output[:, 0]
+
+    def train(self, features, next_features, reward, bootstrap):
+        """one SGD step on a single transition. The target r + bootstrap * max Q(s', .)
+            is computed in the same session call, from next_features (one row per
+            next-state action)
+        """
+        feed_dict = {
+            self.input_placeholder: features,
+            self.next_input_placeholder: next_features,
+            self.reward_placeholder: reward,
+            self.bootstrap_placeholder: bootstrap,
+        }
+        self.num_updates += 1
+        if self.verbose:
+            summary, _ = self.sess.run([self.merged, self.train_step], feed_dict=feed_dict)
+            self.log_writer.add_summary(summary, self.num_updates)
+        else:
+            self.sess.run([self.train_step], feed_dict=feed_dict)
+
+    def train_batch(self, features, next_features, next_valid, rewards, bootstrap):
+        """one SGD step on a minibatch, with targets from the target network.
+            next_features is batch x num_actions x input_size, masked by next_valid
+        """
+        self.sess.run(self.batch_train_step,
+            feed_dict={
+                self.batch_input_placeholder: features,
+                self.batch_next_input_placeholder: next_features,
+                self.batch_next_valid_placeholder: next_valid,
+                self.batch_reward_placeholder: rewards,
+                self.batch_bootstrap_placeholder: bootstrap,
+            })
+
+    def update_target(self):
+        """copy the current weights into the target network"""
+        self.sess.run(self.update_target_op)
+
+    def snapshot(self):
+        """values of every variable in the network's graph (weights, target weights, global steps)"""
+        return self.sess.run(self.state_variables)
+
+    def restore(self, state):
+        """load a snapshot() back in"""
+        self.sess.run(self.restore_op, feed_dict=dict(zip(self.state_placeholders, state)))
+
+    def close(self):
+        """release the session"""
+        self.sess.close()
+
+    def freeze(self):
+        """finalize the network's graph, so no new ops can be added to it"""
+        self.graph.finalize()
+
+    def get_weights(self):
+        """current weights as a list of numpy arrays [w_0, b_0, w_1, b_1]"""
+        return self.sess.run(self.variables)
+
+    def set_weights(self, weights):
+        """overwrite the current weights with a list of numpy arrays [w_0, b_0, w_1, b_1]"""
+        self.sess.run(self.set_weights_op, feed_dict=dict(zip(self.weight_placeholders, weights)))
+
+    @staticmethod
+    def forward(x, variables):
+        """network forward pass, in-graph. x is a batch of feature rows
+        """
+        w_0, b_0, w_1, b_1 = variables
+        fc_0 = tf.add(tf.matmul(x, w_0), b_0)
+        fc_0 = tf.sigmoid(fc_0)
+        fc_1 = tf.add(tf.matmul(fc_0, w_1), b_1)
+        return tf.nn.sigmoid(fc_1)
+
+    def define_model(self, input_size):
+        """Defines a Q-learning network
+        """
+        # input and output placeholders. next_inputs holds one row for each action
+        #   available in the next state; the target is built from them in-graph
+        inputs = tf.placeholder(tf.float32, shape=[None, input_size], name="input")
+        next_inputs = tf.placeholder(tf.float32, shape=[None, input_size], name="next_input")
+        reward = tf.placeholder(tf.float32, shape=[], name="reward")
+        bootstrap = tf.placeholder(tf.float32, shape=[], name="bootstrap")
+
+        # initial weights are seeded from numpy's generator, so seeding numpy
+        #   (main.py -seed) seeds them too
+        seed = lambda: np.random.randint(2 ** 31 - 1)
+
+        # layer 0
+        w_0 = tf.Variable(tf.random_normal([input_size, 16], seed=seed()))
+        b_0 = tf.Variable(tf.random_normal([16], seed=seed()))
+
+        # layer 1
+        w_1 = tf.Variable(tf.random_normal([16, 1], seed=seed()))
+        b_1 = tf.Variable(tf.random_normal([1], seed=seed()))
+
+        variables = [w_0, b_0, w_1, b_1]
+        fc_1 = self.forward(inputs, variables)
+        # target = r + gamma * max_a' Q(s', a'), held fixed while training
+        targets = tf.stop_gradient(reward + bootstrap * tf.reduce_max(self.forward(next_inputs, variables)))
+
+        # training
+        loss = tf.reduce_sum(tf.square(fc_1 - targets))
+        starter_learning_rate = 0.1
+        global_step = tf.Variable(0, trainable=False)
+        learning_rate = tf.train.exponential_decay(starter_learning_rate, global_step,
+                                           10000, 0.96, staircase=True)
+        optimizer = tf.train.GradientDescentOptimizer(learning_rate)
+        train_step = optimizer.minimize(loss, global_step=global_step)
+
+        # get session, initialize stuff
+        sess = tf.Session(graph=self.graph)
+        sess.run(tf.global_variables_initializer())
+
+        # log stuff if verbose
+        if self.verbose:
+            self.variable_summaries(w_0, 'w_0')
+            self.variable_summaries(b_0, 'b_0')
+            self.variable_summaries(w_1, 'w_1')
+            self.variable_summaries(b_1, 'b_1')
+            self.variable_summaries(fc_1, 'output')
+            self.variable_summaries(fc_1, 'loss')
+
+            merged = tf.merge_all_summaries()
+            log_writer = tf.train.SummaryWriter('./', sess.graph)
+        else:
+            merged, log_writer = None, None
+
+        return inputs, next_inputs, reward, bootstrap, loss, train_step, sess, fc_1, merged, log_writer, variables
+
+    def define_replay_model(self, input_size, variables):
+        """Defines minibatch training against a target network: a frozen copy of the
+            network's variables that update_target refreshes
+        """
+        num_actions = self.num_actions
+        inputs = tf.placeholder(tf.float32, shape=[None, input_size], name="batch_input")
+        next_inputs = tf.placeholder(tf.float32, shape=[None, num_actions, input_size], name="batch_next_input")
+        next_valid = tf.placeholder(tf.float32, shape=[None, num_actions], name="batch_next_valid")
+        rewards = tf.placeholder(tf.float32, shape=[None], name="batch_reward")
+        bootstrap = tf.placeholder(tf.float32, shape=[None], name="batch_bootstrap")
+
+        target_variables = [tf.Variable(v.initialized_value(), trainable=False) for v in variables]
+        update_target = tf.group(*[t.assign(v) for t, v in zip(target_variables, variables)])
+
+        # score every (transition, next action) row in one pass, then max over the real actions
+        next_q = self.forward(tf.reshape(next_inputs, [-1, input_size]), target_variables)
+        next_q = tf.reshape(next_q, [-1, num_actions])
+        # Q-values are sigmoids in [0, 1], so pushing invalid rows down by 2 rules them out
+        next_q = next_q - 2.0 * (1.0 - next_valid)
+        targets = tf.stop_gradient(rewards + bootstrap * tf.reduce_max(next_q, reduction_indices=[1]))
+
+        predictions = tf.reshape(self.forward(inputs, variables), [-1])
+        loss = tf.reduce_mean(tf.square(predictions - targets))
+        starter_learning_rate = 0.1
+        global_step = tf.Variable(0, trainable=False)
+        learning_rate = tf.train.exponential_decay(starter_learning_rate, global_step,
+                                           10000, 0.96, staircase=True)
+        train_step = tf.train.GradientDescentOptimizer(learning_rate).minimize(loss, global_step=global_step)
+
+        self.sess.run(tf.variables_initializer(target_variables + [global_step]))
+        self.sess.run(update_target)
+
+        return inputs, next_inputs, next_valid, rewards, bootstrap, train_step, update_target
+
+    def variable_summaries(self, var, name):
+        """produces mean/std/max/min logging summaries for a variable
+        """
+        with tf.name_scope('summaries'):
+            mean = tf.reduce_mean(var)
+            tf.scalar_summary('mean/' + name, mean)
+            with tf.name_scope('stddev'):
+                stddev = tf.sqrt(tf.reduce_sum(tf.square(var - mean)))
+            tf.scalar_summary('sttdev/' + name, stddev)
+            tf.scalar_summary('max/' + name, tf.reduce_max(var))
+            tf.scalar_summary('min/' + name, tf.reduce_min(var))
@@ -107,6 +107,53 @@ def dictToNpMatrix(d):
     return np.asmatrix([d[k] for k in sorted(d)])
 
 
+def discountedCumsum(rewards, gamma, chunk_size=512):
+    """discounted sum of future rewards at each step, computed right to left in one pass:
+
+        out[t] = r[t] + gamma * r[t+1] + gamma^2 * r[t+2] + ...
+
+    within a chunk this is a reverse cumsum of r[t] * gamma^t, divided back by gamma^t.
+        chunks are at most chunk_size steps, and short enough that gamma^t stays above
+        constants.MIN_DISCOUNT_SCALE (about 100 / -log10(gamma) steps), so the scaled rewards never
+        reach the denormals. the running sum is carried from each chunk into the one before
+    """
+    rewards = np.asarray(rewards, dtype=np.float64)
+    if gamma == 0:
+        return rewards.copy()
+    if gamma < 1:
+        chunk_size = max(1, min(chunk_size, int(np.log(constants.MIN_DISCOUNT_SCALE) / np.log(gamma)) + 1))
+    out = np.empty_like(rewards)
+    powers = gamma ** np.arange(min(chunk_size, rewards.size))
+    carry = 0.0
+    for end in xrange(rewards.size, 0, -chunk_size):
+        start = max(0, end - chunk_size)
+        p = powers[:end - start]
+        scaled = (rewards[start:end] * p)[::-1].cumsum()[::-1] / p
+        out[start:end] = scaled + carry * gamma ** (end - start) / p
+        carry = out[start]
+    return out
+
+
+class FrozenWeights(dict):
+    """read-only weight dict, for agents in evaluation mode. Missing keys read as default
+        (like a defaultdict) but, unlike a defaultdict, aren't added, so lookups never write
+    """
+    def __init__(self, weights=(), default=0.0):
+        super(FrozenWeights, self).__init__(weights)
+        self.default = default
+
+    def __missing__(self, key):
+        return self.default
+
+    def __reduce__(self):
+        return (FrozenWeights, (dict(self), self.default))
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError('weights are frozen')
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _read_only
+
+
 def sigmoid(x):
     """sigmoid function"""
     return 1.0 / (1 + math.exp(-x))
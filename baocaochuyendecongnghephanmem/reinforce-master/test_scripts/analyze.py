@@ -1,13 +1,31 @@
 """
 this file does some quick number crunching
 
+usage: python analyze.py results.db [games]
+       python analyze.py run1.csv run2.csv ... (main.py -csv files)
+
+prints, per config and phase (training or evaluation), the mean cumulative score (over
+    the first games games) and frames of its runs, with 95% confidence intervals
 """
+import os
 import sys
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.results_store import ResultsStore
 
-s = 0
 
-for file in sys.argv[2:]:
-    s += float(open(file).readlines()[-1].split(',')[2])
+if sys.argv[1].endswith('.csv'):
+    store = ResultsStore(':memory:')
+    for path in sys.argv[1:]:
+        store.add_csv(path)
+    games = None
+else:
+    store = ResultsStore(sys.argv[1])
+    games = int(sys.argv[2]) if len(sys.argv) > 2 else None
 
-print s
+print 'phase,config,runs,mean_cum_score,cum_score_ci95,mean_frames,frames_ci95'
+for phase, evaluation in [('train', False), ('eval', True)]:
+    frames = dict((row[0], row[2:]) for row in store.summary('frames', evaluation, games))
+    for config_id, runs, mean, ci in store.summary('score', evaluation, games):
+        print '%s,%s,%s,%s,%s,%s,%s' % ((phase, config_id, runs, mean, ci) + frames[config_id])
+store.close()
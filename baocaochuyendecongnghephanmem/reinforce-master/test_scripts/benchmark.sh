@@ -5,7 +5,7 @@ echo "random baseline...300 x $runs"
 for ((i=1; i<=$runs; i++));
 do
     echo " run $i..."
-    python main.py -p randomBaseline -b 300 -csv > "random-$i.csv"
+    python main.py -p randomBaseline -b 300 -seed $i -csv > "random-$i.csv"
 done
 echo "average cumulative score (baseline):"
 python test_scripts/analyze.py random-1.csv random-2.csv random-3.csv  
@@ -15,7 +15,7 @@ echo "q replay...300 x $runs"
 for ((i=1; i<=$runs; i++));
 do
     echo " run $i..."
-    python main.py -p linearReplayQ -b 300 -csv > "linear-$i.csv"
+    python main.py -p linearReplayQ -b 300 -seed $i -csv > "linear-$i.csv"
 done
 echo "average cumulative score (q replay):"
 python test_scripts/analyze.py linear-1.csv linear-2.csv linear-3.csv 
@@ -25,7 +25,7 @@ echo "sarsa Lambda...300 x $runs"
 for ((i=1; i<=$runs; i++));
 do
     echo " run $i..."
-    python main.py -p sarsaLambda -b 300 -csv > "sarsaLambda-$i.csv"
+    python main.py -p sarsaLambda -b 300 -seed $i -csv > "sarsaLambda-$i.csv"
 done
 echo "average cumulative score (sarsa lambda):"
 python test_scripts/analyze.py sarsaLambda-1.csv sarsaLambda-2.csv sarsaLambda-3.csv
@@ -37,7 +37,7 @@ python test_scripts/analyze.py sarsaLambda-1.csv sarsaLambda-2.csv sarsaLambda-3
 #for ((i=1; i<=$runs; i++));
 #do
 #    echo "\t run $i..."
-#    python main.py -p sarsa -b 300 -csv > "sarsaLambda-$i.csv"
+#    python main.py -p sarsa -b 300 -seed $i -csv > "sarsaLambda-$i.csv"
 #done
 #echo "average cumulative score (sarsa):"
 #python test_scripts/analyze.py sarsaLambda-1.csv sarsaLambda-2.csv sarsaLambda-3.csv
@@ -47,7 +47,7 @@ python test_scripts/analyze.py sarsaLambda-1.csv sarsaLambda-2.csv sarsaLambda-3
 #for ((i=1; i<=$runs; i++));
 #do
 #    echo "\t run $i..."
-#    python main.py -p linearQ -b 300 -csv > "sarsaLambda-$i.csv"
+#    python main.py -p linearQ -b 300 -seed $i -csv > "sarsaLambda-$i.csv"
 #done
 #echo "average cumulative  score (q learning):"
 #python test_scripts/analyze.py sarsaLambda-1.csv sarsaLambda-2.csv sarsaLambda-3.csv
@@ -57,7 +57,7 @@ python test_scripts/analyze.py sarsaLambda-1.csv sarsaLambda-2.csv sarsaLambda-3
 #for ((i=1; i<=$runs; i++));
 #do
 #    echo "\t run $i..."
-#    python main.py -p nn -b 300 -csv > "sarsaLambda-$i.csv"
+#    python main.py -p nn -b 300 -seed $i -csv > "sarsaLambda-$i.csv"
 #done
 #echo "average cumualative score (nn):"
 #python test_scripts/analyze.py sarsaLambda-1.csv sarsaLambda-2.csv sarsaLambda-3.csv
@@ -1,32 +1,33 @@
+"""
+makes a csv with each config's runs' cumulative scores as a column
 
-import collections
+usage: python combine_csvs.py results.db [train|eval] [games] > combined.csv
+       python combine_csvs.py run1.csv run2.csv ... > combined.csv (main.py -csv files)
+"""
+import itertools
+import os
 import sys
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.results_store import ResultsStore
 
-print sys.argv
 
-# make {run type => [cumulative scores]} mapping
-d = collections.defaultdict(list)
-for file in sys.argv[1:]:
-    #    print file
-    #    for replay and lambda files
-    file_type = '-'.join(file.split('-')[1:])
-#    print file_type, file
-#    for cross-agent files
-#    file_type = file.split('-')[0]
-    cumulative_score = open(file).readlines()[-1].split(',')[0]
-    d[file_type].append(cumulative_score)
+if sys.argv[1].endswith('.csv'):
+    store = ResultsStore(':memory:')
+    for path in sys.argv[1:]:
+        store.add_csv(path)
+    evaluation = False
+    games = None
+else:
+    store = ResultsStore(sys.argv[1])
+    evaluation = (sys.argv[2] == 'eval') if len(sys.argv) > 2 else True
+    games = int(sys.argv[3]) if len(sys.argv) > 3 else None
 
+# {config => cumulative scores of its runs}
+config_ids = store.config_ids(evaluation)
+columns = [store.totals(config_id, evaluation=evaluation, games=games) for config_id in config_ids]
+store.close()
 
-# make csv with cumulative scores for each run type as columns
-score_matrix = d.items()
-csv = ','.join(name for name, values in score_matrix) + '\n'
-csv += '\n'.join(','.join(values[i] for name, values in score_matrix)
-                 for i in range(len(score_matrix[0][1])))
-# just print it
-print csv
-# write the csv
-# for filename, csv in d.items():
-#     f = open('out-'+ filename, 'w')
-#     f.write(csv)
-#     f.close()
+print ','.join(config_ids)
+for row in itertools.izip_longest(*columns, fillvalue=''):
+    print ','.join(str(v) for v in row)
@@ -1,11 +1,19 @@
-import subprocess
 import os
-import time
-from tqdm import tqdm
 import sys
+from tqdm import tqdm
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.evaluation_server import EvaluationServer, scheduled
+from src.experiment_runner import ExperimentRunner, expand_grid, write_csv
+from src.job_queue import Coordinator
+from src.result_cache import ResultCache
+from src.results_store import ResultsStore
 
 
 run_type = sys.argv[1]
+# with an address (e.g. 0.0.0.0:5555), runs are handed out to test_scripts/job_worker.py
+#   workers on any number of machines instead of played here
+address = sys.argv[2] if len(sys.argv) > 2 else None
 
 # test configuration
 games = 4000
@@ -13,42 +21,39 @@ runs = 64
 players = ["randomBaseline", "simpleQLearning", "linearQ",
            "linearReplayQ", "sarsa", "sarsaLambda", "nn", "policyGradients"]
 
-# multithreading configuration
-MAX_PROCESSES = 4
-main_loc = os.path.abspath("main.py")
-processes = set()
+# every run's games, for analyze.py and combine_csvs.py
+store = ResultsStore('results.db')
 
 
 if run_type == 'train':
-    train_cmd = "python %s -p %s -b %s -e 0.3 -wr %s-%s.model > %s-%s.log"
-
-    # start consuming all the training commands concurrently, running MAX_PROCESSES of them at a time
     print "TRAINING..."
-    train_commands = [train_cmd % (main_loc, player, games, player, i, player, i)
-                      for player in players for i in range(1, runs+1)]
-    for cmd in tqdm(train_commands):
-        print '\t' + cmd
-        processes.add(subprocess.Popen(cmd, shell=True))
-        if len(processes) >= MAX_PROCESSES:
-            os.wait()
-            processes.difference_update(
-                [p for p in processes if p.poll() is not None])
+    # one worker process per core. runs that have been run before come from the cache
+    runner = Coordinator(address, cache=ResultCache()) if address else ExperimentRunner(cache=ResultCache())
+    specs = expand_grid(players, games, runs, config={'epsilon': 0.3},
+                        write_model='{player}-{run}.model', seed=0)
+    for record in tqdm(runner.imap(specs), total=len(specs)):
+        store.add(record)
+    runner.close()
 
 
 elif run_type == 'test':
-    test_cmd = "python %s -p %s -b %s -e 0.01 -rd %s-%s.model -csv > %s-%s.csv"
-
-    # then consume all test commands
     print "TESTING..."
-    test_commands = [test_cmd % (main_loc, player, games / 2, player, i, player, i)
-                     for player in players for i in range(1, runs+1)]
-    for cmd in tqdm(test_commands):
-        print '\t' + cmd
-        processes.add(subprocess.Popen(cmd, shell=True))
-        if len(processes) >= MAX_PROCESSES:
-            os.wait()
-            processes.difference_update(
-                [p for p in processes if p.poll() is not None])
+    # every model plays the same seeded games
+    specs = expand_grid(players, games / 2, runs, config={'epsilon': 0.01},
+                        read_model='{player}-{run}.model')
+    if address:
+        server = Coordinator(address, cache=ResultCache())
+        records = server.imap(scheduled(specs, games / 2, 1000))
+    else:
+        # each model is loaded once
+        server = EvaluationServer(cache=ResultCache())
+        records = server.imap(specs, games / 2, seed=1000)
+    for record in tqdm(records, total=len(specs)):
+        store.add(record)
+        write_csv(record, '%s-%s.csv' % (record['player'], record['run']))
+    server.close()
+
+store.close()
 
 
 # THESE LAST TWO STEPS ARE NOW IN THE MAKEFILE
@@ -0,0 +1,38 @@
+"""
+This script compares each agent's frames/sec while training with its frames/sec
+in (frozen) evaluation mode
+
+usage: python test_scripts/eval_throughput.py [games] [players...]
+"""
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import src.agent_registry as agent_registry
+import src.game_engine as breakout
+
+
+# test configuration
+games = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+players = sys.argv[2:] or ["followBaseline", "randomBaseline", "simpleQLearning", "linearQ",
+                           "linearReplayQ", "sarsa", "sarsaLambda", "policyGradients"]
+
+
+def play(agent):
+    # run() reports every game; only the throughput is wanted here
+    stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+    try:
+        game = breakout.BotControlledBreakout(agent, False, False, False, games, None, None)
+        game.run()
+    finally:
+        sys.stdout = stdout
+    return game.frames_per_second
+
+
+print 'player,games,train_fps,eval_fps,speedup'
+for player in players:
+    agent = agent_registry.build_agent(player, {'epsilon': 0.01, 'nn_backend': 'numpy'})
+    train_fps = play(agent)
+    agent.freeze()
+    eval_fps = play(agent)
+    print '%s,%s,%.0f,%.0f,%.2f' % (player, games, train_fps, eval_fps, eval_fps / train_fps)
@@ -0,0 +1,40 @@
+"""
+This script scores saved models on a shared seeded schedule of games (see
+src/evaluation_server.py), printing each model's statistics as a csv line. models are
+given as player:path
+
+usage: python test_scripts/evaluate_models.py [-games 100] [-seed 1000] [-e 0.01] [-workers N] player:path...
+       e.g. python test_scripts/evaluate_models.py -games 200 linearQ:linearQ-1.model sarsaLambda:sarsaLambda-1.model
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.evaluation_server import EvaluationServer
+from src.result_cache import ResultCache
+
+STATS = ['games', 'mean_score', 'ci95', 'std_score', 'median_score', 'min_score', 'max_score',
+         'mean_frames', 'mean_bricks', 'seconds']
+
+parser = argparse.ArgumentParser(description='score saved models on the same seeded games')
+parser.add_argument('models', nargs='+', help="player:model file")
+parser.add_argument('-games', type=int, default=100, help="games per model")
+parser.add_argument('-seed', type=int, default=1000, help="game i is seeded seed + i")
+parser.add_argument('-e', type=float, default=0.01, help="epsilon (exploration prob)")
+parser.add_argument('-workers', type=int, help="worker processes (defaults to one per core)")
+parser.add_argument('-cache', action='store_true', help="reuse (and cache) scores of models already evaluated")
+args = parser.parse_args()
+
+specs = []
+for model in args.models:
+    player, _, path = model.partition(':')
+    if not path:
+        parser.error('models are given as player:path, not %s' % model)
+    specs.append({'run_id': model, 'player': player, 'read_model': path, 'config': {'epsilon': args.e}})
+
+server = EvaluationServer(args.workers, cache=ResultCache() if args.cache else None)
+print ','.join(['model'] + STATS)
+for record in server.evaluate(specs, args.games, args.seed):
+    print ','.join([record['run_id']] + ['%.4g' % record['stats'][stat] for stat in STATS])
+server.close()
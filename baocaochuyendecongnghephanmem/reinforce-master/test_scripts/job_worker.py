@@ -0,0 +1,32 @@
+"""
+This script runs job queue workers (see src/job_queue.py) for a coordinator, e.g. the one
+test_scripts/cumulative_plot.py starts when it's given an address. run it on every
+machine that should take part; the workers stop when the coordinator is done
+
+usage: python test_scripts/job_worker.py host:port [processes]
+       e.g. python test_scripts/job_worker.py 10.0.0.5:5555 8
+"""
+import multiprocessing
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.experiment_runner import init_worker
+from src.job_queue import Worker
+
+
+def work(address):
+    # the agents print while they play
+    init_worker(True)
+    Worker(address).run()
+
+
+address = sys.argv[1]
+# one worker per core by default
+processes = int(sys.argv[2]) if len(sys.argv) > 2 else multiprocessing.cpu_count()
+
+workers = [multiprocessing.Process(target=work, args=(address,)) for _ in range(processes)]
+for worker in workers:
+    worker.start()
+for worker in workers:
+    worker.join()
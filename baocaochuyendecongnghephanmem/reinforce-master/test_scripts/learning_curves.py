@@ -0,0 +1,26 @@
+"""
+prints every config's learning curve: mean cumulative score after each game, with its
+    95% confidence interval, as a csv (one row per game, two columns per config)
+
+usage: python learning_curves.py results.db [train|eval] > curves.csv
+"""
+import itertools
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.results_store import ResultsStore
+
+
+store = ResultsStore(sys.argv[1])
+evaluation = (sys.argv[2] == 'eval') if len(sys.argv) > 2 else False
+
+config_ids = store.config_ids(evaluation)
+columns = []
+for config_id in config_ids:
+    columns += store.learning_curve(config_id, evaluation=evaluation)
+store.close()
+
+print 'game,' + ','.join('%s,%s_ci95' % (c, c) for c in config_ids)
+for game, row in enumerate(itertools.izip_longest(*columns, fillvalue=''), 1):
+    print '%s,%s' % (game, ','.join(str(v) for v in row))
@@ -1,8 +1,11 @@
-import subprocess
 import os
-import time
-from tqdm import tqdm
 import sys
+from tqdm import tqdm
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.experiment_runner import ExperimentRunner, expand_grid, write_csv
+from src.result_cache import ResultCache
+from src.results_store import ResultsStore
 
 
 # test configuration
@@ -11,25 +14,19 @@ runs = 1
 players = ["randomBaseline", "simpleQLearning", "linearQ",
            "linearReplayQ", "sarsa", "sarsaLambda", "nn", "policyGradients"]
 
-# multithreading configuration
-MAX_PROCESSES = 4
-main_loc = os.path.abspath("main.py")
-processes = set()
-
-
-train_cmd = "python %s -p %s -b %s -e 0.3 -wr %s-%s.model -csv > %s-%s.csv"
+# one worker process per core. runs that have been run before come from the cache
+runner = ExperimentRunner(cache=ResultCache())
+# every run's games, for analyze.py and combine_csvs.py
+store = ResultsStore('results.db')
 
-# start consuming all the training commands concurrently, running MAX_PROCESSES of them at a time
 print "TRAINING..."
-train_commands = [train_cmd % (main_loc, player, games, player, i, player, i)
-                  for player in players for i in range(1, runs+1)]
-for cmd in tqdm(train_commands):
-    print '\t' + cmd
-    processes.add(subprocess.Popen(cmd, shell=True))
-    if len(processes) >= MAX_PROCESSES:
-        os.wait()
-        processes.difference_update(
-            [p for p in processes if p.poll() is not None])
+specs = expand_grid(players, games, runs, config={'epsilon': 0.3},
+                    write_model='{player}-{run}.model', seed=0)
+for record in tqdm(runner.imap(specs), total=len(specs)):
+    store.add(record)
+    write_csv(record, '%s-%s.csv' % (record['player'], record['run']))
+runner.close()
+store.close()
 
 
 # THESE LAST TWO STEPS ARE NOW IN THE MAKEFILE
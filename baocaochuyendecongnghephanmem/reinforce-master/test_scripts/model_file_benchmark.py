@@ -0,0 +1,52 @@
+"""
+This script compares writing and reading linear agent weights in the old text
+format (str() / eval) against binary model files, at increasing model sizes
+
+usage: python test_scripts/model_file_benchmark.py [max entries]
+"""
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.agents import QLearning
+from src.feature_extractors import ContinuousFeaturesV2
+
+
+# test configuration
+max_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 10 ** 6
+
+
+def timed(f):
+    start = time.time()
+    f()
+    return time.time() - start
+
+
+def make_agent(entries):
+    agent = QLearning(ContinuousFeaturesV2())
+    # keys shaped like the feature extractors' (feature, serialized action) pairs
+    agent.weights = defaultdict(float, ((('feature_%d' % i, ('L',)), i * 1e-3) for i in xrange(entries)))
+    return agent
+
+
+def write_text(agent, path):
+    with open(path, 'w') as f:
+        f.write(str(agent.weights))
+
+
+path = os.path.join(tempfile.mkdtemp(), 'weights.model')
+print 'format,entries,mbytes,write_sec,read_sec'
+entries = 10 ** 3
+while entries <= max_entries:
+    agent = make_agent(entries)
+    reader = QLearning(ContinuousFeaturesV2())
+    for format, write in [('text', lambda: write_text(agent, path)), ('binary', lambda: agent.write_model(path))]:
+        write_time = timed(write)
+        read_time = timed(lambda: reader.read_model(path))
+        assert len(reader.weights) == entries
+        print '%s,%s,%.1f,%.3f,%.3f' % (format, entries, os.path.getsize(path) / 2.0 ** 20, write_time, read_time)
+    entries *= 10
+os.remove(path)
@@ -0,0 +1,68 @@
+"""
+This script checks that the numpy and tensorflow NNAgent backends compute the
+same numbers from the same starting weights, and compares their per-call latency
+
+usage: python test_scripts/nn_backend_parity.py [num steps]
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.numpy_q_network import NumpyQNetwork
+from src.tf_q_network import TFQNetwork
+
+
+# test configuration
+num_steps = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+input_size = 5
+num_actions = 3
+batch_size = 32
+gamma = 0.993
+
+np.random.seed(0)
+networks = [NumpyQNetwork(input_size, False, num_actions, replay=True),
+            TFQNetwork(input_size, False, num_actions, replay=True)]
+# start both from the same weights
+for network in networks[1:]:
+    network.set_weights(networks[0].get_weights())
+    network.update_target()
+
+# a fixed schedule of random transitions, fed identically to both
+transitions = [(np.random.random_sample((1, input_size)),
+                np.random.random_sample((num_actions, input_size)),
+                np.random.choice([0.0, 3.0, -1.0]),
+                gamma if np.random.random_sample() > 0.01 else 0.0)
+               for _ in xrange(num_steps)]
+batches = [(np.random.random_sample((batch_size, input_size)),
+            np.random.random_sample((batch_size, num_actions, input_size)),
+            np.random.random_sample((batch_size, num_actions)) > 0.3,
+            np.random.random_sample(batch_size),
+            np.full(batch_size, gamma))
+           for _ in xrange(num_steps / 10)]
+probe = np.random.random_sample((num_actions, input_size))
+
+print 'backend,q_values_us,train_us,train_batch_us'
+results = []
+for network in networks:
+    start = time.time()
+    for x, next_x, reward, bootstrap in transitions:
+        network.q_values(next_x)
+    q_time = (time.time() - start) / len(transitions)
+
+    start = time.time()
+    for x, next_x, reward, bootstrap in transitions:
+        network.train(x, next_x, reward, bootstrap)
+    train_time = (time.time() - start) / len(transitions)
+
+    start = time.time()
+    for batch in batches:
+        network.train_batch(*batch)
+    batch_time = (time.time() - start) / len(batches)
+
+    results.append(network.q_values(probe))
+    print '%s,%.1f,%.1f,%.1f' % (network.__class__.__name__, q_time * 1e6, train_time * 1e6, batch_time * 1e6)
+
+# tensorflow runs in float32, so agreement is up to single precision round-off
+print 'max |Q_numpy - Q_tf| after training: %g' % np.abs(results[0] - results[1]).max()
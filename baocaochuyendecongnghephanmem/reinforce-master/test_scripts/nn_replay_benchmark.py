@@ -0,0 +1,54 @@
+"""
+This script compares wall-clock time for the nn agent to reach a cumulative
+score with single-sample training versus minibatch replay training
+"""
+
+import subprocess
+import os
+import time
+import sys
+
+
+# test configuration
+games = 2000
+runs = 4
+target_score = 500
+
+main_loc = os.path.abspath("main.py")
+
+configs = {
+    'single': ['python', main_loc, '-p', 'nn', '-b', str(games), '-e', '0.3', '-csv'],
+    'replay': ['python', main_loc, '-p', 'nn', '-b', str(games), '-e', '0.3', '-memory_size', '5000',
+               '-sample_size', '32', '-train_every', '4', '-csv'],
+}
+
+
+def seconds_to_target(cmd):
+    """runs cmd (an argv list), returning seconds until its cumulative score first
+        reaches target_score (None if it never does). the run is stopped there, so it
+        doesn't eat into the next one's timing
+    """
+    start = time.time()
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    elapsed = None
+    try:
+        # skip whatever is printed before the csv header (pygame's banner)
+        for line in iter(process.stdout.readline, ''):
+            if line.startswith('cum_score'):
+                break
+        for line in iter(process.stdout.readline, ''):
+            if int(line.split(',')[0]) >= target_score:
+                elapsed = time.time() - start
+                break
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+    return elapsed
+
+
+print 'config,run,seconds_to_target'
+for name, cmd in sorted(configs.items()):
+    for i in range(1, runs+1):
+        print '%s,%s,%s' % (name, i, seconds_to_target(cmd))
+        sys.stdout.flush()
@@ -0,0 +1,54 @@
+"""
+This script tests different n-step return settings for replay Q-learning,
+reporting how many frames each setting needs before its cumulative score
+reaches a target
+"""
+import collections
+import os
+import sys
+import numpy as np
+from tqdm import tqdm
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.experiment_runner import ExperimentRunner, expand_grid
+from src.result_cache import ResultCache
+from src.results_store import ResultsStore
+
+
+# test configuration
+train_games = 2000
+runs = 24
+target_score = 1000
+
+n_steps = [1, 3, 5, 10]
+
+
+def frames_to_target(record):
+    """number of frames played before cumulative score first reaches target_score
+        (None if it never does)
+    """
+    reached = np.flatnonzero(np.cumsum(record['score']) >= target_score)
+    return np.cumsum(record['frames'])[reached[0]] if reached.size else None
+
+
+# one worker process per core. runs that have been run before come from the cache
+runner = ExperimentRunner(cache=ResultCache())
+# every run's games, for analyze.py and combine_csvs.py
+store = ResultsStore('results.db')
+
+print "TRAINING..."
+frames = collections.defaultdict(list)
+specs = expand_grid(['linearReplayQ'], train_games, runs, {'n_step': n_steps}, config={'epsilon': 0.3}, seed=0)
+for record in tqdm(runner.imap(specs), total=len(specs)):
+    store.add(record)
+    frames[record['config']['n_step']].append(frames_to_target(record))
+runner.close()
+store.close()
+
+
+print "FRAMES TO CUMULATIVE SCORE %s..." % target_score
+print 'n_step,runs_reaching_target,mean_frames'
+for n in n_steps:
+    reached = [f for f in frames[n] if f is not None]
+    mean_frames = sum(reached) * 1.0 / len(reached) if reached else float('nan')
+    print '%s,%s,%s' % (n, len(reached), mean_frames)
@@ -0,0 +1,39 @@
+"""
+This script times policy gradient updates with episode collection spread over
+increasing numbers of worker processes
+
+usage: python test_scripts/parallel_pg_benchmark.py [batch size] [updates]
+"""
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.agents import PolicyGradients
+from src.feature_extractors import ContinuousFeaturesV2
+from src.parallel_policy_gradients import ParallelPolicyGradients
+
+
+# test configuration
+batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 64     # reward events per update
+num_updates = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+max_workers = multiprocessing.cpu_count()
+worker_counts = sorted(set([1, 2, 4, max_workers]))
+
+print 'workers,batch_size,updates,sec/update,speedup'
+baseline = None
+for workers in worker_counts:
+    agent = PolicyGradients(ContinuousFeaturesV2(), False, batch_size=batch_size)
+    trainer = ParallelPolicyGradients(agent, workers)
+    trainer.update()    # warm up: worker startup, first games
+
+    start = time.time()
+    for i in xrange(num_updates):
+        trainer.update()
+    per_update = (time.time() - start) / num_updates
+    trainer.close()
+
+    baseline = baseline or per_update
+    print '%s,%s,%s,%.3f,%.2f' % (workers, batch_size, num_updates, per_update, baseline / per_update)
@@ -0,0 +1,49 @@
+"""
+This script measures the per-frame (takeAction) and per-update (reward event)
+cost of the policy gradients agent on increasingly long episodes
+"""
+import os
+import sys
+import time
+import random
+import pygame
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.agents import PolicyGradients
+from src.feature_extractors import ContinuousFeaturesV2
+from src.constants import *
+
+
+# test configuration
+episode_lengths = [100, 1000, 10000, 100000]
+updates = 5
+
+
+def random_state():
+    ball = pygame.Rect(random.randint(0, MAX_BALL_X), random.randint(0, MAX_BALL_Y), BALL_DIAMETER, BALL_DIAMETER)
+    paddle = pygame.Rect(random.randint(0, MAX_PADDLE_X), PADDLE_Y, PADDLE_WIDTH, PADDLE_HEIGHT)
+    return {'game_state': STATE_PLAYING, 'ball': ball, 'paddle': paddle,
+            'ball_vel': [random.uniform(-5, 5), random.uniform(-5, 5)]}
+
+
+states = [random_state() for _ in range(1000)]
+
+print 'episode_length,us_per_frame,ms_per_update'
+for length in episode_lengths:
+    agent = PolicyGradients(ContinuousFeaturesV2(), False, gamma=0.993)
+    agent.gameIters = 2     # skip the start-of-game bookkeeping
+    frame_time = 0.0
+    update_time = 0.0
+    for _ in range(updates):
+        for t in xrange(length):
+            state = states[t % len(states)]
+            start = time.time()
+            action = agent.takeAction(state)
+            frame_time += time.time() - start
+            if t < length - 1:
+                agent.incorporateFeedback(state, action, 0, state)
+        # the reward event at the end of the episode triggers the gradient computation
+        start = time.time()
+        agent.incorporateFeedback(state, action, 3, state)
+        update_time += time.time() - start
+    print '%s,%.1f,%.2f' % (length, frame_time / (updates * length) * 1e6, update_time / updates * 1e3)
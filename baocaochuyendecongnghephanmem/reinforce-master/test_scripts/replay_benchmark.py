@@ -0,0 +1,59 @@
+"""
+This script benchmarks store/sample throughput of the uniform and prioritized
+replay memories at increasing capacities
+
+usage: python test_scripts/replay_benchmark.py [max capacity]
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.replay_memory import ReplayMemory, PrioritizedReplayMemory
+
+
+# test configuration
+max_capacity = int(sys.argv[1]) if len(sys.argv) > 1 else 2 ** 21
+feature_dim = 8        # keep records small so millions of them fit in RAM
+batch_size = 32
+num_ops = 20000
+
+
+def bench(memory):
+    features = np.random.random_sample(feature_dim)
+    next_features = np.random.random_sample((memory.num_actions, feature_dim))
+    next_valid = np.ones(memory.num_actions, dtype=np.bool_)
+
+    # fill the buffer first so sampling sees the whole capacity (in bulk, it's not what we're timing)
+    memory.experience['features'][:] = features
+    memory.experience['next_features'][:] = next_features
+    memory.experience['next_valid'][:] = next_valid
+    memory.num_stored = memory.capacity
+    if isinstance(memory, PrioritizedReplayMemory):
+        memory.update_priorities(np.arange(memory.capacity), np.random.random_sample(memory.capacity))
+
+    start = time.time()
+    for i in xrange(num_ops):
+        memory.store(features, 0, 0.0, next_features, next_valid, False)
+    store_time = time.time() - start
+
+    start = time.time()
+    for i in xrange(num_ops):
+        indices = memory.sample(batch_size)
+        if isinstance(memory, PrioritizedReplayMemory):
+            memory.importance_weights(indices)
+            memory.update_priorities(indices, np.random.random_sample(batch_size))
+    sample_time = time.time() - start
+
+    return num_ops / store_time, num_ops / sample_time
+
+
+print 'memory,capacity,mbytes,stores/sec,batches/sec'
+capacity = 2 ** 10
+while capacity <= max_capacity:
+    for memory in [ReplayMemory(capacity, feature_dim), PrioritizedReplayMemory(capacity, feature_dim)]:
+        stores, batches = bench(memory)
+        print '%s,%s,%.1f,%.0f,%.0f' % (memory.__class__.__name__, capacity,
+                                        memory.nbytes / 2.0 ** 20, stores, batches)
+    capacity *= 4
@@ -1,51 +1,56 @@
 """
 This script tests different replay memory settings
-"""
 
-import subprocess
+Settings are trained with successive halving: every setting plays (about) min_games games, the
+best third go on to 3x as many, and so on up to train_games. Only the best setting is
+trained all the way and tested
+"""
 import os
-import time
-from tqdm import tqdm
 import sys
+from tqdm import tqdm
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.experiment_runner import ExperimentRunner, expand_grid, write_csv
+from src.result_cache import ResultCache
+from src.results_store import ResultsStore
+from src.successive_halving import Sweep, successive_halving
 
 
 # test configuration
 train_games = 2000
+min_games = 250
 test_games = 2000
 runs = 24
 
-# multithreading configuration
-MAX_PROCESSES = 4
-main_loc = os.path.abspath("main.py")
-processes = set()
-
 memories = [100, 1000, 5000, 10000]
 samples = [4, 8, 16]
+grid = {'memory_size': memories, 'sample_size': samples}
+model = 'linearReplayQ-{run}-{memory_size}-{sample_size}.model'
+
+# one worker process per core. runs that have been run before come from the cache
+runner = ExperimentRunner(cache=ResultCache())
+# every run's games, for analyze.py and combine_csvs.py
+store = ResultsStore('results.db')
+
+print "TRAINING..."
+sweep = Sweep(runner, expand_grid(['linearReplayQ'], train_games, runs, grid, config={'epsilon': 0.3},
+                                  write_model=model), store=store)
+rungs = successive_halving(sweep, min_games, train_games)
+sweep.close()
+print 'games,config,mean_cumulative_score'
+for games, ranked in rungs:
+    for config_id, score in ranked:
+        print '%s,%s,%s' % (games, config_id, score)
+print 'played %s of the full grid\'s %s games' % (sweep.games_played, sweep.full_cost(train_games))
+best = rungs[-1][1][0][0]
 
-
-# train_cmd = "python %s -p linearReplayQ -b %s -e 0.3 -memory_size %d -sample_size %d -wr linearReplayQ-%s-%s-%s.model > linearReplayQ-%s-%s-%s.log"
-
-# # start consuming all the training commands concurrently, running MAX_PROCESSES of them at a time
-# print "TRAINING..."
-# train_commands = [train_cmd % (main_loc, train_games, mem_size, sample_size, i, mem_size, sample_size, i, mem_size, sample_size) for mem_size in memories for sample_size in samples for i in range(1, runs+1)]
-
-# for cmd in tqdm(train_commands):
-#     print '\t' + cmd
-#     processes.add(subprocess.Popen(cmd, shell=True))
-#     if len(processes) >= MAX_PROCESSES:
-#         os.wait()
-#         processes.difference_update([p for p in processes if p.poll() is not None])
-
-
-# then consume all test commands
 print "TESTING..."
-train_cmd = "python %s -p linearReplayQ -b %s -e 0.01 -memory_size %d -sample_size %d -rd linearReplayQ-%s-%s-%s.model -csv > linearReplayQ-%s-%s-%s.csv"
-test_commands = [train_cmd % (main_loc, test_games, mem_size, sample_size, i, mem_size, sample_size, i,
-                              mem_size, sample_size) for mem_size in memories for sample_size in samples for i in range(1, runs+1)]
-for cmd in tqdm(test_commands):
-    print '\t' + cmd
-    processes.add(subprocess.Popen(cmd, shell=True))
-    if len(processes) >= MAX_PROCESSES:
-        os.wait()
-        processes.difference_update(
-            [p for p in processes if p.poll() is not None])
+specs = [spec for spec in expand_grid(['linearReplayQ'], test_games, runs, grid, config={'epsilon': 0.01},
+                                      read_model=model, eval=True, seed=1000)
+         if spec['config_id'] == best]
+for record in tqdm(runner.imap(specs), total=len(specs)):
+    store.add(record)
+    config = record['config']
+    write_csv(record, 'linearReplayQ-%s-%s-%s.csv' % (record['run'], config['memory_size'], config['sample_size']))
+runner.close()
+store.close()
@@ -1,53 +1,56 @@
 """
 This script tests different sarsa lambda settings
-"""
 
-import subprocess
+Settings are trained with successive halving: every setting plays (about) min_games games, the
+best third go on to 3x as many, and so on up to train_games. Only the best setting is
+trained all the way and tested
+"""
 import os
-import time
-from tqdm import tqdm
 import sys
+from tqdm import tqdm
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.experiment_runner import ExperimentRunner, expand_grid, write_csv
+from src.result_cache import ResultCache
+from src.results_store import ResultsStore
+from src.successive_halving import Sweep, successive_halving
 
 
 # test configuration
 train_games = 2000
+min_games = 250
 test_games = 1000
 runs = 24
 
-# multithreading configuration
-MAX_PROCESSES = 4
-main_loc = os.path.abspath("main.py")
-processes = set()
-
 lambdas = [0.0, 0.1, 0.5, 0.98]
 thresholds = [0.01, 0.1, 0.25]
+grid = {'trace_decay': lambdas, 'trace_threshold': thresholds}
+model = 'sarsaLambda-{run}-{trace_decay}-{trace_threshold}.model'
 
+# one worker process per core. runs that have been run before come from the cache
+runner = ExperimentRunner(cache=ResultCache())
+# every run's games, for analyze.py and combine_csvs.py
+store = ResultsStore('results.db')
 
-train_cmd = "python %s -p sarsaLambda -b %s -e 0.3 -trace_threshold %d -trace_decay %d -wr sarsaLambda-%s-%s-%s.model > sarsaLambda-%s-%s-%s.log"
-
-# start consuming all the training commands concurrently, running MAX_PROCESSES of them at a time
 print "TRAINING..."
-train_commands = [train_cmd % (main_loc, train_games, l, t, i, l, t, i, l, t)
-                  for l in lambdas for t in thresholds for i in range(1, runs+1)]
-
-for cmd in tqdm(train_commands):
-    print '\t' + cmd
-    processes.add(subprocess.Popen(cmd, shell=True))
-    if len(processes) >= MAX_PROCESSES:
-        os.wait()
-        processes.difference_update(
-            [p for p in processes if p.poll() is not None])
-
+sweep = Sweep(runner, expand_grid(['sarsaLambda'], train_games, runs, grid, config={'epsilon': 0.3},
+                                  write_model=model), store=store)
+rungs = successive_halving(sweep, min_games, train_games)
+sweep.close()
+print 'games,config,mean_cumulative_score'
+for games, ranked in rungs:
+    for config_id, score in ranked:
+        print '%s,%s,%s' % (games, config_id, score)
+print 'played %s of the full grid\'s %s games' % (sweep.games_played, sweep.full_cost(train_games))
+best = rungs[-1][1][0][0]
 
-# then consume all test commands
 print "TESTING..."
-train_cmd = "python %s -p sarsaLambda -b %s -e 0.01 -trace_threshold %d -trace_decay %d -rd sarsaLambda-%s-%s-%s.model -csv > sarsaLambda-%s-%s-%s.csv"
-test_commands = [train_cmd % (main_loc, test_games, l, t, i, l, t, i, l, t)
-                 for l in lambdas for t in thresholds for i in range(1, runs+1)]
-for cmd in tqdm(test_commands):
-    print '\t' + cmd
-    processes.add(subprocess.Popen(cmd, shell=True))
-    if len(processes) >= MAX_PROCESSES:
-        os.wait()
-        processes.difference_update(
-            [p for p in processes if p.poll() is not None])
+specs = [spec for spec in expand_grid(['sarsaLambda'], test_games, runs, grid, config={'epsilon': 0.01},
+                                      read_model=model, eval=True, seed=1000)
+         if spec['config_id'] == best]
+for record in tqdm(runner.imap(specs), total=len(specs)):
+    store.add(record)
+    config = record['config']
+    write_csv(record, 'sarsaLambda-%s-%s-%s.csv' % (record['run'], config['trace_decay'], config['trace_threshold']))
+runner.close()
+store.close()
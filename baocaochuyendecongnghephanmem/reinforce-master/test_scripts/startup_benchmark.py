@@ -0,0 +1,32 @@
+"""
+This script measures cold start time of main.py for every agent type: the time
+to launch the interpreter, import everything, build the agent and play zero games
+
+usage: python test_scripts/startup_benchmark.py [runs per agent]
+"""
+
+import subprocess
+import os
+import time
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.agent_registry import agent_names
+
+
+# test configuration
+runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+main_loc = os.path.abspath("main.py")
+devnull = open(os.devnull, 'w')
+
+players = agent_names() + ['nn -nn_backend numpy']
+
+print 'player,mean_seconds,min_seconds'
+for player in players:
+    times = []
+    for i in range(runs):
+        start = time.time()
+        subprocess.call("python %s -p %s -b 0" % (main_loc, player), shell=True,
+                        stdout=devnull, stderr=devnull)
+        times.append(time.time() - start)
+    print '%s,%.3f,%.3f' % (player, sum(times) / len(times), min(times))
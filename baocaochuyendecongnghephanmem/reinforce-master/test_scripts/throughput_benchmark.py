@@ -0,0 +1,296 @@
+"""
+Throughput benchmark suite
+
+Measures how fast the moving parts run (rather than how well the agents play):
+    - engine:   frames/sec of Breakout.execute_turn
+    - features: ns per get_features call, for every feature extractor
+    - agents:   us per takeAction and per incorporateFeedback (update latency), for
+                every agent in the registry
+    - replay:   store/sample calls per sec of the uniform and prioritized ReplayMemory
+    - traces:   set/update calls per sec of EligibilityTrace
+
+Every measurement is the best of -repeat tries. Results are written as a JSON baseline;
+    given an earlier one with -baseline, each metric is compared against it and anything
+    more than -threshold worse is flagged (and the script exits 1)
+
+usage: python test_scripts/throughput_benchmark.py [-o out.json] [-baseline old.json]
+                                                   [-threshold 0.1] [-repeat 3] [-frames 5000]
+                                                   [-only engine,features,agents,replay,traces]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import numpy as np
+import pygame
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import src.agent_registry as agent_registry
+import src.feature_extractors as feature_extractors
+import src.game_engine as breakout
+from src.constants import *
+from src.eligibility_tracer import EligibilityTrace
+from src.replay_memory import ReplayMemory, PrioritizedReplayMemory
+
+SUITES = ['engine', 'features', 'agents', 'replay', 'traces']
+
+# agents that can be benchmarked from scratch (table needs a compiled policy to play,
+#   test is whatever's being tried out). nn is benchmarked on both backends
+AGENT_CONFIGS = dict((name, {}) for name in agent_registry.agent_names() if name not in ('table', 'test'))
+AGENT_CONFIGS['nn'] = {'nn_backend': 'tf'}
+AGENT_CONFIGS['nn_numpy'] = {'nn_backend': 'numpy'}
+
+GAME_ACTIONS = [[], [INPUT_L], [INPUT_R]]
+
+
+def best_of(repeat, fn):
+    """fastest of repeat calls to fn (which returns the seconds it measured)"""
+    return min(fn() for _ in range(repeat))
+
+
+def new_game(agent=None):
+    """a headless game. the engine and feature benchmarks drive it without an agent"""
+    return breakout.BotControlledBreakout(agent, False, False, False, 0, None, None)
+
+
+def random_input(game):
+    if game.game_state == STATE_BALL_IN_PADDLE:
+        return [INPUT_SPACE]
+    if game.game_state == STATE_GAME_OVER:
+        return [INPUT_ENTER]
+    return random.choice(GAME_ACTIONS)
+
+
+def copy_state(state):
+    """get_state() shares the game's rects and lists, which keep changing"""
+    state = dict(state)
+    state['ball'] = state['ball'].copy()
+    state['paddle'] = state['paddle'].copy()
+    state['ball_vel'] = list(state['ball_vel'])
+    state['bricks'] = [brick.copy() for brick in state['bricks']]
+    return state
+
+
+def recorded_states(n):
+    """n game states from random play"""
+    game = new_game()
+    states = []
+    while len(states) < n:
+        game.take_input(random_input(game))
+        game.execute_turn()
+        states.append(copy_state(game.get_state()))
+    return states
+
+
+def bench_engine(args):
+    game = new_game()
+    def run():
+        game.init_game()
+        start = time.time()
+        for _ in xrange(args.frames):
+            game.take_input(random_input(game))
+            game.execute_turn()
+        return time.time() - start
+    return {'engine.execute_turn': (args.frames / best_of(args.repeat, run), 'frames/s', 'higher')}
+
+
+def bench_features(args):
+    states = recorded_states(min(args.frames, 2000))
+    results = {}
+    for name in sorted(set(agent_registry.FEATURE_SETS.values())):
+        extractor = getattr(feature_extractors, name)()
+        def run():
+            start = time.time()
+            for state in states:
+                for action in GAME_ACTIONS:
+                    extractor.get_features(state, action)
+            return time.time() - start
+        calls = len(states) * len(GAME_ACTIONS)
+        results['features.%s.get_features' % name] = (best_of(args.repeat, run) / calls * 1e9, 'ns/call', 'lower')
+    return results
+
+
+def play_agent(agent, frames):
+    """plays frames frames with agent learning, timing its two calls.
+        returns (seconds in takeAction, calls, seconds in incorporateFeedback, calls)
+    """
+    game = new_game(agent)
+    act_time = update_time = 0.0
+    acts = updates = 0
+    state = game.get_state()
+    new_action = None
+    for _ in xrange(frames):
+        if state['game_state'] == STATE_GAME_OVER:
+            game.take_input([INPUT_ENTER])
+            state = game.get_state()
+            new_action = None
+        if new_action is None:
+            start = time.time()
+            action = agent.takeAction(state)
+            act_time += time.time() - start
+            acts += 1
+        else:
+            action = new_action
+        reward, new_state = game.executeAction(action)
+        start = time.time()
+        new_action = agent.incorporateFeedback(state, action, reward, new_state)
+        update_time += time.time() - start
+        updates += 1
+        state = new_state
+    return act_time, acts, update_time, updates
+
+
+def bench_agents(args):
+    results = {}
+    for name in sorted(AGENT_CONFIGS):
+        player = 'nn' if name == 'nn_numpy' else name
+        act_us, update_us = [], []
+        for _ in range(args.repeat):
+            # a fresh agent every try, so each one learns from scratch
+            agent = agent_registry.build_agent(player, AGENT_CONFIGS[name])
+            act_time, acts, update_time, updates = play_agent(agent, args.frames)
+            agent.close()
+            act_us.append(act_time / max(acts, 1) * 1e6)
+            update_us.append(update_time / updates * 1e6)
+        results['agents.%s.takeAction' % name] = (min(act_us), 'us/call', 'lower')
+        results['agents.%s.incorporateFeedback' % name] = (min(update_us), 'us/call', 'lower')
+    return results
+
+
+def bench_replay(args):
+    results = {}
+    ops = args.frames
+    features = np.random.random_sample(DEFAULT_FEATURE_CAPACITY)
+    next_features = np.random.random_sample((NUM_ACTIONS, DEFAULT_FEATURE_CAPACITY))
+    next_valid = np.ones(NUM_ACTIONS, dtype=np.bool_)
+    for name, memory_class in [('ReplayMemory', ReplayMemory), ('PrioritizedReplayMemory', PrioritizedReplayMemory)]:
+        memory = memory_class(DEFAULT_REPLAY_CAPACITY)
+        def store():
+            start = time.time()
+            for _ in xrange(ops):
+                memory.store(features, 0, 0.0, next_features, next_valid, False)
+            return time.time() - start
+        def sample():
+            start = time.time()
+            for _ in xrange(ops):
+                indices = memory.sample(32)
+                if memory_class is PrioritizedReplayMemory:
+                    memory.update_priorities(indices, np.random.random_sample(32))
+            return time.time() - start
+        results['replay.%s.store' % name] = (ops / best_of(args.repeat, store), 'calls/s', 'higher')
+        results['replay.%s.sample' % name] = (ops / best_of(args.repeat, sample), 'calls/s', 'higher')
+    return results
+
+
+def bench_traces(args):
+    # about as many live keys as sarsaLambda keeps with its default decay and threshold
+    keys = [('feature%d' % i, i % NUM_ACTIONS) for i in range(100)]
+    ops = args.frames
+    def set_items():
+        trace = EligibilityTrace(0.98, 0.1)
+        start = time.time()
+        for i in xrange(ops):
+            trace[keys[i % len(keys)]] = 1.0
+        return time.time() - start
+    def update():
+        trace = EligibilityTrace(0.98, 0.1)
+        elapsed = 0.0
+        for i in xrange(ops):
+            trace[keys[i % len(keys)]] = 1.0
+            start = time.time()
+            trace.update()
+            elapsed += time.time() - start
+        return elapsed
+    return {
+        'traces.EligibilityTrace.set': (ops / best_of(args.repeat, set_items), 'calls/s', 'higher'),
+        'traces.EligibilityTrace.update': (ops / best_of(args.repeat, update), 'calls/s', 'higher'),
+    }
+
+
+def compare(baseline, metrics, threshold):
+    """prints every metric against the baseline. returns the names of the regressions"""
+    regressions = []
+    print 'metric,unit,baseline,current,change,status'
+    for name in sorted(metrics):
+        current = metrics[name]
+        if name not in baseline['metrics']:
+            print '%s,%s,,%.4g,,new' % (name, current['unit'], current['value'])
+            continue
+        old = baseline['metrics'][name]['value']
+        change = (current['value'] - old) / old if old else 0.0
+        worse = -change if current['better'] == 'higher' else change
+        status = 'ok'
+        if worse > threshold:
+            status = 'REGRESSION'
+            regressions.append(name)
+        elif -worse > threshold:
+            status = 'improved'
+        print '%s,%s,%.4g,%.4g,%+.1f%%,%s' % (name, current['unit'], old, current['value'], change * 100, status)
+    return regressions
+
+
+def main(args):
+    suites = args.only.split(',') if args.only else SUITES
+    for suite in suites:
+        if suite not in SUITES:
+            raise ValueError('unknown suite %s. suites: %s' % (suite, ', '.join(SUITES)))
+
+    metrics = {}
+    # the agents print while they play
+    stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+    try:
+        for suite in suites:
+            # same games and inputs whichever suites run before this one
+            random.seed(0)
+            np.random.seed(0)
+            for name, (value, unit, better) in globals()['bench_' + suite](args).items():
+                metrics[name] = {'value': value, 'unit': unit, 'better': better}
+    finally:
+        sys.stdout = stdout
+
+    results = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pygame': pygame.version.ver,
+            'machine': platform.machine(),
+            'node': platform.node(),
+            'frames': args.frames,
+            'repeat': args.repeat,
+        },
+        'metrics': metrics,
+    }
+    with open(args.o, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), metrics, args.threshold)
+        if regressions:
+            print '%d regression(s) beyond %.0f%%: %s' % (len(regressions), args.threshold * 100,
+                                                       ', '.join(regressions))
+            sys.exit(1)
+    else:
+        print 'metric,unit,value'
+        for name in sorted(metrics):
+            print '%s,%s,%.4g' % (name, metrics[name]['unit'], metrics[name]['value'])
+
+
+def process_command_line():
+    parser = argparse.ArgumentParser(description='throughput benchmarks')
+    parser.add_argument('-o', type=str, default='benchmark.json', help="write results to this JSON file")
+    parser.add_argument('-baseline', type=str, help="compare against this earlier results file")
+    parser.add_argument('-threshold', type=float, default=0.1,
+                        help="fraction worse than the baseline that counts as a regression")
+    parser.add_argument('-repeat', type=int, default=3, help="tries per measurement (best is kept)")
+    parser.add_argument('-frames', type=int, default=5000, help="frames / calls per try")
+    parser.add_argument('-only', type=str, help="comma-separated suites to run (%s)" % ','.join(SUITES))
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main(process_command_line())
@@ -0,0 +1,49 @@
+"""
+This script watches live training runs started with main.py -metrics (or experiment
+runner specs with a metrics address), printing each run's latest game every few seconds
+
+usage: python test_scripts/watch_metrics.py [seconds] address_or_socket_dir...
+       e.g. python test_scripts/watch_metrics.py 5 /tmp/runs/ localhost:8000
+"""
+import glob
+import httplib
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from src.metrics import GAUGES, scrape
+
+
+args = sys.argv[1:]
+interval = float(args.pop(0)) if args and args[0].replace('.', '').isdigit() else 5.0
+
+
+def addresses():
+    """the given addresses, with directories expanded to the sockets in them"""
+    for arg in args:
+        if os.path.isdir(arg):
+            for path in sorted(glob.glob(os.path.join(arg, '*.sock'))):
+                yield path
+        else:
+            yield arg
+
+
+columns = ['episode', 'score', 'frames', 'frames_per_sec', 'iters_per_sec'] + GAUGES
+# rows already seen per run: only the latest game is printed, but every game is scraped once
+seen = {}
+while True:
+    print ','.join(['run'] + columns)
+    for address in addresses():
+        try:
+            metrics = scrape(address, seen.get(address, 0))
+        except (IOError, httplib.HTTPException):
+            # finished (or not yet started) runs
+            continue
+        seen[address] = metrics['count']
+        if metrics['rows']:
+            row = metrics['rows'][-1]
+            name = metrics['labels'].get('run_id') or metrics['labels'].get('player') or address
+            print ','.join([str(name)] + ['' if row[c] is None else '%.4g' % row[c] for c in columns])
+    sys.stdout.flush()
+    time.sleep(interval)